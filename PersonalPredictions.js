@@ -74,23 +74,25 @@ const PersonalPredictions = ({ bpm, beatAvg, degreeC, ecg, spo2, lat, lng, onRis
 
   useEffect(() => {
     const fetchRiskData = async () => {
+      // Both models take resting blood pressure (mmHg), not the pulse; same record as /dashboard
+      const systolicBp = parseInt(String(healthData?.blood_pressure || '').split('/')[0], 10) || 120;
       try {
         const riskResponse = await axios.post(ENV.SERVER + '/predict-heart-heart-risk2', {
-          age: healthData?.age || 20,
+          age: healthData?.age || 30,
           bmi: healthData?.bmi || 20,
-          resting_bp: bpm || 120,
+          resting_bp: systolicBp,
           spo2: spo2 || 98,
           ecg: ecg || 0
         });
 
         const detailedResponse = await axios.post(ENV.SERVER + '/predict-heart-heart-risk3', {
-          age: healthData?.age || 45,
+          age: healthData?.age || 30,
           sex: healthData?.gender === 'Female' ? 0 : 1 || 1,
           cp: 0,
-          trestbps: bpm || 120,
+          trestbps: systolicBp,
           chol: healthData?.cholesterol || 200,
           fbs: healthData?.diabetes ? 1 : 0 || 0,
-          restecg: ecg || 0,
+          restecg: 0,
           thalach: healthData?.max_bpm || 150,
           exang: 0,
           oldpeak: 0.0,
@@ -128,9 +130,9 @@ const PersonalPredictions = ({ bpm, beatAvg, degreeC, ecg, spo2, lat, lng, onRis
         console.error("Error fetching risk data:", error);
         try {
           const fallbackResponse = await axios.post(ENV.SERVER + '/predict-heart-heart-risk2', {
-            age: healthData?.age || 20,
+            age: healthData?.age || 30,
             bmi: healthData?.bmi || 20,
-            resting_bp: bpm || 120,
+            resting_bp: systolicBp,
             spo2: spo2 || 98,
             ecg: ecg || 0
           });
@@ -0,0 +1,189 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from google.cloud import firestore
+
+ADHERENCE_COLLECTION = "adherence"
+SUMMARY_DOCUMENT = "summary"
+ROLLING_WINDOWS = (7, 30)
+
+
+# === Counting ===
+def iso_day(value):
+    """`value` when it is a YYYY-MM-DD date, else None."""
+    try:
+        return value if len(value) == 10 and date.fromisoformat(value).isoformat() == value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def record_counts(record):
+    """(taken, missed) per medicine and per schedule time of one medication_takes document."""
+    medicines = defaultdict(lambda: [0, 0])
+    slots = defaultdict(lambda: [0, 0])
+    for med in (record or {}).get("medications", []):
+        column = 0 if med.get("taken") else 1
+        medicines[med["name"]][column] += 1
+        slots[med.get("time") or "unscheduled"][column] += 1
+    return medicines, slots
+
+
+def _add(totals, counts, sign):
+    for key, (taken, missed) in counts.items():
+        entry = totals.setdefault(key, {"taken": 0, "missed": 0})
+        entry["taken"] += sign * taken
+        entry["missed"] += sign * missed
+        if not entry["taken"] and not entry["missed"]:
+            del totals[key]
+
+
+def empty_summary():
+    return {"medicines": {}, "slots": {}, "days": {}, "records": {},
+            "streak": {"current": 0, "end": None, "longest": 0}}
+
+
+def apply_record(summary, day, record):
+    """
+    Replace what `summary` holds for `day` with the counts of `record` (None
+    once the day is gone). Each day's own counts are kept under "records",
+    so a day can be replaced without reading its previous document.
+    """
+    old = summary["records"].pop(day, None) or {"medicines": {}, "slots": {}}
+    _add(summary["medicines"], old["medicines"], -1)
+    _add(summary["slots"], old["slots"], -1)
+
+    medicines, slots = record_counts(record)
+    _add(summary["medicines"], medicines, 1)
+    _add(summary["slots"], slots, 1)
+    taken = sum(counts[0] for counts in medicines.values())
+    missed = sum(counts[1] for counts in medicines.values())
+    if taken or missed:
+        summary["days"][day] = [taken, missed]
+        summary["records"][day] = {"medicines": dict(medicines), "slots": dict(slots)}
+    else:
+        summary["days"].pop(day, None)
+
+
+def compute_streak(days):
+    """Runs of consecutive dates with every dose taken: the longest, and the latest with its end date."""
+    longest = current = 0
+    end = previous = None
+    for day in sorted(days):
+        taken, missed = days[day]
+        today = iso_day(day) and date.fromisoformat(day)
+        if missed or not taken or not today:
+            current, previous = 0, None
+            continue
+        current = current + 1 if previous is not None and today - previous == timedelta(days=1) else 1
+        previous, end = today, day
+        longest = max(longest, current)
+    return {"current": current, "end": end if current else None, "longest": longest}
+
+
+# === Writes ===
+def _summary_ref(db, user):
+    return db.collection("users").document(user).collection(ADHERENCE_COLLECTION).document(SUMMARY_DOCUMENT)
+
+
+def compute_adherence(db, user, transaction=None):
+    """The summary of `user` computed from all of their medication_takes, without storing it."""
+    summary = empty_summary()
+    for doc in db.collection("users").document(user).collection("medication_takes").stream(transaction=transaction):
+        if iso_day(doc.id):  # documents saved under any other key never count
+            apply_record(summary, doc.id, doc.to_dict())
+    summary["streak"] = compute_streak(summary["days"])
+    summary["updated_at"] = datetime.utcnow().isoformat()
+    return summary
+
+
+def rebuild_adherence(db, user):
+    """
+    Recompute and store the summary of `user` (first use, or repair). The
+    takes are read in the same transaction as the write, so a concurrent
+    refresh retries it rather than being overwritten.
+    """
+    @firestore.transactional
+    def write(transaction):
+        summary = compute_adherence(db, user, transaction)
+        transaction.set(_summary_ref(db, user), summary)
+        return summary
+
+    return write(db.transaction())
+
+
+def refresh_adherence(db, user, days):
+    """
+    Fold the stored medication_takes of `days` into the summary of `user`
+    after they were written, replacing what it held for those days; run after
+    the response, so saving a record stays one merge write. A missing summary
+    (or one without per-day records) is rebuilt from the whole history.
+    """
+    takes = db.collection("users").document(user).collection("medication_takes")
+    summary_ref = _summary_ref(db, user)
+
+    @firestore.transactional
+    def write(transaction):
+        summary_doc = summary_ref.get(transaction=transaction)
+        summary = summary_doc.to_dict() if summary_doc.exists else None
+        if summary is None or "records" not in summary:
+            summary = compute_adherence(db, user, transaction)
+        else:
+            refs = [takes.document(day) for day in days if iso_day(day)]
+            for doc in db.get_all(refs, transaction=transaction):
+                apply_record(summary, doc.id, doc.to_dict() if doc.exists else None)
+            summary["streak"] = compute_streak(summary["days"])
+            summary["updated_at"] = datetime.utcnow().isoformat()
+        transaction.set(summary_ref, summary)
+        return summary
+
+    try:
+        return write(db.transaction())
+    except Exception as e:
+        print(f"Adherence summary of {user} not refreshed: {e}")
+        return None
+
+
+# === Reading ===
+def _rate(taken, missed):
+    return round(100 * taken / (taken + missed), 1) if taken + missed else None
+
+
+def read_adherence(db, user, today=None):
+    """
+    Adherence of `user` from their summary document: totals per medicine and
+    per schedule time, streaks and rolling rates. Never scans medication_takes
+    unless the summary has not been built yet, and never writes: the first
+    save stores the summary.
+    """
+    doc = _summary_ref(db, user).get()
+    summary = doc.to_dict() if doc.exists else compute_adherence(db, user)
+    today = today or date.today()
+
+    rolling = {}
+    for window in ROLLING_WINDOWS:
+        taken = missed = 0
+        for offset in range(window):
+            counts = summary["days"].get((today - timedelta(days=offset)).isoformat())
+            if counts:
+                taken, missed = taken + counts[0], missed + counts[1]
+        rolling[f"{window}d"] = {"taken": taken, "missed": missed, "rate": _rate(taken, missed)}
+
+    # A streak is current while its last perfect day is today or yesterday
+    streak = summary["streak"]
+    current = streak["current"] if streak["end"] and streak["end"] >= (today - timedelta(days=1)).isoformat() else 0
+
+    taken = sum(counts["taken"] for counts in summary["medicines"].values())
+    missed = sum(counts["missed"] for counts in summary["medicines"].values())
+    return {
+        "user": user,
+        "taken": taken,
+        "missed": missed,
+        "rate": _rate(taken, missed),
+        "medicines": {name: {**counts, "rate": _rate(counts["taken"], counts["missed"])}
+                      for name, counts in summary["medicines"].items()},
+        "slots": {time: {**counts, "rate": _rate(counts["taken"], counts["missed"])}
+                  for time, counts in summary["slots"].items()},
+        "rolling": rolling,
+        "streak": {"current": current, "longest": streak["longest"], "last_perfect_day": streak["end"]},
+        "days_recorded": len(summary["days"]),
+        "updated_at": summary.get("updated_at"),
+    }
@@ -0,0 +1,194 @@
+import os
+import time
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from google.cloud import firestore
+from adherence import ROLLING_WINDOWS
+
+ROLLUP_COLLECTION = "adherence_rollups"
+ROLLUP_SHARDS = int(os.getenv("ADHERENCE_ROLLUP_SHARDS", "8"))
+# Hours between rollups run by the API process. Off by default: every worker would run its own
+# full scan, so schedule cron (python adherence_rollup.py) or enable it in a single worker only
+ROLLUP_INTERVAL_HOURS = float(os.getenv("ADHERENCE_ROLLUP_HOURS", "0"))
+PATIENTS_PER_PAGE = 500
+HISTORY_LIMIT = 90
+
+
+# === Scanning ===
+def shard_ranges(first, last, shards):
+    """Split the dates first..last (inclusive) into at most `shards` contiguous (first, last) ISO ranges."""
+    days = (last - first).days + 1
+    size = -(-days // max(1, min(shards, days)))
+    return [
+        ((first + timedelta(days=start)).isoformat(), (first + timedelta(days=min(start + size, days) - 1)).isoformat())
+        for start in range(0, days, size)
+    ]
+
+
+def scan_shard(db, first, last, window_starts):
+    """
+    (taken, missed) per (patient, window), (medicine, window) and per day of
+    every medication_takes document dated first..last, across all patients.
+    Needs a collection-group index on medication_takes.date.
+    """
+    patients = defaultdict(lambda: [0, 0])
+    medicines = defaultdict(lambda: [0, 0])
+    daily = defaultdict(lambda: [0, 0])
+    query = (
+        db.collection_group("medication_takes")
+        .where("date", ">=", first)
+        .where("date", "<=", last)
+        .select(["date", "medications"])
+    )
+    for doc in query.stream():
+        user = doc.reference.parent.parent.id
+        record = doc.to_dict()
+        day = record.get("date") or doc.id
+        windows = [window for window, start in window_starts.items() if day >= start]
+        for med in record.get("medications", []):
+            column = 0 if med.get("taken") else 1
+            daily[day][column] += 1
+            for window in windows:
+                patients[(user, window)][column] += 1
+                medicines[(med["name"], window)][column] += 1
+    return patients, medicines, daily
+
+
+def _merge(total, part):
+    for key, (taken, missed) in part.items():
+        total[key][0] += taken
+        total[key][1] += missed
+
+
+def _rates(counts_by_window):
+    return {
+        window: {"taken": taken, "missed": missed, "rate": round(100 * taken / (taken + missed), 1) if taken + missed else None}
+        for window, (taken, missed) in counts_by_window.items()
+    }
+
+
+# === Rollup ===
+def run_rollup(db, today=None, shards=ROLLUP_SHARDS):
+    """
+    Compute clinic-wide adherence for the trailing ROLLING_WINDOWS from
+    medication_takes, scanning date shards in parallel, and write it as one
+    summary document per run date plus pages of per-patient rates.
+    """
+    started = time.perf_counter()
+    today = today or date.today()
+    window_starts = {f"{window}d": (today - timedelta(days=window - 1)).isoformat() for window in ROLLING_WINDOWS}
+    ranges = shard_ranges(today - timedelta(days=max(ROLLING_WINDOWS) - 1), today, shards)
+
+    patients, medicines, daily = defaultdict(lambda: [0, 0]), defaultdict(lambda: [0, 0]), defaultdict(lambda: [0, 0])
+    with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+        for part in pool.map(lambda bounds: scan_shard(db, *bounds, window_starts), ranges):
+            for total, counts in zip((patients, medicines, daily), part):
+                _merge(total, counts)
+
+    by_patient, by_medicine, clinic = defaultdict(dict), defaultdict(dict), {}
+    for (user, window), counts in patients.items():
+        by_patient[user][window] = counts
+    for (name, window), counts in medicines.items():
+        by_medicine[name][window] = counts
+    for window in window_starts:
+        totals = [counts for (user, w), counts in patients.items() if w == window]
+        clinic[window] = [sum(c[0] for c in totals), sum(c[1] for c in totals)]
+
+    users = sorted(by_patient)
+    pages = [users[start:start + PATIENTS_PER_PAGE] for start in range(0, len(users), PATIENTS_PER_PAGE)]
+    rollup_ref = db.collection(ROLLUP_COLLECTION).document(today.isoformat())
+    previous = rollup_ref.get(["pages"])
+    previous_pages = (previous.get("pages") or 0) if previous.exists else 0
+    summary = {
+        "date": today.isoformat(),
+        "generated_at": datetime.utcnow().isoformat(),
+        "windows": {window: {**rates, "patients": sum(window in by_patient[user] for user in users)}
+                    for window, rates in _rates(clinic).items()},
+        "medicines": {name: _rates(counts) for name, counts in by_medicine.items()},
+        "daily": {day: counts for day, counts in sorted(daily.items())},
+        "patients": len(users),
+        "pages": len(pages),
+        "shards": len(ranges),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+    # Pages first, the summary last: readers only follow a summary whose pages are all written
+    batch = db.batch()
+    for number in range(max(len(pages), previous_pages)):
+        page_ref = rollup_ref.collection("patients").document(f"{number:04d}")
+        if number < len(pages):
+            batch.set(page_ref, {"patients": {user: _rates(by_patient[user]) for user in pages[number]}})
+        else:
+            # A rerun of the same day with fewer patients drops the pages it no longer fills
+            batch.delete(page_ref)
+        if number % 400 == 399:
+            batch.commit()
+            batch = db.batch()
+    batch.set(rollup_ref, summary)
+    batch.commit()
+    return summary
+
+
+def read_rollup(db, day=None, include_patients=True):
+    """The rollup of `day` (ISO date, default the latest one) with its patient pages merged, or None."""
+    rollups = db.collection(ROLLUP_COLLECTION)
+    if day is None:
+        docs = list(rollups.order_by("date", direction=firestore.Query.DESCENDING).limit(1).stream())
+        if not docs:
+            return None
+        summary_doc = docs[0]
+    else:
+        summary_doc = rollups.document(day).get()
+        if not summary_doc.exists:
+            return None
+    rollup = summary_doc.to_dict()
+    if include_patients:
+        # Only the pages this summary counts: anything numbered higher is left over from another run
+        pages = [summary_doc.reference.collection("patients").document(f"{number:04d}")
+                 for number in range(rollup.get("pages", 0))]
+        patients = {}
+        for page in db.get_all(pages):
+            if page.exists:
+                patients.update(page.get("patients"))
+        rollup["patient_rates"] = patients
+    return rollup
+
+
+def rollup_history(db, limit=HISTORY_LIMIT):
+    """Clinic-wide window rates of the latest `limit` rollups, oldest first."""
+    docs = (
+        db.collection(ROLLUP_COLLECTION)
+        .order_by("date", direction=firestore.Query.DESCENDING)
+        .limit(limit)
+        .select(["date", "windows", "patients"])
+        .stream()
+    )
+    return sorted((doc.to_dict() for doc in docs), key=lambda rollup: rollup["date"])
+
+
+# === Scheduling ===
+def schedule_rollups(db, interval_hours=ROLLUP_INTERVAL_HOURS):
+    """Run a rollup now and every `interval_hours` on a daemon thread; returns None when disabled."""
+    if interval_hours <= 0:
+        return None
+
+    def loop():
+        while True:
+            try:
+                run_rollup(db)
+            except Exception as e:
+                print(f"Adherence rollup failed: {e}")
+            time.sleep(interval_hours * 3600)
+
+    thread = threading.Thread(target=loop, name="adherence-rollup", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    # For cron: python adherence_rollup.py
+    from firestore_db import get_firestore_client
+    result = run_rollup(get_firestore_client())
+    print(f"Rolled up {result['patients']} patients in {result['seconds']}s over {result['shards']} shards")
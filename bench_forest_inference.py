@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Single-row and batch latency of the flattened forests against the original
+sklearn estimators, with an exact parity check on the same inputs.
+
+    python bench_forest_inference.py [model.joblib ...]
+
+Defaults to the forests behind MODEL_HR, HEART_ACC_MODEL and MODEL_RISK;
+files that are not present are skipped.
+"""
+import os
+import sys
+import time
+import joblib
+import numpy as np
+from forest_store import export_forest, FlatForest, parity_inputs, check_parity, ARRAY_NAMES
+
+DEFAULT_MODELS = [
+    "iot_model_random_forest.joblib",
+    "random_forest_heart_risk_model.joblib",
+    "random_forest_helth_risk_pred.joblib",
+]
+
+
+def per_call_ms(fn, X, repeat):
+    fn(X)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(X)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench(path, repeat=200):
+    model = joblib.load(path)
+    forest = FlatForest(export_forest(path, model))
+    X = parity_inputs({name: getattr(forest, name) for name in ARRAY_NAMES}, forest.n_features_in_, rows=1000, seed=1)
+    parity = check_parity(model, forest, X)
+
+    print(f"{path}: {forest.meta['model_type']}, {forest.meta['n_trees']} trees, depth {forest.max_depth}, parity {'ok' if parity else 'MISMATCH'}")
+    for label, rows, n in (("1 row", X[:1], repeat), ("1000 rows", X, max(repeat // 20, 5))):
+        before = per_call_ms(model.predict, rows, n)
+        after = per_call_ms(forest.predict, rows, n)
+        print(f"  {label:>9}: sklearn {before:8.3f} ms  flat {after:8.3f} ms  ({before / after:5.1f}x)")
+    return parity
+
+
+if __name__ == "__main__":
+    paths = [path for path in (sys.argv[1:] or DEFAULT_MODELS) if os.path.exists(path)]
+    if not all([bench(path) for path in paths]):
+        sys.exit(1)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for the per-frame preprocessing and HUD rendering of the
+exercise monitors, without camera or pose inference.
+
+    python bench_monitor_render.py [frames]
+
+"before" is the original loop body (flip, BGR->RGB->BGR, rounded-rect overlay
+copy + addWeighted, full HUD redraw); "after" is the current path through
+AdaptivePoseScheduler's input buffers and HudRenderer. Both include the
+mirror flip: "after" flips into a reused buffer as LatestFrameReader does on
+its capture thread.
+"""
+import sys
+import time
+import cv2
+import numpy as np
+from hud_renderer import HudRenderer, draw_rounded_rect, draw_feedback
+from pose_scheduler import AdaptivePoseScheduler
+
+WIDTH, HEIGHT = 640, 480
+
+
+class NoPose:
+    """Pose stand-in so only preprocessing and rendering are timed."""
+
+    class Result:
+        pose_landmarks = None
+
+    def process(self, image):
+        return self.Result
+
+
+def legacy_rounded_rect(img, top_left, bottom_right, color, radius=25, thickness=-1):
+    x1, y1 = top_left
+    x2, y2 = bottom_right
+    overlay = img.copy()
+    cv2.rectangle(overlay, (x1 + radius, y1), (x2 - radius, y2), color, thickness)
+    cv2.rectangle(overlay, (x1, y1 + radius), (x2, y2 - radius), color, thickness)
+    cv2.circle(overlay, (x1 + radius, y1 + radius), radius, color, thickness)
+    cv2.circle(overlay, (x2 - radius, y1 + radius), radius, color, thickness)
+    cv2.circle(overlay, (x1 + radius, y2 - radius), radius, color, thickness)
+    cv2.circle(overlay, (x2 - radius, y2 - radius), radius, color, thickness)
+    cv2.addWeighted(overlay, 1, img, 0, 0, img)
+
+
+def legacy_frame(frame, pose, step):
+    frame = cv2.flip(frame, 1)
+    image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    pose.process(image_rgb)
+    frame = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+
+    legacy_rounded_rect(frame, (10, 10), (680, 100), (30, 30, 30))
+    cv2.rectangle(frame, (30, 25), (230, 80), (0, 255, 0), -1)
+    cv2.putText(frame, f"Correct: {step}", (45, 65), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    cv2.rectangle(frame, (250, 25), (450, 80), (0, 0, 255), -1)
+    cv2.putText(frame, f"Incorrect: {step}", (265, 65), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    cv2.rectangle(frame, (470, 25), (600, 80), (0, 255, 255), -1)
+    cv2.putText(frame, "00:00", (490, 65), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    cv2.rectangle(frame, (20, HEIGHT - 50), (WIDTH - 20, HEIGHT - 20), (50, 50, 50), -1)
+    cv2.rectangle(frame, (20, HEIGHT - 50), (20 + step % (WIDTH - 40), HEIGHT - 20), (0, 255, 0), -1)
+
+    phase = step * 0.1
+    r = int((np.sin(phase) + 1) / 2 * 255)
+    g = int((np.sin(phase + 2) + 1) / 2 * 255)
+    b = int((np.sin(phase + 4) + 1) / 2 * 255)
+    cv2.putText(frame, "Good Job!", (30, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 0), 4)
+    cv2.putText(frame, "Good Job!", (30, 150), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (b, g, r), 2)
+    return frame
+
+
+def draw_static_hud(canvas):
+    draw_rounded_rect(canvas, (10, 10), (680, 100), (30, 30, 30))
+    cv2.rectangle(canvas, (30, 25), (230, 80), (0, 255, 0), -1)
+    cv2.rectangle(canvas, (250, 25), (450, 80), (0, 0, 255), -1)
+    cv2.rectangle(canvas, (470, 25), (600, 80), (0, 255, 255), -1)
+    cv2.rectangle(canvas, (20, canvas.shape[0] - 50), (canvas.shape[1] - 20, canvas.shape[0] - 20), (50, 50, 50), -1)
+
+
+def current_frame(frame, mirrored, scheduler, hud, step):
+    frame = cv2.flip(frame, 1, mirrored)
+    # Force inference every frame
+    scheduler.frames_since_inference = scheduler.max_skip
+    scheduler.process(frame)
+
+    hud.apply(frame)
+    cv2.putText(frame, f"Correct: {step}", (45, 65), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    cv2.putText(frame, f"Incorrect: {step}", (265, 65), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    cv2.putText(frame, "00:00", (490, 65), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 2)
+    cv2.rectangle(frame, (20, HEIGHT - 50), (20 + step % (WIDTH - 40), HEIGHT - 20), (0, 255, 0), -1)
+    draw_feedback(frame, "Good Job!", step * 0.1, (30, 150), 0.9, 4)
+    return frame
+
+
+def run(label, render, frames):
+    source = np.random.randint(0, 255, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    frame = source.copy()
+    start = time.perf_counter()
+    for step in range(frames):
+        np.copyto(frame, source)  # stands in for the camera filling its buffer
+        render(frame, step)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>7}: {frames / elapsed:8.1f} fps ({elapsed / frames * 1000:.3f} ms/frame)")
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    pose = NoPose()
+    scheduler = AdaptivePoseScheduler(pose, max_width=WIDTH)
+    hud = HudRenderer(draw_static_hud)
+    mirrored = np.empty((HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+    run("before", lambda frame, step: legacy_frame(frame, pose, step), frames)
+    run("after", lambda frame, step: current_frame(frame, mirrored, scheduler, hud, step), frames)
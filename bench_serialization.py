@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Response serialization cost of the old path (rebuild models, FastAPI
+response_model validation, jsonable_encoder, json.dumps) against
+FastJSONResponse on the same payloads, with an equality check of the JSON.
+
+    python bench_serialization.py [schedules] [samples]
+
+Defaults to a user with 1000 exercise schedules and a 100k-sample vitals range.
+"""
+import sys
+import json
+import time
+import asyncio
+from typing import List, Optional
+import numpy as np
+from pydantic import BaseModel
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from fast_json import FastJSONResponse
+
+
+# Same shape as Activity / ExerciseSchedule in main.py, which needs Firestore to import
+class Activity(BaseModel):
+    title: str
+    summary: str
+    image: str
+    type: str
+    not_suitable: List[str]
+    calories_burned_per_hour: int
+
+
+class ExerciseSchedule(BaseModel):
+    date: Optional[str] = None
+    end_date: Optional[str] = None
+    activities: List[Activity]
+    user: str
+    title: str
+    id: Optional[str] = None
+
+
+SCHEDULES_FIELD = create_response_field(name="response", type_=List[ExerciseSchedule])
+
+
+def schedule_documents(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "date": f"2025-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "end_date": f"2025-{1 + i % 12:02d}-{1 + (i + 6) % 28:02d}",
+            "activities": [
+                {"title": f"Exercise {j}", "summary": "Keep your back straight and breathe steadily. " * 3,
+                 "image": f"/images/exercise_{j}.png", "type": "cardio" if j % 2 else "strength",
+                 "not_suitable": ["asthma", "knee injury"][: j % 3], "calories_burned_per_hour": int(rng.integers(150, 700))}
+                for j in range(int(rng.integers(2, 6)))
+            ],
+            "user": "patient01",
+            "title": f"Plan {i}",
+            "id": f"{i:020d}",
+        }
+        for i in range(count)
+    ]
+
+
+def old_schedules(documents):
+    schedules = [ExerciseSchedule(**document) for document in documents]
+    content = asyncio.run(serialize_response(field=SCHEDULES_FIELD, response_content=schedules))
+    return JSONResponse(content).body
+
+
+def new_schedules(documents):
+    return FastJSONResponse(documents).body
+
+
+def old_samples(times, values):
+    return JSONResponse({"t": times.tolist(), **{f"c{i}": values[:, i].tolist() for i in range(values.shape[1])}}).body
+
+
+def new_samples(times, values):
+    return FastJSONResponse({"t": times, **{f"c{i}": np.ascontiguousarray(values[:, i]) for i in range(values.shape[1])}}).body
+
+
+def per_call_ms(fn, args, repeat):
+    fn(*args)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*args)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def report(label, before, after, size_before, size_after):
+    print(f"{label}: old {before:8.2f} ms  fast {after:8.2f} ms  ({before / after:5.1f}x)  "
+          f"{size_before / 1024:.0f} KiB -> {size_after / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    n_schedules = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_samples = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+
+    documents = schedule_documents(n_schedules)
+    before, after = old_schedules(documents), new_schedules(documents)
+    if json.loads(before) != json.loads(after):
+        sys.exit("Schedule JSON differs")
+    report(f"{n_schedules} schedules", per_call_ms(old_schedules, (documents,), 20),
+           per_call_ms(new_schedules, (documents,), 20), len(before), len(after))
+
+    rng = np.random.default_rng(1)
+    times = 1.7e9 + np.cumsum(rng.uniform(0.009, 0.011, n_samples))
+    values = rng.normal((75, 97, 0.5), (8, 1.5, 0.2), (n_samples, 3)).astype(np.float32)
+    before, after = old_samples(times, values), new_samples(times, values)
+    old_json, new_json = json.loads(before), json.loads(after)
+    # float32 columns are written in their shortest float32 form, so compare at that precision
+    if old_json["t"] != new_json["t"] or not all(
+            np.array_equal(np.float32(old_json[key]), np.float32(new_json[key])) for key in ("c0", "c1", "c2")):
+        sys.exit("Vitals JSON differs")
+    report(f"{n_samples} vitals samples", per_call_ms(old_samples, (times, values), 5),
+           per_call_ms(new_samples, (times, values), 5), len(before), len(after))
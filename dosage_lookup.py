@@ -0,0 +1,119 @@
+import os
+import threading
+import numpy as np
+from feature_encoding import FeatureEncoder
+
+# Catalogues with at most this many combinations are predicted up front
+PRECOMPUTE_LIMIT = int(os.getenv("DOSAGE_PRECOMPUTE_LIMIT", "500000"))
+MEMO_LIMIT = 100000
+BATCH_SIZE = 65536
+
+
+class DosageTable:
+    """
+    Predictions of one (label encoders, model) version pair.
+
+    Dense mode: every combination of known categories is predicted once and
+    stored at its mixed-radix index (a perfect hash of the category codes) as
+    an index into the distinct predictions. Lazy mode, for catalogues too
+    large to enumerate: each combination is predicted the first time it is
+    asked for and memoised.
+    """
+
+    def __init__(self, columns, encoders, model, versions, precompute_limit=PRECOMPUTE_LIMIT):
+        self.columns = columns
+        self.encoders = encoders
+        self.model = model
+        self.versions = versions
+        self.features = FeatureEncoder(columns, encoders)
+        self.radices = [len(encoders[c].mapping) if c in encoders else None for c in columns]
+        self.dense = None not in self.radices and int(np.prod(self.radices, dtype=np.float64)) <= precompute_limit
+        self._memo = {}
+        self._lock = threading.Lock()
+        if self.dense:
+            self._precompute()
+
+    def _precompute(self):
+        total = int(np.prod(self.radices))
+        predictions = []
+        for start in range(0, total, BATCH_SIZE):
+            # Row i holds the category codes whose mixed-radix index is i (first column varies fastest)
+            index = np.arange(start, min(start + BATCH_SIZE, total))
+            codes = np.empty((len(index), len(self.radices)), dtype=np.float64)
+            for j, radix in enumerate(self.radices):
+                codes[:, j] = index % radix
+                index = index // radix
+            predictions.append(np.asarray(self.model.predict(codes)))
+        self.labels, inverse = np.unique(np.concatenate(predictions), return_inverse=True)
+        self.table = inverse.astype(np.uint16 if len(self.labels) <= np.iinfo(np.uint16).max else np.uint32)
+
+    def lookup(self, row):
+        if self.dense:
+            slot, stride = 0, 1
+            for column, radix in zip(self.columns, self.radices):
+                encoder = self.encoders[column]
+                code = encoder.mapping.get(row[column])
+                if code is None:
+                    code = encoder.encode([row[column]])[0]  # raises UnknownCategoryError
+                slot += code * stride
+                stride *= radix
+            return self.labels[self.table[slot]]
+
+        key = tuple(row[column] for column in self.columns)
+        with self._lock:
+            if key in self._memo:
+                return self._memo[key]
+        prediction = self.model.predict(self.features.encode_one(row))[0]
+        with self._lock:
+            if len(self._memo) < MEMO_LIMIT:
+                self._memo[key] = prediction
+        return prediction
+
+    def stats(self):
+        return {
+            "mode": "dense" if self.dense else "lazy",
+            "combinations": int(np.prod(self.radices)) if self.dense else None,
+            "distinct_predictions": len(self.labels) if self.dense else None,
+            "table_bytes": self.table.nbytes if self.dense else None,
+            "memoised": len(self._memo),
+            "versions": list(self.versions),
+        }
+
+
+class DosageLookup:
+    """
+    Dosage suggestions answered from a DosageTable. `encoders()` and
+    `model()` return (artifact, version); the table is rebuilt whenever either
+    version changes, e.g. after a model is promoted.
+    """
+
+    def __init__(self, columns, encoders, model, precompute_limit=PRECOMPUTE_LIMIT):
+        self.columns = list(columns)
+        self._encoders = encoders
+        self._model = model
+        self.precompute_limit = precompute_limit
+        self._table = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def table(self):
+        encoders, encoders_version = self._encoders()
+        model, model_version = self._model()
+        versions = (encoders_version, model_version)
+        table = self._table
+        if table is not None and table.versions == versions:
+            return table
+        with self._lock:
+            if self._table is None or self._table.versions != versions:
+                self._table = DosageTable(self.columns, encoders, model, versions, self.precompute_limit)
+                self.rebuilds += 1
+            return self._table
+
+    def suggest(self, row):
+        """(prediction, model version) for a dict keyed by the dosage columns."""
+        table = self.table()
+        return table.lookup(row), table.versions[1]
+
+    def stats(self):
+        table = self._table
+        return {"built": table is not None, "rebuilds": self.rebuilds, **(table.stats() if table is not None else {})}
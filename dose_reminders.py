@@ -0,0 +1,246 @@
+import os
+import time
+import threading
+from collections import defaultdict, deque
+from datetime import date, datetime
+from medication_calendar import prescription_slots
+
+TICK_SECONDS = int(os.getenv("REMINDER_TICK_SECONDS", "60"))
+# 4 levels of 64 slots: 64**4 ticks ahead (about 31 years at one-minute ticks)
+WHEEL_BITS = 6
+WHEEL_SIZE = 1 << WHEEL_BITS
+WHEEL_LEVELS = 4
+WHEEL_SPAN = WHEEL_SIZE ** WHEEL_LEVELS
+SENT_HISTORY = 1000
+
+
+# === Timing Wheel ===
+class TimingWheel:
+    """
+    Hierarchical timing wheel over integer ticks. Level l holds timers due
+    64**l to 64**(l+1) ticks ahead; a level's slot is cascaded into the lower
+    levels when the wheel below it wraps. add and cancel are O(1), and each
+    tick touches one slot per level, so cost does not grow with pending timers.
+    """
+
+    def __init__(self, current):
+        self.current = current
+        self.wheels = [[{} for _ in range(WHEEL_SIZE)] for _ in range(WHEEL_LEVELS)]
+        self._where = {}  # timer id -> (level, slot)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, timer_id):
+        return timer_id in self._where
+
+    def _place(self, timer_id, due, payload, min_delta):
+        delta = min(max(due - self.current, min_delta), WHEEL_SPAN - 1)
+        level = 0
+        while delta >= WHEEL_SIZE ** (level + 1):
+            level += 1
+        slot = ((self.current + delta) >> (WHEEL_BITS * level)) & (WHEEL_SIZE - 1)
+        self.wheels[level][slot][timer_id] = (due, payload)
+        self._where[timer_id] = (level, slot)
+
+    def add(self, timer_id, due, payload=None):
+        """Schedule (or reschedule) `timer_id` for tick `due`; overdue timers fire on the next tick."""
+        self.cancel(timer_id)
+        self._place(timer_id, due, payload, 1)
+
+    def cancel(self, timer_id):
+        where = self._where.pop(timer_id, None)
+        if where is None:
+            return False
+        del self.wheels[where[0]][where[1]][timer_id]
+        return True
+
+    def advance(self, to):
+        """Move to tick `to`; returns the (timer id, due, payload) that fired, in tick order."""
+        fired = []
+        while self.current < to:
+            self.current += 1
+            for level in range(1, WHEEL_LEVELS):
+                if self.current % (WHEEL_SIZE ** level):
+                    break
+                slot = (self.current >> (WHEEL_BITS * level)) & (WHEEL_SIZE - 1)
+                bucket, self.wheels[level][slot] = self.wheels[level][slot], {}
+                for timer_id, (due, payload) in bucket.items():
+                    self._place(timer_id, due, payload, 0)
+            bucket, self.wheels[0][self.current & (WHEEL_SIZE - 1)] = self.wheels[0][self.current & (WHEEL_SIZE - 1)], {}
+            for timer_id, (due, payload) in bucket.items():
+                del self._where[timer_id]
+                fired.append((timer_id, due, payload))
+        return fired
+
+
+# === Notifiers ===
+class LocalNotifier:
+    """Keeps the latest reminders in memory (and prints them); stands in for push, SMS or e-mail."""
+
+    def __init__(self, history=SENT_HISTORY):
+        self.sent = deque(maxlen=history)
+
+    def __call__(self, reminder):
+        self.sent.append(reminder)
+        print(f"Reminder for {reminder['user']}: {reminder['medicine']} ({reminder['dosage']}) at {reminder['time']}")
+
+    def sent_to(self, user):
+        return [reminder for reminder in self.sent if reminder["user"] == user]
+
+
+# === Scheduler ===
+def dose_times(prescription, now):
+    """Future dose datetimes of one prescription by slot id ("name-time"), oldest first."""
+    times = defaultdict(set)
+    slots = {}
+    for day, day_slots in prescription_slots(prescription).items():
+        for slot in day_slots:
+            try:
+                clock = datetime.strptime(slot["time"], "%I:%M %p").time()
+            except (TypeError, ValueError):
+                continue  # not an h:mm AM/PM schedule time
+            due = datetime.combine(date.fromisoformat(day), clock)
+            if due > now:
+                times[slot["id"]].add(due)
+                slots[slot["id"]] = slot
+    return {slot_id: (slots[slot_id], sorted(dues)) for slot_id, dues in times.items()}
+
+
+class DoseReminderScheduler:
+    """
+    Dose reminders of every prescription_schedules document, held as one
+    recurring timer per (prescription, medicine, time) in a TimingWheel
+    driven by a local thread. `notifier(reminder)` is called for each dose
+    when it is due. A snapshot listener on prescription_schedules is the
+    only source of changes: its first snapshot loads every prescription and
+    later ones apply edits in commit order, whichever worker made them, so
+    Firestore is never polled. Run it in a single process.
+    """
+
+    def __init__(self, notifier, tick_seconds=TICK_SECONDS, clock=time.time):
+        self.notifier = notifier
+        self.tick_seconds = tick_seconds
+        self.clock = clock
+        self.wheel = TimingWheel(self._tick(clock()))
+        self._reminders = {}  # timer id -> reminder with its remaining dose times
+        self._by_prescription = defaultdict(set)
+        self._by_user = defaultdict(set)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._watch = None
+        self.fired = 0
+        self.failures = 0
+
+    def _tick(self, timestamp):
+        return int(timestamp // self.tick_seconds)
+
+    def schedule_prescription(self, prescription_id, prescription):
+        """(Re)schedule every future dose of a saved or updated prescription."""
+        doses = dose_times(prescription, datetime.fromtimestamp(self.clock()))
+        with self._lock:
+            self._cancel(prescription_id)
+            for slot_id, (slot, dues) in doses.items():
+                timer_id = f"{prescription_id}/{slot_id}"
+                self._reminders[timer_id] = {
+                    "prescription_id": prescription_id, "user": prescription["user"], "medicine": slot["name"],
+                    "time": slot["time"], "dosage": slot["dosage"], "dues": deque(dues),
+                }
+                self._by_prescription[prescription_id].add(timer_id)
+                self._by_user[prescription["user"]].add(timer_id)
+                self.wheel.add(timer_id, self._tick(dues[0].timestamp()))
+        return len(doses)
+
+    def cancel_prescription(self, prescription_id):
+        with self._lock:
+            return self._cancel(prescription_id)
+
+    def _cancel(self, prescription_id):
+        timer_ids = list(self._by_prescription.get(prescription_id, ()))
+        for timer_id in timer_ids:
+            self.wheel.cancel(timer_id)
+            self._forget(timer_id)
+        return len(timer_ids)
+
+    def _forget(self, timer_id):
+        reminder = self._reminders.pop(timer_id)
+        for index, key in ((self._by_prescription, reminder["prescription_id"]), (self._by_user, reminder["user"])):
+            index[key].discard(timer_id)
+            if not index[key]:
+                del index[key]
+
+    def apply_changes(self, changes):
+        """Apply Firestore document changes (ADDED, MODIFIED or REMOVED) of prescription_schedules."""
+        for change in changes:
+            doc = change.document
+            try:
+                if change.type.name == "REMOVED":
+                    self.cancel_prescription(doc.id)
+                else:
+                    self.schedule_prescription(doc.id, doc.to_dict())
+            except Exception as e:
+                print(f"Could not schedule reminders for prescription {doc.id}: {e}")
+
+    def watch(self, db):
+        """Follow prescription_schedules; the listener's first snapshot schedules every stored prescription."""
+        self._watch = db.collection("prescription_schedules").on_snapshot(
+            lambda snapshot, changes, read_time: self.apply_changes(changes)
+        )
+
+    def run_due(self):
+        """Advance the wheel to now and notify every dose that came due."""
+        due = []
+        with self._lock:
+            for timer_id, _, _ in self.wheel.advance(self._tick(self.clock())):
+                reminder = self._reminders[timer_id]
+                dose = reminder["dues"].popleft()
+                due.append({key: value for key, value in reminder.items() if key != "dues"} | {"due": dose.isoformat()})
+                if reminder["dues"]:
+                    self.wheel.add(timer_id, self._tick(reminder["dues"][0].timestamp()))
+                else:
+                    self._forget(timer_id)
+
+        for reminder in due:
+            try:
+                self.notifier(reminder)
+                self.fired += 1
+            except Exception as e:
+                self.failures += 1
+                print(f"Reminder notification failed: {e}")
+        return due
+
+    def start(self):
+        def loop():
+            while not self._stop.is_set():
+                self.run_due()
+                self._stop.wait(self.tick_seconds - self.clock() % self.tick_seconds)
+
+        self._thread = threading.Thread(target=loop, name="dose-reminders", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watch is not None:
+            self._watch.unsubscribe()
+
+    def pending(self, user):
+        with self._lock:
+            reminders = [self._reminders[timer_id] for timer_id in self._by_user.get(user, ())]
+            return sorted(
+                ({key: value for key, value in reminder.items() if key != "dues"}
+                 | {"next_due": reminder["dues"][0].isoformat(), "remaining": len(reminder["dues"])}
+                 for reminder in reminders),
+                key=lambda reminder: reminder["next_due"]
+            )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending_timers": len(self.wheel),
+                "prescriptions": len(self._by_prescription),
+                "fired": self.fired,
+                "failures": self.failures,
+                "tick_seconds": self.tick_seconds,
+                "running": self._thread is not None and self._thread.is_alive(),
+            }
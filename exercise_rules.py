@@ -0,0 +1,364 @@
+import time
+import operator
+import numpy as np
+
+# BlazePose landmark indices (same values as mp.solutions.pose.PoseLandmark)
+POSE_LANDMARKS = {
+    "NOSE": 0,
+    "LEFT_SHOULDER": 11, "RIGHT_SHOULDER": 12,
+    "LEFT_ELBOW": 13, "RIGHT_ELBOW": 14,
+    "LEFT_WRIST": 15, "RIGHT_WRIST": 16,
+    "LEFT_HIP": 23, "RIGHT_HIP": 24,
+    "LEFT_KNEE": 25, "RIGHT_KNEE": 26,
+    "LEFT_ANKLE": 27, "RIGHT_ANKLE": 28,
+}
+NUM_LANDMARKS = 33
+
+# === Exercise Definitions ===
+# Each exercise is data only:
+#   features     - named measurements: ("angle", a, b, c) with the vertex at b,
+#                  ("y", p), ("mean_y", p, ...), ("min_y", p, ...), ("dx", p, q), ("dy", p, q).
+#                  A point is a landmark name or ("vertical", name) for (name.x, 0).
+#   track        - running minimum of a feature while in a stage, reset on entering it
+#   transitions  - first match wins: {"from", "when", "to", "rep"}
+#   rep_checks   - evaluated in order when a rep completes; first match decides the outcome
+#   form_checks  - evaluated on frames without a rep; count as incorrect when they fire
+#   report       - PDF report tips by average correct reps per second, and chart colour
+#   A condition is (feature, op, value) where value is a number or a feature name.
+EXERCISES = {
+    "Squat": {
+        "intro": "Starting Squat exercise. Stand with feet shoulder-width apart, lower your hips until thighs are parallel to the floor, then stand back up.",
+        "initial_stage": None,
+        "features": {
+            "knee": ("angle", "LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"),
+            "hip_vertical": ("angle", "LEFT_HIP", "LEFT_SHOULDER", ("vertical", "LEFT_HIP")),
+            "hip_knee": ("angle", "LEFT_HIP", "LEFT_KNEE", ("vertical", "LEFT_HIP")),
+        },
+        "transitions": [
+            {"when": [("knee", "<", 90)], "to": "down"},
+            {"from": "down", "when": [("knee", ">", 160)], "to": "up", "rep": True},
+        ],
+        "rep_checks": [
+            {"when": [("hip_vertical", "<", 20)], "feedback": "Bend forward.", "correct": False},
+            {"when": [("hip_vertical", ">", 45)], "feedback": "Bend backward.", "correct": False},
+            {"when": [("hip_knee", ">=", 50), ("hip_knee", "<=", 80)], "feedback": "Lower hips.", "say": "Good form!", "correct": True},
+            {"when": [("knee", ">", 30)], "feedback": "Knee falling over toes.", "correct": False},
+            {"when": [("hip_knee", ">", 95)], "feedback": "Too deep squat.", "correct": False},
+        ],
+        "rep_success": {"feedback": "Good form!", "say": None},
+        "report": {
+            "slow": (0.3, "Focus on form rather than speed. Keep your back straight."),
+            "fast": (0.7, "Good pace! Make sure you're going deep enough."),
+        },
+    },
+    "Push-Up": {
+        "intro": "Starting Push-Up exercise. Keep your body straight, lower yourself until chest nearly touches the floor, then push back up.",
+        "initial_stage": "up",
+        "feedback_cooldown": 3,
+        "features": {
+            "arm": ("angle", "LEFT_SHOULDER", "LEFT_ELBOW", "LEFT_WRIST"),
+            "body": ("angle", "LEFT_SHOULDER", "LEFT_HIP", "LEFT_KNEE"),
+            "leg": ("angle", "LEFT_HIP", "LEFT_KNEE", "LEFT_ANKLE"),
+        },
+        "transitions": [
+            {"when": [("arm", ">", 160), ("body", ">", 160)], "to": "up"},
+            {"from": "up", "when": [("arm", "<", 70), ("body", ">", 160)], "to": "down", "rep": True},
+        ],
+        "rep_checks": [
+            {"when": [("leg", "<=", 160)], "feedback": "Keep your legs straight!", "correct": False},
+            {"when": [("body", ">=", 190)], "feedback": "Keep your body straight!", "correct": False},
+            {"when": [("arm", ">=", 70)], "feedback": "Go lower for full range!", "correct": False},
+        ],
+        "rep_success": {"feedback": "Perfect form!", "say": None},
+        "report": {
+            "tips": "Good work! Focus on maintaining proper form throughout.",
+            "slow": (0.3, "Focus on quality over quantity - maintain proper form."),
+            "fast": (0.7, "Excellent pace and form! Consider increasing difficulty."),
+            "color": "blue",
+        },
+    },
+    "Downward Dog": {
+        "intro": "Starting Downward Dog exercise. Form an inverted V-shape with your body, hands and feet on the floor, hips raised high.",
+        "initial_stage": None,
+        "feedback_cooldown": 3,
+        "features": {
+            "shoulder": ("angle", "LEFT_SHOULDER", "LEFT_WRIST", "LEFT_ANKLE"),
+            "hip": ("angle", "LEFT_SHOULDER", "LEFT_HIP", "LEFT_ANKLE"),
+        },
+        "transitions": [
+            {"when": [("shoulder", ">", 160), ("hip", ">", 120)], "to": "up"},
+            {"from": "up", "when": [("shoulder", "<", 45)], "to": "down", "rep": True},
+        ],
+        "rep_checks": [],
+        "rep_success": {"feedback": "Good form!", "say": None},
+        "form_checks": [
+            {"when": [("shoulder", "<", 160)], "feedback": "Extend your arms fully!"},
+            {"when": [("hip", "<", 100)], "feedback": "Lift your hips higher!"},
+        ],
+    },
+    "Jumping Jack": {
+        "intro": "Starting Jumping Jack exercise. Stand straight, jump while spreading your legs and raising your arms above your head, then return to starting position.",
+        "initial_stage": "down",
+        "features": {
+            "hand_y": ("mean_y", "LEFT_WRIST", "RIGHT_WRIST"),
+            "highest_wrist_y": ("min_y", "LEFT_WRIST", "RIGHT_WRIST"),
+            "shoulder_y": ("mean_y", "LEFT_SHOULDER", "RIGHT_SHOULDER"),
+            "head_y": ("y", "NOSE"),
+            "left_dx": ("dx", "LEFT_WRIST", "LEFT_SHOULDER"),
+            "right_dx": ("dx", "RIGHT_WRIST", "RIGHT_SHOULDER"),
+            "left_dy": ("dy", "LEFT_WRIST", "LEFT_SHOULDER"),
+            "right_dy": ("dy", "RIGHT_WRIST", "RIGHT_SHOULDER"),
+        },
+        "track": {"max_hand_y": {"min_of": "hand_y", "during": "up"}},
+        "transitions": [
+            {"from": "down", "when": [("highest_wrist_y", "<=", "shoulder_y")], "to": "up"},
+            {"from": "up", "when": [("highest_wrist_y", ">", "shoulder_y")], "to": "down", "rep": True},
+        ],
+        "rep_checks": [
+            {"when": [("max_hand_y", ">=", "head_y"), ("left_dy", "<", 0.1), ("right_dy", "<", 0.1),
+                      ("left_dx", ">", 0.15), ("right_dx", ">", 0.15)],
+             "feedback": "Don't wave your hands sideways!", "correct": False},
+            {"when": [("max_hand_y", ">=", "head_y")], "feedback": "Raise your hands higher!", "correct": False},
+        ],
+        "rep_success": {"feedback": "Good Job!", "say": None},
+        "report": {
+            "tips": "Great effort! Maintain consistency and aim for higher hand raises.",
+            "slow": (0.5, "Try to increase your pace for better cardio benefit."),
+            "fast": (1, "Excellent pace! Keep it up."),
+        },
+    },
+}
+
+_OPS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+# === Compilation ===
+class CompiledExercise:
+    """
+    An exercise definition lowered to index arrays: every angle is computed in
+    one vectorised pass over the landmark array and every condition is a
+    (feature index, comparison, value) lookup, so per-frame cost does not
+    depend on which exercise is running.
+    """
+
+    def __init__(self, name, spec):
+        self.name = name
+        self.spec = spec
+        self.intro = spec.get("intro")
+        self.initial_stage = spec.get("initial_stage")
+        self.feedback_cooldown = spec.get("feedback_cooldown", 0)
+
+        names = list(spec["features"]) + list(spec.get("track", {}))
+        self.feature_index = {feature: i for i, feature in enumerate(names)}
+        self.num_features = len(names)
+
+        # Virtual points (x of a landmark, y = 0) are appended after the real landmarks
+        self._virtual = []
+        angles, others = [], []
+        for feature, (kind, *points) in spec["features"].items():
+            index = self.feature_index[feature]
+            if kind == "angle":
+                angles.append((index, [self._point(p) for p in points]))
+            else:
+                others.append((index, kind, [self._point(p) for p in points]))
+
+        self._angle_out = np.array([i for i, _ in angles], dtype=np.intp)
+        self._angle_pts = np.array([pts for _, pts in angles], dtype=np.intp).reshape(-1, 3)
+        self._others = others
+        self._virtual_src = np.array(self._virtual, dtype=np.intp)
+
+        self.track = [
+            (self.feature_index[name], self.feature_index[rule["min_of"]], rule["during"])
+            for name, rule in spec.get("track", {}).items()
+        ]
+        self.transitions = [
+            (t.get("from"), self._conditions(t["when"]), t["to"], t.get("rep", False))
+            for t in spec["transitions"]
+        ]
+        self.rep_checks = [
+            (self._conditions(c["when"]), c["feedback"], c.get("say", c["feedback"]), c["correct"])
+            for c in spec.get("rep_checks", [])
+        ]
+        success = spec.get("rep_success", {})
+        self.rep_success = (success.get("feedback", ""), success.get("say"))
+        self.form_checks = [
+            (self._conditions(c["when"]), c["feedback"], c.get("say", c["feedback"]))
+            for c in spec.get("form_checks", [])
+        ]
+
+    def _point(self, point):
+        if isinstance(point, tuple):
+            kind, name = point
+            if kind != "vertical":
+                raise ValueError(f"Unknown point kind '{kind}' in exercise '{self.name}'")
+            self._virtual.append(POSE_LANDMARKS[name])
+            return NUM_LANDMARKS + len(self._virtual) - 1
+        return POSE_LANDMARKS[point]
+
+    def _conditions(self, conditions):
+        compiled = []
+        for feature, op, value in conditions:
+            rhs = self.feature_index[value] if isinstance(value, str) else None
+            compiled.append((self.feature_index[feature], _OPS[op], rhs, value))
+        return compiled
+
+    def measure(self, points, out):
+        """Fill `out` with every feature for one frame of (x, y) landmark points."""
+        if len(self._virtual_src):
+            virtual = np.zeros((len(self._virtual_src), 2))
+            virtual[:, 0] = points[self._virtual_src, 0]
+            points = np.concatenate((points, virtual))
+
+        if len(self._angle_out):
+            a = points[self._angle_pts[:, 0]]
+            b = points[self._angle_pts[:, 1]]
+            c = points[self._angle_pts[:, 2]]
+            radians = np.arctan2(c[:, 1] - b[:, 1], c[:, 0] - b[:, 0]) - np.arctan2(a[:, 1] - b[:, 1], a[:, 0] - b[:, 0])
+            angle = np.abs(radians * 180.0 / np.pi)
+            out[self._angle_out] = np.where(angle > 180.0, 360 - angle, angle)
+
+        for index, kind, pts in self._others:
+            if kind == "y":
+                out[index] = points[pts[0], 1]
+            elif kind == "mean_y":
+                out[index] = points[pts, 1].mean()
+            elif kind == "min_y":
+                out[index] = points[pts, 1].min()
+            elif kind == "dx":
+                out[index] = abs(points[pts[0], 0] - points[pts[1], 0])
+            elif kind == "dy":
+                out[index] = abs(points[pts[0], 1] - points[pts[1], 1])
+        return out
+
+
+def matches(conditions, features):
+    for index, op, rhs, value in conditions:
+        if not op(features[index], features[rhs] if rhs is not None else value):
+            return False
+    return True
+
+
+def compile_exercises(definitions=EXERCISES):
+    return {name: CompiledExercise(name, spec) for name, spec in definitions.items()}
+
+
+COMPILED_EXERCISES = compile_exercises()
+
+
+def landmarks_to_points(landmarks):
+    """Accepts a mediapipe landmark list or an (N, >=2) array; returns (N, 2) x/y."""
+    if isinstance(landmarks, np.ndarray):
+        return landmarks[:, :2]
+    return np.array([(lm.x, lm.y) for lm in landmarks], dtype=np.float64)
+
+
+# === Per-session Evaluator ===
+class ExerciseTracker:
+    """
+    Runs one compiled exercise over a stream of frames and keeps the counts the
+    monitors display. `update` returns None on quiet frames, otherwise a dict
+    with the feedback, the phrase to speak (None for silence) and whether a
+    rep was completed.
+    """
+
+    def __init__(self, exercise, clock=time.time):
+        if isinstance(exercise, str):
+            if exercise not in COMPILED_EXERCISES:
+                raise KeyError(f"Exercise '{exercise}' is not defined")
+            exercise = COMPILED_EXERCISES[exercise]
+        self.exercise = exercise
+        self.clock = clock
+        self.stage = exercise.initial_stage
+        self.counter = 0
+        self.correct = 0
+        self.incorrect = 0
+        self.feedback = ""
+        self.features = np.zeros(exercise.num_features)
+        self._last_spoken = float("-inf")
+
+    def feature(self, name):
+        return self.features[self.exercise.feature_index[name]]
+
+    def _say(self, phrase, now):
+        if phrase is None:
+            return None
+        if now - self._last_spoken < self.exercise.feedback_cooldown:
+            return None
+        self._last_spoken = now
+        return phrase
+
+    def update(self, landmarks, now=None):
+        now = self.clock() if now is None else now
+        exercise = self.exercise
+        features = exercise.measure(landmarks_to_points(landmarks), self.features)
+
+        for index, source, during in exercise.track:
+            if self.stage == during and features[source] < features[index]:
+                features[index] = features[source]
+
+        for source_stage, conditions, target, rep in exercise.transitions:
+            if source_stage is not None and self.stage != source_stage:
+                continue
+            if not matches(conditions, features):
+                continue
+            entering = self.stage != target
+            self.stage = target
+            if entering:
+                for index, source, during in exercise.track:
+                    if during == target:
+                        features[index] = features[source]
+            if rep:
+                return self._score_rep(features, now)
+            return None
+
+        for conditions, feedback, say in exercise.form_checks:
+            if matches(conditions, features):
+                phrase = self._say(say, now)
+                if phrase is None:
+                    return None
+                self.incorrect += 1
+                self.feedback = feedback
+                return {"rep": False, "correct": False, "feedback": feedback, "say": phrase}
+        return None
+
+    def _score_rep(self, features, now):
+        self.counter += 1
+        for conditions, feedback, say, correct in self.exercise.rep_checks:
+            if matches(conditions, features):
+                break
+        else:
+            (feedback, say), correct = self.exercise.rep_success, True
+
+        if correct:
+            self.correct += 1
+        else:
+            self.incorrect += 1
+        self.feedback = feedback
+        return {"rep": True, "correct": correct, "feedback": feedback, "say": self._say(say, now)}
+
+
+# === Batch / Headless Evaluation ===
+def evaluate_sequence(exercise, frames, timestamps):
+    """
+    Replays recorded landmarks through the same rules the live monitors use.
+    `frames` is a (T, 33, >=2) array (or any iterable of landmark lists) and
+    `timestamps` the matching capture times in seconds.
+    """
+    tracker = ExerciseTracker(exercise)
+    events = []
+    for landmarks, ts in zip(frames, timestamps):
+        event = tracker.update(landmarks, now=ts)
+        if event:
+            events.append(dict(event, time=ts))
+    return {
+        "exercise": tracker.exercise.name,
+        "reps": tracker.counter,
+        "correct": tracker.correct,
+        "incorrect": tracker.incorrect,
+        "events": events,
+    }
@@ -0,0 +1,34 @@
+from datetime import date, datetime
+from decimal import Decimal
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    # Only reached for types orjson does not serialize natively
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()  # subclasses, e.g. Firestore's DatetimeWithNanoseconds
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if hasattr(obj, "tolist"):
+        return obj.tolist()  # NumPy scalars and non-contiguous arrays
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON rendered by orjson straight from dicts, lists, NumPy arrays and
+    datetimes. An endpoint returning one skips FastAPI's response_model
+    validation and jsonable_encoder pass, so use it for data that is already
+    trusted, e.g. Firestore documents that were validated when written.
+    """
+
+    def render(self, content):
+        return orjson.dumps(content, default=_default, option=OPTIONS)
@@ -0,0 +1,92 @@
+import joblib
+import numpy as np
+
+MAX_LISTED_CATEGORIES = 10
+
+
+class UnknownCategoryError(ValueError):
+    """A categorical input the model was never trained on."""
+
+    def __init__(self, feature, values, known):
+        self.feature = feature
+        self.values = list(values)
+        known = list(known)
+        listed = ", ".join(map(str, known[:MAX_LISTED_CATEGORIES]))
+        more = f" and {len(known) - MAX_LISTED_CATEGORIES} more" if len(known) > MAX_LISTED_CATEGORIES else ""
+        super().__init__(f"Unknown {feature} {', '.join(map(repr, self.values))}; expected one of: {listed}{more}")
+
+
+class CategoryEncoder:
+    """Category -> integer code as a plain dict lookup, built once instead of per request."""
+
+    def __init__(self, feature, mapping):
+        self.feature = feature
+        self.mapping = dict(mapping)
+
+    @classmethod
+    def from_label_encoder(cls, feature, label_encoder):
+        # LabelEncoder.transform returns the index of the value in the sorted classes_
+        return cls(feature, {value: code for code, value in enumerate(label_encoder.classes_.tolist())})
+
+    @property
+    def classes(self):
+        return list(self.mapping)
+
+    def encode(self, values):
+        try:
+            return np.fromiter((self.mapping[value] for value in values), dtype=np.int64, count=len(values))
+        except (KeyError, TypeError):
+            unknown = []
+            for value in values:
+                if not (_hashable(value) and value in self.mapping) and value not in unknown:
+                    unknown.append(value)
+            raise UnknownCategoryError(self.feature, unknown, self.mapping)
+
+
+def _hashable(value):
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+
+class FeatureEncoder:
+    """
+    Turns rows (dicts keyed by column) into the float64 matrix a model
+    expects, column by column. Columns with a CategoryEncoder are looked up;
+    every other column must already be numeric.
+    """
+
+    def __init__(self, columns, encoders=None):
+        self.columns = list(columns)
+        self.encoders = dict(encoders or {})
+
+    def encode(self, rows):
+        X = np.empty((len(rows), len(self.columns)), dtype=np.float64)
+        for j, column in enumerate(self.columns):
+            try:
+                values = [row[column] for row in rows]
+            except KeyError:
+                raise ValueError(f"Missing feature '{column}'")
+            encoder = self.encoders.get(column)
+            if encoder is not None:
+                X[:, j] = encoder.encode(values)
+                continue
+            try:
+                X[:, j] = np.array(values, dtype=np.float64)
+            except (TypeError, ValueError):
+                raise ValueError(f"Feature '{column}' must be numeric")
+        return X
+
+    def encode_one(self, row):
+        return self.encode([row])
+
+
+def compile_label_encoders(label_encoders):
+    return {name: CategoryEncoder.from_label_encoder(name, encoder) for name, encoder in label_encoders.items()}
+
+
+def load_label_encoders(path):
+    """joblib file of {column: LabelEncoder}, compiled to lookup tables."""
+    return compile_label_encoders(joblib.load(path))
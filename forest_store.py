@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import joblib
+import numpy as np
+
+# Flattened forests live next to the source artifact, e.g. model.joblib -> model.joblib.forest/
+FOREST_SUFFIX = ".forest"
+MMAP_SUFFIX = ".mmap.joblib"
+# Off by default: loading never writes next to the artifacts. Export with python forest_store.py
+AUTO_EXPORT = os.getenv("FOREST_AUTO_EXPORT", "0") == "1"
+
+# Bumped whenever the on-disk layout changes; older exports are redone on load
+FORMAT_VERSION = 3
+ARRAY_NAMES = ("feature", "threshold", "children", "value", "roots")
+
+
+# === Export ===
+def _estimators(model):
+    if hasattr(model, "estimators_") and all(hasattr(e, "tree_") for e in model.estimators_):
+        return list(model.estimators_)
+    if hasattr(model, "tree_"):
+        return [model]
+    return None
+
+
+def flatten_forest(model):
+    """
+    Concatenates every tree of a fitted sklearn decision tree / random forest
+    into one set of node arrays. `children[node]` holds the global (left,
+    right) child indices; leaves point back at themselves, so a traversal can
+    run a fixed `max_depth` steps for every tree at once without checking for
+    leaves. Classifier leaf values are stored already normalised to class
+    probabilities, exactly as DecisionTreeClassifier.predict_proba computes them.
+    """
+    estimators = _estimators(model)
+    if estimators is None:
+        raise ValueError(f"{type(model).__name__} is not a tree ensemble")
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("Only single-output trees are supported")
+
+    is_classifier = hasattr(model, "classes_")
+    feature, threshold, children, value, roots = [], [], [], [], []
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        nodes = np.arange(offset, offset + tree.node_count, dtype=np.int64)
+        leaf = tree.children_left == -1
+        roots.append(offset)
+        feature.append(np.where(leaf, 0, tree.feature).astype(np.int32))
+        threshold.append(tree.threshold.astype(np.float64))
+        children.append(np.stack([
+            np.where(leaf, nodes, tree.children_left + offset),
+            np.where(leaf, nodes, tree.children_right + offset),
+        ], axis=1).astype(np.int32))
+
+        node_value = tree.value[:, 0, :].astype(np.float64)
+        # sklearn >= 1.4 stores class fractions and returns them as they are; older versions store
+        # weighted counts (the root sums to the sample count) and normalise them in predict_proba
+        if is_classifier and not np.allclose(node_value.sum(axis=1), 1.0):
+            normalizer = node_value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            node_value = node_value / normalizer
+        value.append(node_value)
+        offset += tree.node_count
+
+    arrays = {
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "children": np.ascontiguousarray(np.concatenate(children)),
+        "value": np.ascontiguousarray(np.concatenate(value)),
+        "roots": np.array(roots, dtype=np.int32),
+    }
+    meta = {
+        "format": FORMAT_VERSION,
+        "kind": "classifier" if is_classifier else "regressor",
+        "ensemble": hasattr(model, "estimators_"),
+        "model_type": type(model).__name__,
+        "n_features": int(model.n_features_in_),
+        "n_trees": len(estimators),
+        "max_depth": int(max(e.tree_.max_depth for e in estimators)),
+        "classes": model.classes_.tolist() if is_classifier else None,
+    }
+    return arrays, meta
+
+
+def parity_inputs(arrays, n_features, rows=256, seed=0):
+    # Sample feature values on and around the split thresholds, where mismatches would show
+    rng = np.random.default_rng(seed)
+    internal = arrays["children"][:, 0] != np.arange(len(arrays["children"]))
+    X = rng.normal(size=(rows, n_features))
+    for f in range(n_features):
+        cuts = arrays["threshold"][internal & (arrays["feature"] == f)]
+        if len(cuts):
+            picks = rng.choice(cuts, size=rows)
+            X[:, f] = picks + rng.choice([-1e-6, 0.0, 1e-6], size=rows)
+    return X
+
+
+def check_parity(model, forest, X):
+    if not np.array_equal(np.asarray(model.predict(X)), forest.predict(X)):
+        return False
+    if forest.kind == "classifier" and hasattr(model, "predict_proba"):
+        return np.array_equal(model.predict_proba(X), forest.predict_proba(X))
+    return True
+
+
+def export_forest(source_path, model=None):
+    """Writes `<source>.forest/` and returns its path; refuses if predictions would differ."""
+    model = joblib.load(source_path) if model is None else model
+    arrays, meta = flatten_forest(model)
+    stat = os.stat(source_path)
+    meta.update({"source": os.path.basename(source_path), "source_mtime": stat.st_mtime, "source_size": stat.st_size})
+
+    target = source_path + FOREST_SUFFIX
+    workdir = tempfile.mkdtemp(prefix=os.path.basename(target) + ".", dir=os.path.dirname(os.path.abspath(target)))
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(workdir, f"{name}.npy"), array)
+        with open(os.path.join(workdir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        forest = FlatForest(workdir)
+        X = parity_inputs(arrays, meta["n_features"])
+        if not check_parity(model, forest, X):
+            raise ValueError(f"Flattened forest for {source_path} does not match the original model")
+        del forest
+
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.replace(workdir, target)
+    except Exception:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    return target
+
+
+def export_mmap_joblib(source_path, model=None):
+    """Uncompressed joblib copy, so numpy arrays inside can be loaded with mmap_mode='r'."""
+    model = joblib.load(source_path) if model is None else model
+    target = source_path + MMAP_SUFFIX
+    joblib.dump(model, target + ".tmp", compress=0)
+    os.replace(target + ".tmp", target)
+    return target
+
+
+# === Memory-mapped Forest ===
+class FlatForest:
+    """
+    A flattened forest backed by read-only memory maps. Every worker process
+    that loads the same files shares one page-cache copy of the node arrays.
+    Mirrors the parts of the sklearn estimator API the app uses.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        for name in ARRAY_NAMES:
+            # Plain ndarray view of the map: still shared, without np.memmap's per-operation overhead
+            setattr(self, name, np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")))
+        self._child_index = self.children.reshape(-1)
+        self.kind = self.meta["kind"]
+        self.n_features_in_ = self.meta["n_features"]
+        self.max_depth = self.meta["max_depth"]
+        if self.kind == "classifier":
+            self.classes_ = np.array(self.meta["classes"])
+
+    def _prepare(self, X):
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected input with {self.n_features_in_} features, got shape {X.shape}")
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity")
+        return X.astype(np.float64)
+
+    def leaves(self, X):
+        """
+        Leaf index reached in every tree, shape (n_rows, n_trees). All trees
+        and rows advance one level per step in lockstep; rows that reached a
+        leaf early stay there because leaves are their own children.
+        """
+        # Everything is a 1-D np.take: node -> feature column of its row, and
+        # 2 * node + go_right -> child
+        n_rows, n_features = X.shape
+        flat_X = X.reshape(-1)
+        row_offset = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        nodes = np.repeat(self.roots[None, :].astype(np.intp), n_rows, axis=0)
+        for _ in range(self.max_depth):
+            go_right = flat_X.take(row_offset + self.feature.take(nodes)) > self.threshold.take(nodes)
+            nodes = self._child_index.take(2 * nodes + go_right)
+        return nodes
+
+    def _average(self, X):
+        values = self.value[self.leaves(self._prepare(X))]
+        if not self.meta["ensemble"]:
+            return values[:, 0]
+        # Sequential sum in estimator order, as the sklearn forests accumulate it
+        return np.cumsum(values, axis=1)[:, -1] / len(self.roots)
+
+    def predict_proba(self, X):
+        if self.kind != "classifier":
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._average(X)
+
+    def predict(self, X):
+        averaged = self._average(X)
+        if self.kind == "classifier":
+            return self.classes_.take(np.argmax(averaged, axis=1), axis=0)
+        return averaged[:, 0]
+
+
+# === Loading ===
+def _is_fresh(path, source_path):
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        stat = os.stat(source_path)
+        return meta.get("format") == FORMAT_VERSION and meta["source_mtime"] == stat.st_mtime and meta["source_size"] == stat.st_size
+    except (OSError, ValueError, KeyError):
+        return False
+
+
+def load_model(source_path):
+    """
+    Loads a model so its weights can be shared between worker processes:
+    a flattened forest if one exists (exporting it first when AUTO_EXPORT is
+    on), else an uncompressed memory-mapped joblib copy, else the original file.
+    """
+    forest_path = source_path + FOREST_SUFFIX
+    if _is_fresh(forest_path, source_path):
+        return FlatForest(forest_path)
+
+    mmap_path = source_path + MMAP_SUFFIX
+    if os.path.exists(mmap_path) and os.path.getmtime(mmap_path) >= os.path.getmtime(source_path):
+        return joblib.load(mmap_path, mmap_mode="r")
+
+    model = joblib.load(source_path)
+    if AUTO_EXPORT and _estimators(model) is not None:
+        try:
+            return FlatForest(export_forest(source_path, model))
+        except (OSError, ValueError) as e:
+            print(f"Could not flatten {source_path}: {e}")
+    return model
+
+
+if __name__ == "__main__":
+    # python forest_store.py model.joblib [...]  -> writes .forest/ (trees) or .mmap.joblib (others)
+    for path in sys.argv[1:]:
+        model = joblib.load(path)
+        if _estimators(model) is not None:
+            print(f"{path} -> {export_forest(path, model)}")
+        else:
+            print(f"{path} -> {export_mmap_joblib(path, model)}")
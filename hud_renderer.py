@@ -0,0 +1,59 @@
+import math
+import cv2
+import numpy as np
+
+
+# === Drawing Helpers ===
+def draw_rounded_rect(img, top_left, bottom_right, color, radius=25, thickness=-1):
+    # Drawn straight onto `img`; the old full-frame copy + addWeighted(1, 0) was a no-op blend
+    x1, y1 = top_left
+    x2, y2 = bottom_right
+    cv2.rectangle(img, (x1 + radius, y1), (x2 - radius, y2), color, thickness)
+    cv2.rectangle(img, (x1, y1 + radius), (x2, y2 - radius), color, thickness)
+    cv2.circle(img, (x1 + radius, y1 + radius), radius, color, thickness)
+    cv2.circle(img, (x2 - radius, y1 + radius), radius, color, thickness)
+    cv2.circle(img, (x1 + radius, y2 - radius), radius, color, thickness)
+    cv2.circle(img, (x2 - radius, y2 - radius), radius, color, thickness)
+
+
+def twinkle_color(phase):
+    r = int((math.sin(phase) + 1) / 2 * 255)
+    g = int((math.sin(phase + 2) + 1) / 2 * 255)
+    b = int((math.sin(phase + 4) + 1) / 2 * 255)
+    return (b, g, r)
+
+
+def draw_feedback(img, text, phase, org, scale, outline):
+    cv2.putText(img, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), outline)
+    cv2.putText(img, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, twinkle_color(phase), 2)
+
+
+# === Cached HUD Layer ===
+class HudRenderer:
+    """
+    Pre-renders the static part of a monitor's HUD (panels, boxes, bars) once
+    per frame size and stamps it onto each frame in place. `draw_static` is
+    called with a blank canvas and should only draw things that never change;
+    counters, timers and feedback are drawn on the frame afterwards.
+    """
+
+    def __init__(self, draw_static):
+        self.draw_static = draw_static
+        self._shape = None
+        self._layer = None
+        self._mask = None
+
+    def _build(self, shape):
+        # Render on black and on white: pixels that agree are the ones the HUD drew
+        self._layer = np.zeros(shape, dtype=np.uint8)
+        self.draw_static(self._layer)
+        background = np.full(shape, 255, dtype=np.uint8)
+        self.draw_static(background)
+        self._mask = (self._layer == background).all(axis=2).astype(np.uint8)
+        self._shape = shape
+
+    def apply(self, frame):
+        if frame.shape != self._shape:
+            self._build(frame.shape)
+        cv2.copyTo(self._layer, self._mask, frame)
+        return frame
@@ -1,25 +1,24 @@
 # main.py
-from fastapi import FastAPI, HTTPException, File, UploadFile, Request
+from fastapi import FastAPI, HTTPException, File, UploadFile, Request, WebSocket, WebSocketDisconnect, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse
-from pydantic import BaseModel, Field
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
 import bcrypt
 import os
 import shutil
 from typing import List, Optional, Tuple, Dict, Any
 from firestore_db import get_firestore_client
-from excercise_monitor import exe_launch
-from exercises.jumping_jack_monitor_model import start_jumping_jack
 import threading
-from face_detection import FaceRecognition
-import joblib
+import time
+import hmac
+import asyncio
 import pandas as pd
 from google.cloud import firestore
 from google.cloud import vision
+from google.api_core.exceptions import NotFound, FailedPrecondition
 from google.oauth2 import service_account
-from datetime import datetime, timedelta
-import spacy
-import easyocr
+from datetime import datetime, timedelta, date
 import pytesseract
 from PIL import Image
 import numpy as np
@@ -29,7 +28,21 @@ from sklearn.pipeline import Pipeline
 import re
 import random
 import traceback
-import scispacy
+from model_registry import models
+from forest_store import load_model
+from prediction_cache import PredictionCache
+from vitals_stream import VitalsStreamHub, samples_to_array, SAMPLE_FIELDS
+from vitals_store import VitalsStore
+from feature_encoding import FeatureEncoder, CategoryEncoder, UnknownCategoryError, load_label_encoders
+from dosage_lookup import DosageLookup
+from adherence import iso_day, refresh_adherence, read_adherence, rebuild_adherence
+from adherence_rollup import run_rollup, read_rollup, rollup_history, schedule_rollups, HISTORY_LIMIT
+from dose_reminders import DoseReminderScheduler, LocalNotifier
+from fast_json import FastJSONResponse
+from medication_calendar import (
+    clean_days, clean_dosage, decode_interval, stage_calendar_update, read_calendar, rebuild_calendar, MAX_RANGE_DAYS
+)
+import json
 # from llama_cpp import Llama
 
 app = FastAPI()
@@ -48,10 +61,165 @@ app.add_middleware(
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-# Load MOdels
-decision_tree_model_for_dosage = joblib.load('drug_strength_model_dt.joblib')
-label_encoders = joblib.load('label_encoders.joblib')
-calorie_ex_model = joblib.load('calorie_exercise.joblib')
+# Register Models (each is loaded on first use, see model_registry.py)
+models.register_file("decision_tree_model_for_dosage", 'drug_strength_model_dt.joblib', load_model)
+models.register_file("label_encoders", 'label_encoders.joblib', load_label_encoders, warm=None)
+models.register_file("calorie_ex_model", 'calorie_exercise.joblib', load_model)
+
+# Comma-separated artifact names, "all" or "none": what is loaded and warmed with a synthetic
+# call at startup. /readyz fails until every one of them is warm.
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "all")
+# Failed components are retried this many times, waiting MODEL_WARMUP_RETRY_SECONDS, then twice as long, ...
+WARMUP_RETRIES = int(os.getenv("MODEL_WARMUP_RETRIES", "5"))
+WARMUP_RETRY_SECONDS = float(os.getenv("MODEL_WARMUP_RETRY_SECONDS", "5"))
+DOSAGE_ARTIFACTS = {"label_encoders", "decision_tree_model_for_dosage"}
+STARTED_AT = time.time()
+readiness = {"state": "starting", "failures": {}, "warm_seconds": None}
+
+def warm_up_names():
+    if MODEL_WARMUP == "none":
+        return []
+    if MODEL_WARMUP == "all":
+        return [name for name in models.stats()]
+    return [name.strip() for name in MODEL_WARMUP.split(",") if name.strip()]
+
+def warm_up_components(names):
+    """Warm the named artifacts, then the dosage table once both of its artifacts are warm; returns failures."""
+    failures = models.warm_up([name for name in names if name != "dosage_lookup"])
+    if ("dosage_lookup" in names or DOSAGE_ARTIFACTS & set(names)) and all(models.is_warm(name) for name in DOSAGE_ARTIFACTS):
+        try:
+            dosage_lookup.table()
+        except Exception as e:
+            failures["dosage_lookup"] = str(e)
+    return failures
+
+def run_warm_up():
+    readiness["state"] = "warming"
+    start = time.perf_counter()
+    failures = warm_up_components(warm_up_names())
+    delay = WARMUP_RETRY_SECONDS
+    for _ in range(WARMUP_RETRIES):
+        if not failures:
+            break
+        for name, error in failures.items():
+            print(f"Warm-up failed for {name}: {error}; retrying in {delay:g}s")
+        readiness.update(state="retrying", failures=failures)
+        time.sleep(delay)
+        delay *= 2
+        failures = warm_up_components(list(failures))
+    for name, error in failures.items():
+        print(f"Warm-up failed for {name}: {error}")
+    readiness.update(
+        state="failed" if failures else "ready",
+        failures=failures,
+        warm_seconds=round(time.perf_counter() - start, 3)
+    )
+
+@app.on_event("startup")
+def warm_up_models():
+    # Off the event loop, so /healthz answers while models warm
+    threading.Thread(target=run_warm_up, name="warm-up", daemon=True).start()
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving, warm or not."""
+    return {"status": "ok", "uptime_seconds": round(time.time() - STARTED_AT, 1)}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 only once every warm-up component has loaded and run a synthetic inference."""
+    if readiness["state"] == "failed" and all(
+            models.is_loaded(name) if name in models else dosage_lookup.stats()["built"] for name in readiness["failures"]):
+        # What failed to warm has since loaded on a request, e.g. once a flaky mount recovered
+        readiness.update(state="ready", failures={})
+    stats = models.stats()
+    components = {
+        name: {key: stats[name][key] for key in ("loaded", "warm", "warm_seconds", "error") if key in stats[name]}
+        for name in warm_up_names() if name in stats
+    }
+    if "dosage_lookup" in readiness["failures"]:
+        components["dosage_lookup"] = {"warm": False, "error": readiness["failures"]["dosage_lookup"]}
+    body = {"status": readiness["state"], "warm_seconds": readiness["warm_seconds"], "components": components}
+    return JSONResponse(status_code=200 if readiness["state"] == "ready" else 503, content=body)
+
+# Prediction caches by model name; quantisation steps can be overridden per model with
+# PREDICTION_CACHE_STEPS='{"MODEL_HR": {"bmi": 0.5}}'
+prediction_caches = {}
+PREDICTION_CACHE_STEPS = json.loads(os.getenv("PREDICTION_CACHE_STEPS", "{}"))
+
+def register_prediction_cache(name, steps):
+    prediction_caches[name] = PredictionCache({**steps, **PREDICTION_CACHE_STEPS.get(name, {})})
+    return prediction_caches[name]
+
+@app.get("/models")
+async def get_model_stats():
+    return {
+        "models": models.stats(),
+        "prediction_caches": {name: cache.stats() for name, cache in prediction_caches.items()},
+        "dosage_lookup": dosage_lookup.stats()
+    }
+
+# Model admin (stage / promote / rollback); disabled unless ADMIN_TOKEN is set. Changes are recorded in
+# MODEL_STATE_FILE, which every worker re-reads, so they apply to all workers, not only the one serving them.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+class ModelStageRequest(BaseModel):
+    path: Optional[str] = None  # New artifact file; defaults to re-reading the current one
+
+def require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model administration is disabled")
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+def admin_model_name(name: str):
+    if name not in models:
+        raise HTTPException(status_code=404, detail=f"Model '{name}' not found")
+    return name
+
+@app.post("/admin/models/{name}/stage")
+def stage_model(name: str, body: ModelStageRequest, request: Request):
+    require_admin(request)
+    admin_model_name(name)
+    if body.path is not None:
+        path = os.path.realpath(body.path)
+        if os.path.commonpath([path, os.getcwd()]) != os.getcwd() or not os.path.isfile(path):
+            raise HTTPException(status_code=400, detail="Model file must exist inside the application directory")
+    try:
+        staged = models.stage(name, body.path)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=422, detail=f"Could not load or warm '{name}': {e}")
+    return {"message": "Model staged", "model": name, "staged": staged}
+
+@app.post("/admin/models/{name}/promote")
+def promote_model(name: str, request: Request):
+    require_admin(request)
+    admin_model_name(name)
+    try:
+        live = models.promote(name)
+    except (KeyError, LookupError) as e:
+        raise HTTPException(status_code=409, detail=e.args[0])
+    return {"message": "Model promoted", "model": name, "live": live}
+
+@app.post("/admin/models/{name}/rollback")
+def rollback_model(name: str, request: Request):
+    require_admin(request)
+    admin_model_name(name)
+    try:
+        live = models.rollback(name)
+    except (KeyError, LookupError) as e:
+        raise HTTPException(status_code=409, detail=e.args[0])
+    return {"message": "Model rolled back", "model": name, "live": live}
+
+@app.delete("/admin/models/{name}/stage")
+def discard_staged_model(name: str, request: Request):
+    require_admin(request)
+    admin_model_name(name)
+    if not models.discard(name):
+        raise HTTPException(status_code=404, detail=f"No staged version of '{name}'")
+    return {"message": "Staged model discarded", "model": name}
 
 # Db connection
 db = get_firestore_client()
@@ -187,6 +355,13 @@ async def get_user(username: str):
     user_data = user_snapshot.to_dict()
     user_data.pop("password", None)  # Remove sensitive data
 
+    # Return JSON response with avatar URL
+    return {
+        "user": user_data,
+        "avatar": avatar_url(username)  # Image URL
+    }
+
+def avatar_url(username: str):
     # Determine avatar file path
     avatar_filename = f"{username}.jpg"
     avatar_path = os.path.join(UPLOAD_DIR, avatar_filename)
@@ -197,13 +372,8 @@ async def get_user(username: str):
 
     if not os.path.exists(avatar_path):
         avatar_filename = "sample.png"  # Default avatar
-        avatar_path = os.path.join(UPLOAD_DIR, avatar_filename)
 
-    # Return JSON response with avatar URL
-    return {
-        "user": user_data,
-        "avatar": f"/avatars/{avatar_filename}"  # Image URL
-    }
+    return f"/avatars/{avatar_filename}"
 
 @app.get("/avatars/{filename}")
 async def get_avatar(filename: str):
@@ -425,13 +595,19 @@ async def get_user_logs(username: str):
 
 
 # Checkup Health risk
-MODEL_RISK = joblib.load("random_forest_helth_risk_pred.joblib")
+models.register_file("MODEL_RISK", "random_forest_helth_risk_pred.joblib", load_model)
 
 gender_encoding = {"Female": 0, "Male": 1, "O": 2}
 
 # Encoding for Family History
 family_history_encoding = {"No": 0, "Yes": 1}
 
+disease_risk_features = FeatureEncoder(
+    ["age", "gender", "family_history", "systolic_bp", "diastolic_bp", "heart_rate"],
+    {"gender": CategoryEncoder("gender", gender_encoding),
+     "family_history": CategoryEncoder("family history", family_history_encoding)}
+)
+
 # Define request schema
 class PatientData(BaseModel):
     age: float
@@ -446,21 +622,20 @@ def predict_disease_risk(data: PatientData):
     print(data)
     
 
-    # Encode categorical values
-    gender_encoded = gender_encoding.get(data.gender, -1)
-    family_history_encoded = family_history_encoding.get(data.family_history, -1)
-
-    # Ensure valid encoding
-    if gender_encoded == -1 or family_history_encoded == -1:
-        return {"error": "Invalid input for gender or family history!"}
+    return disease_risk(data.dict())
 
-    # Prepare input for model
-    input_data = np.array([[data.age, gender_encoded, family_history_encoded, data.systolic_bp, data.diastolic_bp, data.heart_rate]])
+def disease_risk(row):
+    # Encode categorical values and prepare input for model
+    try:
+        input_data = disease_risk_features.encode_one(row)
+    except UnknownCategoryError as e:
+        return {"error": str(e)}
 
     # Make prediction
-    predicted_risk = MODEL_RISK.predict(input_data)[0]
+    model, version = models.get_versioned("MODEL_RISK")
+    predicted_risk = model.predict(input_data)[0]
 
-    return {"Predicted Disease Risk (%)": round(predicted_risk, 2)}
+    return {"Predicted Disease Risk (%)": round(predicted_risk, 2), "model_version": version}
 
 
 # Medicines
@@ -477,43 +652,6 @@ class PrescriptionSchedule(BaseModel):
     medicines: List[Medicine]
     date_created: Optional[datetime] = datetime.utcnow()
 
-# Helper function to clean 'days' field and convert it to a number
-def clean_days(days: str) -> int:
-    # Extract numeric value from the string (e.g., "20 days" → 20)
-    match = re.search(r'(\d+)', days)
-    return int(match.group(1)) if match else 0
-
-# Helper function to clean 'dosage' field and convert it to a number
-def clean_dosage(dosage: str) -> int:
-    # Extract numeric value from the string (e.g., "250mg" → 250)
-    match = re.search(r'(\d+)', dosage)
-    return int(match.group(1)) if match else 0
-
-# Helper function to decode the 'interval' and return a list of schedule times
-def decode_interval(interval_list: List[str]) -> List[str]:
-    # Times for each part of the day
-    time_dict = {
-        0: '8:00 AM',   # Morning
-        1: '1:00 PM',   # Noon
-        2: '9:00 PM'    # Evening
-    }
-    
-    schedule = []
-
-    for interval in interval_list:
-        # Extract the numeric pattern (e.g., "1-0-0" from "1-0-0 before meal")
-        match = re.search(r'\b[01]-[01]-[01]\b', interval)
-        if match:
-            pattern = match.group()  # Extract matched pattern
-            parts = pattern.split('-')  # Convert to list
-            
-            # Decode the pattern into time slots
-            for idx, val in enumerate(parts):
-                if val == '1':  
-                    schedule.append(time_dict[idx])  # Add corresponding time
-
-    return schedule
-
 @app.post("/prescriptionSchedule")
 async def save_prescription(schedule: PrescriptionSchedule):
     try:
@@ -532,8 +670,11 @@ async def save_prescription(schedule: PrescriptionSchedule):
         # Convert date_created to Firestore-compatible format
         schedule_data["date_created"] = datetime.utcnow().isoformat()
 
-        # Store in Firestore
-        prescription_ref.set(schedule_data)
+        # Store in Firestore together with the user's materialized medication calendar
+        batch = db.batch()
+        batch.set(prescription_ref, schedule_data)
+        stage_calendar_update(batch, db, prescription_ref.id, new=schedule_data)
+        batch.commit()
 
         return {
             "message": "Prescription schedule saved successfully!",
@@ -555,27 +696,56 @@ async def get_prescriptions_by_user(user: str):
         if not prescriptions:
             raise HTTPException(status_code=404, detail="No prescriptions found for this user")
 
-        return {"user": user, "prescriptions": prescriptions}
+        return FastJSONResponse({"user": user, "prescriptions": prescriptions})
+    except HTTPException:
+        raise
     except Exception as e:
         error_trace = traceback.format_exc()
         print(f"Error: {e}\nTraceback:\n{error_trace}")
         raise HTTPException(status_code=500, detail=str(e))
 
+PRECONDITION_RETRIES = 5
+
+def commit_if_unchanged(ref, stage, not_found):
+    """
+    Optimistic write of one document that the change depends on: `stage(batch, snapshot, option)`
+    adds the writes, which commit only if the document still has the update time it was read
+    with. A concurrent edit makes the commit fail; it is then re-read and staged again.
+    """
+    for _ in range(PRECONDITION_RETRIES):
+        snapshot = ref.get()
+        if not snapshot.exists:
+            raise HTTPException(status_code=404, detail=not_found)
+        batch = db.batch()
+        stage(batch, snapshot, db.write_option(last_update_time=snapshot.update_time))
+        try:
+            batch.commit()
+            return snapshot
+        except FailedPrecondition:
+            continue
+        except NotFound:
+            raise HTTPException(status_code=404, detail=not_found)
+    raise HTTPException(status_code=409, detail="The document kept changing concurrently, please retry")
+
 # **2. Update a prescription schedule by ID**
 @app.put("/prescriptionSchedule/{prescription_id}")
 async def update_prescription(prescription_id: str, schedule: PrescriptionSchedule):
     try:
         prescription_ref = db.collection("prescription_schedules").document(prescription_id)
 
-        if not prescription_ref.get().exists:
-            raise HTTPException(status_code=404, detail="Prescription not found")
-
         schedule_data = schedule.dict()
         schedule_data["date_created"] = datetime.utcnow().isoformat()
 
-        prescription_ref.update(schedule_data)
+        # The calendar diff depends on the stored version, so it must not change before the commit
+        def stage(batch, snapshot, option):
+            batch.update(prescription_ref, schedule_data, option=option)
+            stage_calendar_update(batch, db, prescription_id, old=snapshot.to_dict(), new=schedule_data)
+
+        commit_if_unchanged(prescription_ref, stage, "Prescription not found")
 
         return {"message": "Prescription updated successfully", "data": schedule_data}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -585,16 +755,46 @@ async def delete_prescription(prescription_id: str):
     try:
         prescription_ref = db.collection("prescription_schedules").document(prescription_id)
 
-        if not prescription_ref.get().exists:
-            raise HTTPException(status_code=404, detail="Prescription not found")
+        def stage(batch, snapshot, option):
+            batch.delete(prescription_ref, option=option)
+            stage_calendar_update(batch, db, prescription_id, old=snapshot.to_dict())
 
-        prescription_ref.delete()
+        commit_if_unchanged(prescription_ref, stage, "Prescription not found")
 
         return {"message": "Prescription deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Dose reminders: a snapshot listener on prescription_schedules keeps them current, whichever
+# worker wrote the change. Off by default; set DOSE_REMINDERS=1 in exactly one worker process.
+DOSE_REMINDERS = os.getenv("DOSE_REMINDERS", "0") == "1"
+reminder_notifier = LocalNotifier()
+reminder_scheduler = DoseReminderScheduler(reminder_notifier)
+
+@app.on_event("startup")
+def start_dose_reminders():
+    if not DOSE_REMINDERS:
+        return
+    reminder_scheduler.watch(db)
+    reminder_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_dose_reminders():
+    reminder_scheduler.stop()
+
+@app.get("/reminders")
+async def get_reminder_stats():
+    return {"enabled": DOSE_REMINDERS, **reminder_scheduler.stats()}
+
+@app.get("/reminders/{user}")
+async def get_user_reminders(user: str):
+    """Upcoming dose reminders of a user (next due time per medicine and time) and the latest sent ones."""
+    return {"user": user, "pending": reminder_scheduler.pending(user), "sent": reminder_notifier.sent_to(user)}
+
+
 # Medicine Intakes 
 class MedicineIntake(BaseModel):
     medicine: str
@@ -648,12 +848,12 @@ async def update_medicine_intake(schedule_id: str, date_id: str, intake_record:
             .document(date_id)
         )
         
-        if not intake_ref.get().exists:
-            raise HTTPException(status_code=404, detail="No record found for this date")
-        
+        # update() only succeeds on an existing document: no separate existence read
         intake_ref.update({"takings": [taking.dict() for taking in intake_record.takings]})
         
         return {"message": "Medicine intake updated successfully!", "data": intake_record.dict()}
+    except NotFound:
+        raise HTTPException(status_code=404, detail="No record found for this date")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -667,12 +867,11 @@ async def delete_medicine_intake(schedule_id: str, date_id: str):
             .document(date_id)
         )
         
-        if not intake_ref.get().exists:
-            raise HTTPException(status_code=404, detail="No record found for this date")
-        
-        intake_ref.delete()
+        intake_ref.delete(option=db.write_option(exists=True))
         
         return {"message": "Medicine intake deleted successfully!"}
+    except NotFound:
+        raise HTTPException(status_code=404, detail="No record found for this date")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -688,7 +887,7 @@ async def get_all_medicine_intake(schedule_id: str):
         
         records = [doc.to_dict() | {"id": doc.id} for doc in docs]
         
-        return {"schedule_id": schedule_id, "intake_records": records}
+        return FastJSONResponse({"schedule_id": schedule_id, "intake_records": records})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -705,26 +904,70 @@ class MedicationRecord(BaseModel):
     schedule_id: Optional[str] = None
     medications: List[MedicationTake]
 
+MAX_BULK_RECORDS = 366
+BULK_BATCH_SIZE = 450  # Firestore allows 500 writes per batch
+
+class MedicationBulkRequest(BaseModel):
+    records: List[MedicationRecord]
+
 @app.post("/medication-daily/{username}/{date}")
-async def create_or_update_medication(username: str, date: str, record: MedicationRecord):
+async def create_or_update_medication(username: str, date: str, record: MedicationRecord,
+                                      background_tasks: BackgroundTasks):
     """
-    Creates or updates a medication record for a user on a specific date.
+    Creates or updates a medication record for a user on a specific date; the user's
+    adherence summary is updated after the response.
     """
+    if not iso_day(date):
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
     user_ref = db.collection("users").document(username)
     medication_ref = user_ref.collection("medication_takes").document(date)
-    
-    # Convert record to dictionary
-    record_data = record.dict()
-    
-    # Check if document exists
-    if medication_ref.get().exists:
-        # Update document
-        medication_ref.update(record_data)
-        return {"message": "Medication record updated successfully"}
-    else:
-        # Create new document
-        medication_ref.set(record_data)
-        return {"message": "Medication record created successfully"}
+
+    # Upsert in one round trip: merge creates the document or updates the given fields
+    medication_ref.set(record.dict(), merge=True)
+    background_tasks.add_task(refresh_adherence, db, username, [date])
+    return {"message": "Medication record saved successfully"}
+
+@app.post("/medication-daily/{username}")
+async def bulk_upsert_medication(username: str, request: MedicationBulkRequest, background_tasks: BackgroundTasks):
+    """
+    Creates or updates many daily medication records (e.g. an offline week of ticks) with
+    merge writes in as few WriteBatch commits as possible. Returns a result per date; the
+    adherence summary is updated with the saved dates after the response.
+    """
+    if len(request.records) > MAX_BULK_RECORDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_RECORDS} records per request")
+
+    medications_ref = db.collection("users").document(username).collection("medication_takes")
+    results, valid = {}, {}
+    for record in request.records:
+        if not iso_day(record.date):
+            results[record.date] = {"date": record.date, "status": "invalid", "error": "date must be YYYY-MM-DD"}
+            continue
+        valid[record.date] = record  # the last record of a repeated date wins
+
+    dates = list(valid)
+    for start in range(0, len(dates), BULK_BATCH_SIZE):
+        chunk = dates[start:start + BULK_BATCH_SIZE]
+        batch = db.batch()
+        for record_date in chunk:
+            batch.set(medications_ref.document(record_date), valid[record_date].dict(), merge=True)
+        try:
+            batch.commit()
+            status = {"status": "saved"}
+        except Exception as e:
+            status = {"status": "failed", "error": str(e)}
+        for record_date in chunk:
+            results[record_date] = {"date": record_date, **status}
+
+    saved = [record_date for record_date, result in results.items() if result["status"] == "saved"]
+    if saved:
+        background_tasks.add_task(refresh_adherence, db, username, saved)
+    failed = len(results) - len(saved)
+    return {
+        "message": "Medication records saved" if not failed else f"{failed} medication records not saved",
+        "saved": len(results) - failed,
+        "results": sorted(results.values(), key=lambda result: result["date"])
+    }
 
 @app.get("/medication-daily/{username}/{date}")
 async def get_medication_record(username: str, date: str):
@@ -759,7 +1002,75 @@ async def get_all_medication_records(username: str):
     if not records:
         raise HTTPException(status_code=404, detail="No medication records found")
     
-    return records
+    return FastJSONResponse(records)
+
+@app.get("/adherence/{username}")
+async def get_adherence(username: str):
+    """
+    Adherence analytics of a user: taken/missed and rate per medicine and per schedule
+    time, rolling 7/30-day rates and streaks. Served from the summary refreshed after
+    every medication record write, not from a scan of medication_takes.
+    """
+    return read_adherence(db, username)
+
+@app.post("/adherence/{username}/rebuild")
+async def rebuild_user_adherence(username: str):
+    """Recomputes the adherence summary from medication_takes, e.g. after manual data fixes."""
+    summary = rebuild_adherence(db, username)
+    return {"message": "Adherence summary rebuilt", "days_recorded": len(summary["days"])}
+
+@app.on_event("startup")
+def start_adherence_rollups():
+    # Every ADHERENCE_ROLLUP_HOURS; off (0) by default so only one worker, or cron running
+    # adherence_rollup.py, scans medication_takes
+    schedule_rollups(db)
+
+@app.get("/clinic/adherence")
+async def get_clinic_adherence(date: Optional[str] = None, include_patients: bool = True):
+    """
+    Population adherence for doctors: clinic-wide and per-medicine 7/30-day rates, daily
+    totals and per-patient rates from the latest rollup (or the one of `date`). Reads only
+    the rollup documents, never patients' medication_takes.
+    """
+    rollup = read_rollup(db, date, include_patients)
+    if rollup is None:
+        raise HTTPException(status_code=404, detail="No adherence rollup found")
+    return FastJSONResponse(rollup)
+
+@app.get("/clinic/adherence/history")
+async def get_clinic_adherence_history(limit: int = HISTORY_LIMIT):
+    """Clinic-wide window rates of the latest rollups, oldest first, for trend charts."""
+    return rollup_history(db, max(1, min(limit, HISTORY_LIMIT)))
+
+@app.post("/admin/adherence-rollup")
+def run_adherence_rollup(request: Request):
+    require_admin(request)
+    summary = run_rollup(db)
+    return {"message": "Adherence rollup written", "date": summary["date"], "patients": summary["patients"],
+            "seconds": summary["seconds"]}
+
+@app.get("/medication-calendar/{username}")
+async def get_medication_calendar(username: str, start: str, end: str):
+    """
+    Dose slots for every date from start to end (YYYY-MM-DD, inclusive), each with its
+    taken flag from medication_takes. Read from the calendar materialized on every
+    prescription save, so a month view is a single request.
+    """
+    try:
+        start_date, end_date = date.fromisoformat(start), date.fromisoformat(end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start and end must be YYYY-MM-DD dates")
+    if end_date < start_date or (end_date - start_date).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must be 1 to {MAX_RANGE_DAYS} days")
+
+    days = read_calendar(db, username, start_date, end_date)
+    return FastJSONResponse({"user": username, "start": start, "end": end, "days": days})
+
+@app.post("/medication-calendar/{username}/rebuild")
+async def rebuild_medication_calendar(username: str):
+    """Re-materializes the calendar from prescription_schedules, e.g. after manual data fixes."""
+    months = rebuild_calendar(db, username)
+    return {"message": "Medication calendar rebuilt", "months": sorted(months)}
 
 # Face Detction
 @app.post("/face-detection/upload")
@@ -772,6 +1083,7 @@ async def upload_face(file: UploadFile = File(...)):
 @app.post("/face-detection/recognize")
 async def recognize_face(user: FaceID):
     name = user.username
+    from face_detection import FaceRecognition
     face_rec = FaceRecognition()
     detected = face_rec.run_recognition(name)  
     print(detected)
@@ -781,6 +1093,15 @@ async def recognize_face(user: FaceID):
     # else:
     #     raise HTTPException(status_code=404, detail="Face not recognized")
 
+DOSAGE_COLUMNS = ['Name', 'Category', 'Dosage Form', 'Indication', 'Classification']
+
+# Every catalogue combination is predicted once per (encoders, model) version, see dosage_lookup.py
+dosage_lookup = DosageLookup(
+    DOSAGE_COLUMNS,
+    lambda: models.get_versioned("label_encoders"),
+    lambda: models.get_versioned("decision_tree_model_for_dosage")
+)
+
 def predict_drug_strength(drug_name, category, dosage_form, indication, classification):
     # Create a dictionary for the input
     input_data = {
@@ -791,31 +1112,25 @@ def predict_drug_strength(drug_name, category, dosage_form, indication, classifi
         'Classification': classification
     }
 
-    # Encode the input data using the label encoders
-    for col in input_data:
-        if col in label_encoders:
-            input_data[col] = label_encoders[col].transform([input_data[col]])[0]
-
-    # Convert the input into a DataFrame to match the model's expected input format
-    input_df = pd.DataFrame([input_data])
-
-    # Predict the strength using the loaded Decision Tree model
-    predicted_strength = decision_tree_model_for_dosage.predict(input_df)[0]
-
-    return predicted_strength
+    # Look the strength up in the table precomputed from the Decision Tree model
+    return dosage_lookup.suggest(input_data)
 
 @app.post("/medicine-suggetion-dosage")
 async def get_dosage(user: Drug):
-    # Call the prediction function with the input from the client
-    prediction = predict_drug_strength(
-        drug_name=user.drug_name,
-        category=user.category,
-        dosage_form=user.dosage_form,
-        indication=user.indication,
-        classification=user.classification
-    )
+    # On the threadpool: the first request, and the first after a promotion, builds the whole table
+    try:
+        prediction, version = await run_in_threadpool(
+            predict_drug_strength,
+            drug_name=user.drug_name,
+            category=user.category,
+            dosage_form=user.dosage_form,
+            indication=user.indication,
+            classification=user.classification
+        )
+    except UnknownCategoryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"message": "Prediction successful", "dosage": prediction}
+    return {"message": "Prediction successful", "dosage": prediction, "model_version": version}
 
 class ExerciseRequest(BaseModel):
     exerciseName: str
@@ -828,6 +1143,7 @@ def start_push_up():
 async def start_exercise(request: ExerciseRequest):
     try:
         if request.exerciseName.lower() == "jumping jack":
+            from exercises.jumping_jack_monitor_model import start_jumping_jack
             # Run in a thread to avoid blocking the event loop
             threading.Thread(target=start_jumping_jack, daemon=True).start()
             return JSONResponse(content={"message": "Jumping Jacks exercise started!"})
@@ -836,10 +1152,30 @@ async def start_exercise(request: ExerciseRequest):
             threading.Thread(target=start_push_up, daemon=True).start()
             return JSONResponse(content={"message": "Push Up exercise started!"})
         else:
+            from excercise_monitor import exe_launch
             exe_launch(request.exerciseName)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/reports")
+async def list_reports():
+    from report_service import report_service
+    return {"reports": report_service.list()}
+
+@app.get("/reports/{report_id}")
+async def get_report(report_id: str):
+    from report_service import report_service
+    report = report_service.get(report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    if report["status"] == "failed":
+        raise HTTPException(status_code=500, detail=report.get("error", "Report generation failed"))
+    if report["status"] != "ready":
+        return JSONResponse(status_code=202, content={"id": report_id, "status": report["status"]})
+
+    return FileResponse(report["path"], media_type="application/pdf", filename=report["filename"])
+
 class CaloriePredictionInput(BaseModel):
     age: int
     gender: str
@@ -860,6 +1196,13 @@ class CaloriePredictionInput(BaseModel):
 gender_mapping = {'Female': 0, 'Male': 1}
 workout_type_mapping = {'Cardio': 0, 'HIIT': 1, 'Strength': 2, 'Yoga': 3}
 
+calorie_features = FeatureEncoder(
+    ["age", "gender", "weight", "height", "max_bpm", "avg_bpm", "resting_bpm", "session_duration",
+     "workout_type", "fat_percentage", "water_intake", "workout_frequency", "experience_level", "bmi"],
+    {"gender": CategoryEncoder("gender", gender_mapping),
+     "workout_type": CategoryEncoder("workout_type", workout_type_mapping)}
+)
+
 def predict_calories_burned(age, gender, weight, height, max_bpm, avg_bpm, resting_bpm, session_duration,
                             workout_type, fat_percentage, water_intake, workout_frequency, experience_level, bmi):
     """
@@ -882,54 +1225,28 @@ def predict_calories_burned(age, gender, weight, height, max_bpm, avg_bpm, resti
         - bmi (float): BMI
         
     Returns:
-        - Predicted calories burned (float)
+        - Predicted calories burned (float) and the version of the model used (str)
     """
-    # Map categorical values
-    gender_encoded = gender_mapping.get(gender)
-    workout_type_encoded = workout_type_mapping.get(workout_type)
-    
-    # Check if mappings were successful
-    if gender_encoded is None or workout_type_encoded is None:
-        raise ValueError("Invalid categorical input. Please check 'gender' or 'workout_type' values.")
-    
-    # Construct input array
-    input_features = np.array([[age, gender_encoded, weight, height, max_bpm, avg_bpm, resting_bpm,
-                                 session_duration, workout_type_encoded, fat_percentage, water_intake,
-                                 workout_frequency, experience_level, bmi]])
+    # Map categorical values and construct input array (UnknownCategoryError for unmapped values)
+    input_features = calorie_features.encode_one({
+        "age": age, "gender": gender, "weight": weight, "height": height, "max_bpm": max_bpm,
+        "avg_bpm": avg_bpm, "resting_bpm": resting_bpm, "session_duration": session_duration,
+        "workout_type": workout_type, "fat_percentage": fat_percentage, "water_intake": water_intake,
+        "workout_frequency": workout_frequency, "experience_level": experience_level, "bmi": bmi
+    })
     
     # Predict using the trained model
-    prediction = calorie_ex_model.predict(input_features)
-    return prediction[0]
+    model, version = models.get_versioned("calorie_ex_model")
+    prediction = model.predict(input_features)
+    return prediction[0], version
 
 @app.post("/calories/predict")
 async def predict_calories(input_data: CaloriePredictionInput):
     try:
-        # Map categorical values
-        gender_encoded = gender_mapping.get(input_data.gender)
-        workout_type_encoded = workout_type_mapping.get(input_data.workout_type)
-
-        if gender_encoded is None or workout_type_encoded is None:
-            raise ValueError("Invalid categorical input. Check 'gender' or 'workout_type' values.")
-
-        # Prepare input for the prediction function
-        prediction = predict_calories_burned(
-            age=input_data.age,
-            gender=input_data.gender,
-            weight=input_data.weight,
-            height=input_data.height,
-            max_bpm=input_data.max_bpm,
-            avg_bpm=input_data.avg_bpm,
-            resting_bpm=input_data.resting_bpm,
-            session_duration=input_data.session_duration,
-            workout_type=input_data.workout_type,
-            fat_percentage=input_data.fat_percentage,
-            water_intake=input_data.water_intake,
-            workout_frequency=input_data.workout_frequency,
-            experience_level=input_data.experience_level,
-            bmi=input_data.bmi
-        )
+        # Categorical values are validated and mapped inside the prediction function
+        prediction, version = predict_calories_burned(**input_data.dict())
 
-        return {"predicted_calories_burned": prediction}
+        return {"predicted_calories_burned": prediction, "model_version": version}
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -955,6 +1272,39 @@ class ExerciseSchedule(BaseModel):
 
 # Firestore collections
 EXERCISE_SCHEDULES_COLLECTION = "exercise_schedules"
+# Range listings use the user+date and user+end_date composite indexes in firestore.indexes.json
+SCHEDULE_WINDOWS = ("active", "upcoming", "past")
+MAX_SCHEDULE_PAGE = 200
+DELETE_BATCH_SIZE = 450  # Firestore allows 500 writes per batch
+
+def delete_in_batches(query):
+    """Delete every document `query` matches, reading only references, in batched writes."""
+    deleted, batch = 0, db.batch()
+    for doc in query.select([]).stream():
+        batch.delete(doc.reference)
+        deleted += 1
+        if deleted % DELETE_BATCH_SIZE == 0:
+            batch.commit()
+            batch = db.batch()
+    if deleted % DELETE_BATCH_SIZE:
+        batch.commit()
+    return deleted
+
+def backfill_end_dates():
+    """Set end_date = date on schedules saved with an empty or missing end_date, in batched writes."""
+    updated, batch = 0, db.batch()
+    for doc in db.collection(EXERCISE_SCHEDULES_COLLECTION).select(["date", "end_date"]).stream():
+        schedule = doc.to_dict()
+        if schedule.get("end_date") or not schedule.get("date"):
+            continue
+        batch.update(doc.reference, {"end_date": schedule["date"]})
+        updated += 1
+        if updated % DELETE_BATCH_SIZE == 0:
+            batch.commit()
+            batch = db.batch()
+    if updated % DELETE_BATCH_SIZE:
+        batch.commit()
+    return updated
 
 # 1. Create an exercise schedule
 @app.post("/exercise_schedules", response_model=ExerciseSchedule)
@@ -962,7 +1312,7 @@ async def create_schedule(schedule: ExerciseSchedule):
     # Create a new document in Firestore
     schedule_ref = db.collection(EXERCISE_SCHEDULES_COLLECTION).add({
         "date": schedule.date,
-        "end_date": schedule.end_date,
+        "end_date": schedule.end_date or schedule.date,  # single-day schedules still match range queries
         "activities": [activity.dict() for activity in schedule.activities],
         "user": schedule.user,
         "title": schedule.title
@@ -971,25 +1321,54 @@ async def create_schedule(schedule: ExerciseSchedule):
     # Return the created schedule
     return schedule
 
-# 2. Get all exercise schedules by user
-@app.get("/exercise_schedules/{user}", response_model=List[ExerciseSchedule])
-async def get_all_schedules_by_user(user: str):
+# 2. Get exercise schedules by user: all of them, or those active on / upcoming after / past before a date
+# Returned as FastJSONResponse, which bypasses response_model; `responses` keeps the documented schema
+@app.get("/exercise_schedules/{user}", responses={200: {"model": List[ExerciseSchedule]}})
+async def get_all_schedules_by_user(user: str, when: Optional[str] = None, on: Optional[str] = None,
+                                    limit: int = MAX_SCHEDULE_PAGE):
     # Query Firestore for schedules by user
     schedules_ref = db.collection(EXERCISE_SCHEDULES_COLLECTION).where("user", "==", user)
+
+    if when is not None:
+        if when not in SCHEDULE_WINDOWS:
+            raise HTTPException(status_code=400, detail=f"when must be one of {', '.join(SCHEDULE_WINDOWS)}")
+        on = on or date.today().isoformat()
+        try:
+            date.fromisoformat(on)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="on must be a YYYY-MM-DD date")
+        limit = max(1, min(limit, MAX_SCHEDULE_PAGE))
+        if when == "upcoming":
+            schedules_ref = schedules_ref.where("date", ">", on).order_by("date")
+        elif when == "past":
+            # end_date > "" leaves out legacy schedules with an empty end_date until they are backfilled
+            schedules_ref = (
+                schedules_ref.where("end_date", ">", "").where("end_date", "<", on)
+                .order_by("end_date", direction=firestore.Query.DESCENDING)
+            )
+        else:
+            # Only schedules not yet ended are read; those not yet started are dropped below
+            schedules_ref = schedules_ref.where("end_date", ">=", on).order_by("end_date")
+        if when != "active":
+            schedules_ref = schedules_ref.limit(limit)
+
     schedules = []
     
-    # Fetch all documents
+    # Fetch the matching documents
     for doc in schedules_ref.stream():
         schedule_data = doc.to_dict()
+        if when == "active" and (schedule_data.get("date") or "") > on:
+            continue
         schedule_data['id'] = doc.id  # Add document ID to the schedule data
         schedules.append(schedule_data)
+        if when == "active" and len(schedules) == limit:
+            break
     
-    print(schedules)
-    if not schedules:
+    if not schedules and when is None:
         raise HTTPException(status_code=404, detail="No schedules found for this user")
     
-    # Convert Firestore data back to ExerciseSchedule model
-    return [ExerciseSchedule(**schedule) for schedule in schedules]
+    # Written only through the validated endpoints above: serialized as stored, without re-validation
+    return FastJSONResponse(schedules)
 
 # 3. Get a specific exercise schedule by ID
 @app.get("/exercise_schedules/id/{schedule_id}", response_model=ExerciseSchedule)
@@ -1008,19 +1387,19 @@ async def get_schedule(schedule_id: str):
 async def update_schedule(schedule_id: str, schedule: ExerciseSchedule):
     # Retrieve the document by its ID
     schedule_ref = db.collection(EXERCISE_SCHEDULES_COLLECTION).document(schedule_id)
-    existing_schedule = schedule_ref.get()
 
-    if not existing_schedule.exists:
+    # Update the schedule with the new data; update() fails if the document does not exist
+    try:
+        schedule_ref.update({
+            "date": schedule.date,
+            "end_date": schedule.end_date or schedule.date,
+            "activities": [activity.dict() for activity in schedule.activities],
+            "user": schedule.user,
+            "title": schedule.title
+        })
+    except NotFound:
         raise HTTPException(status_code=404, detail="Schedule not found")
     
-    # Update the schedule with the new data
-    schedule_ref.update({
-        "date": schedule.date,
-        "activities": [activity.dict() for activity in schedule.activities],
-        "user": schedule.user,
-        "title": schedule.title
-    })
-    
     return schedule
 
 # 5. Delete an exercise schedule by ID
@@ -1028,32 +1407,49 @@ async def update_schedule(schedule_id: str, schedule: ExerciseSchedule):
 async def delete_schedule(schedule_id: str):
     # Retrieve the document by its ID
     schedule_ref = db.collection(EXERCISE_SCHEDULES_COLLECTION).document(schedule_id)
-    existing_schedule = schedule_ref.get()
 
-    if not existing_schedule.exists:
+    # Delete the schedule, only if it exists
+    try:
+        schedule_ref.delete(option=db.write_option(exists=True))
+    except NotFound:
         raise HTTPException(status_code=404, detail="Schedule not found")
-    
-    # Delete the schedule
-    schedule_ref.delete()
     return {"message": "Schedule deleted successfully"}
 
 
 @app.delete("/exercise_schedules/title/{title}", status_code=204)
-async def delete_schedule_by_title(title: str):
-    # Query Firestore for schedule by title
+async def delete_schedule_by_title(title: str, user: Optional[str] = None):
+    # Query Firestore for schedule by title, within one user's schedules when given
     schedules_ref = db.collection(EXERCISE_SCHEDULES_COLLECTION).where("title", "==", title)
-    schedules = list(schedules_ref.stream())
-    
-    if not schedules:
-        raise HTTPException(status_code=404, detail="Schedule with the given title not found")
+    if user is not None:
+        schedules_ref = schedules_ref.where("user", "==", user)
     
     # Delete the schedules with the matching title
-    for schedule in schedules:
-        schedule_ref = db.collection(EXERCISE_SCHEDULES_COLLECTION).document(schedule.id)
-        schedule_ref.delete()
+    if not delete_in_batches(schedules_ref):
+        raise HTTPException(status_code=404, detail="Schedule with the given title not found")
     
     return {"message": "Schedule(s) deleted successfully"}
 
+@app.delete("/exercise_schedules/{user}")
+async def delete_past_schedules(user: str, ended_before: str):
+    """Deletes a user's schedules that ended before a date (YYYY-MM-DD), in batched writes."""
+    try:
+        date.fromisoformat(ended_before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ended_before must be a YYYY-MM-DD date")
+    schedules_ref = (
+        db.collection(EXERCISE_SCHEDULES_COLLECTION)
+        .where("user", "==", user)
+        .where("end_date", ">", "")  # never an empty legacy end_date, which sorts before every date
+        .where("end_date", "<", ended_before)
+    )
+    return {"message": "Past schedules deleted", "deleted": delete_in_batches(schedules_ref)}
+
+@app.post("/admin/exercise-schedules/backfill-end-dates")
+def backfill_schedule_end_dates(request: Request):
+    """One-off repair of schedules saved before end_date defaulted to date, so range listings include them."""
+    require_admin(request)
+    return {"message": "Schedule end dates backfilled", "updated": backfill_end_dates()}
+
 
 # Diet Suggetions 
 class RecommendationRequest(BaseModel):
@@ -1062,10 +1458,11 @@ class RecommendationRequest(BaseModel):
     ingredient_filter: Optional[List[str]] = None
 
 # Processed Dataset
-try:
-    dataset = pd.read_csv('diets/dataset.csv') 
-except Exception as e:
-    raise RuntimeError(f"Failed to load dataset: {str(e)}")
+def load_dataset():
+    try:
+        return pd.read_csv('diets/dataset.csv') 
+    except Exception as e:
+        raise RuntimeError(f"Failed to load dataset: {str(e)}")
 
 def scaling(dataframe):
     scaler = StandardScaler()
@@ -1101,6 +1498,12 @@ def recommand(dataframe, _input, max_nutritional_values, ingredient_filter=None,
     pipeline = build_pipeline(neigh, scaler, params)
     return apply_pipeline(pipeline, _input, extracted_data)
 
+def warm_recipes(dataframe):
+    # No filters, so the scaler and nearest-neighbour search run over the whole dataset once
+    recommand(dataframe, np.zeros((1, 9)), dict.fromkeys(range(9), float("inf")))
+
+models.register("dataset", load_dataset, warm=warm_recipes)
+
 
 # API endpoint
 @app.post("/recommend_recipe")
@@ -1117,7 +1520,7 @@ async def recommend_recipe(request: RecommendationRequest):
 
         # Generate a recommendation
         recommended_recipes = recommand(
-            dataframe=dataset,
+            dataframe=models["dataset"],
             _input=test_input,
             max_nutritional_values=max_nutritional_values,
             ingredient_filter=ingredient_filter
@@ -1177,17 +1580,27 @@ async def get_prescriptions_by_user(user: str):
 @app.put("/prescription/update/{record_id}")
 async def update_prescription(record_id: str, record: PrescriptionRetrieveRecord):
     prescription_ref = db.collection("prescriptions").document(record_id)
-    if not prescription_ref.get().exists:
-        raise HTTPException(status_code=404, detail="Prescription record not found")
 
     prescription_data = record.dict()
-    prescription_ref.update(prescription_data)
+    try:
+        prescription_ref.update(prescription_data)  # fails if the record does not exist
+    except NotFound:
+        raise HTTPException(status_code=404, detail="Prescription record not found")
     return {"message": "Prescription record updated successfully"}
 
 
 # Drug Adherence
-nlp = spacy.load('en_core_web_sm')
-reader = easyocr.Reader(['en'])  
+def load_nlp():
+    import spacy
+    import scispacy
+    return spacy.load('en_core_web_sm')
+
+def load_ocr_reader():
+    import easyocr
+    return easyocr.Reader(['en'])
+
+models.register("nlp", load_nlp, warm=lambda nlp: nlp("Take one tablet of paracetamol 500 mg twice daily for 5 days."))
+models.register("reader", load_ocr_reader, warm=lambda reader: reader.readtext(np.full((64, 256, 3), 255, dtype=np.uint8)))
 
 class PrescriptionParsedInfo(BaseModel):
     recognized_text: str
@@ -1200,7 +1613,7 @@ async def recognize_and_parse_prescription(file: UploadFile = File(...)):
         with open(file_path, "wb") as buffer:
             buffer.write(await file.read())
 
-        result = reader.readtext(file_path)
+        result = models["reader"].readtext(file_path)
         recognized_text = "\n".join([text[1] for text in result])
         print(recognized_text)
         parsed_info = parse_prescription(recognized_text)
@@ -1249,7 +1662,7 @@ def parse_prescription(text: str) -> List[Tuple[str, str]]:
     Parse prescription details from the text using SpaCy.
     Returns a list of tuples containing the extracted entities.
     """
-    doc = nlp(text)
+    doc = models["nlp"](text)
     extracted_entities = []
     for ent in doc.ents:
         if ent.label_ in ("DRUG", "QUANTITY", "TIME"):
@@ -1297,7 +1710,7 @@ async def recognize_and_parse_prescription(file: UploadFile = File(...)):
         print("OCR Extracted:", cleaned_text)
 
         # Step 3: Use spaCy/SciSpacy to extract drug names
-        doc = nlp(cleaned_text)
+        doc = models["nlp"](cleaned_text)
         drug_names = [ent.text for ent in doc.ents if ent.label_ == "CHEMICAL"]
 
         # Optional: Extract dosage info near each drug (simple heuristic)
@@ -1325,7 +1738,10 @@ async def recognize_and_parse_prescription(file: UploadFile = File(...)):
 
 
 # IoT Heart Risk
-MODEL_HR = joblib.load("iot_model_random_forest.joblib")
+models.register_file("MODEL_HR", "iot_model_random_forest.joblib", load_model)
+heart_condition_cache = register_prediction_cache("MODEL_HR", {
+    "age": 1, "gender": 0, "bmi": 0.1, "heart_rate": 1, "spo2": 1, "ecg_raw_data": 0.01
+})
 
 class PatientIOTData(BaseModel):
     age: int
@@ -1338,26 +1754,154 @@ class PatientIOTData(BaseModel):
 # Define the prediction function
 def predict_heart_condition(age, gender, bmi, heart_rate, spo2, ecg_raw_data):
     input_data = np.array([[age, gender, bmi, heart_rate, spo2, ecg_raw_data]])
-    prediction = MODEL_HR.predict(input_data)[0]  # Use predict instead of predict_proba
+    model, version = models.get_versioned("MODEL_HR")
+    features = {"age": age, "gender": gender, "bmi": bmi, "heart_rate": heart_rate, "spo2": spo2, "ecg_raw_data": ecg_raw_data}
+    # Use predict instead of predict_proba; repeated resting readings are served from the cache
+    prediction = heart_condition_cache.get_or_compute(version, features, lambda: model.predict(input_data)[0])
     confidence = None  # For regression, confidence isn't a direct output
-    return prediction, confidence
+    return prediction, confidence, version
 
 # API Endpoint for prediction
 @app.post("/predict_heart_condition")
 def predict(data: PatientIOTData):
-    prediction, confidence = predict_heart_condition(
+    prediction, confidence, version = predict_heart_condition(
         data.age, data.gender, data.bmi, data.heart_rate, data.spo2, data.ecg_raw_data
     )
 
     print(prediction)
     return {
         "prediction": prediction,
-        "confidence": confidence  # You can remove this if it's not applicable in regression
+        "confidence": confidence,  # You can remove this if it's not applicable in regression
+        "model_version": version
     }
 
 
+# IoT vitals streaming: devices push samples continuously, MODEL_HR re-scores per closed window
+def score_vitals(rows):
+    model, version = models.get_versioned("MODEL_HR")
+    return model.predict(rows), version
+
+# Every accepted sample is also persisted, for trend views and re-scoring
+vitals_store = VitalsStore()
+vitals_hub = VitalsStreamHub(score_vitals, sink=vitals_store.append)
+
+@app.on_event("startup")
+def start_vitals_flusher():
+    # Buffers of streams that went quiet are written after VITALS_FLUSH_SECONDS, not only at shutdown
+    vitals_store.start_flusher()
+
+@app.on_event("shutdown")
+def flush_vitals():
+    vitals_store.flush()
+
+class VitalsProfile(BaseModel):
+    age: int
+    gender: int  # 0 for Female, 1 for Male
+    bmi: float
+
+def ingest_vitals(patient_id, profile, times, values):
+    """Ingest into the patient's stream, reopening it with `profile` if it was evicted while idle."""
+    try:
+        return vitals_hub.ingest(patient_id, times, values)
+    except KeyError:
+        vitals_hub.open(patient_id, profile)
+        return vitals_hub.ingest(patient_id, times, values)
+
+@app.websocket("/ws/vitals/{patient_id}")
+async def vitals_socket(websocket: WebSocket, patient_id: str):
+    """
+    First message: {"age", "gender", "bmi"}. Then any number of sample messages
+    (one sample, a list, or columnar arrays, see vitals_stream.samples_to_array).
+    A message is sent back only when a window closes or a threshold is crossed.
+    """
+    await websocket.accept()
+    try:
+        profile = VitalsProfile(**await websocket.receive_json())
+    except (ValidationError, ValueError, TypeError):
+        await websocket.close(code=1003, reason="First message must be the patient profile")
+        return
+    profile = profile.dict()
+    vitals_hub.open(patient_id, profile)
+
+    try:
+        while True:
+            try:
+                # ValueError covers malformed JSON as well as invalid samples. Scoring (and a first
+                # model load) and the store's chunk writes run on the threadpool, off the event loop
+                times, values = samples_to_array(await websocket.receive_json())
+                events = await run_in_threadpool(ingest_vitals, patient_id, profile, times, values)
+            except ValueError as e:
+                await websocket.send_json({"error": str(e)})
+                continue
+            for event in events:
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+
+@app.post("/vitals/{patient_id}/stream")
+async def stream_vitals(patient_id: str, request: Request, age: int, gender: int, bmi: float):
+    """Chunked upload of newline-delimited JSON samples; every chunk is ingested as it arrives."""
+    profile = {"age": age, "gender": gender, "bmi": bmi}
+    vitals_hub.open(patient_id, profile)
+    events, samples, pending = [], 0, b""
+
+    def ingest_lines(lines):
+        rows = [json.loads(line) for line in lines if line.strip()]
+        if not rows:
+            return 0
+        times, values = samples_to_array(rows)
+        events.extend(ingest_vitals(patient_id, profile, times, values))
+        return len(times)
+
+    try:
+        async for chunk in request.stream():
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            samples += await run_in_threadpool(ingest_lines, lines)
+        samples += await run_in_threadpool(ingest_lines, [pending])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid sample after {samples} accepted: {e}")
+    return {"samples": samples, "events": events}
+
+@app.get("/vitals/{patient_id}")
+def get_vitals(patient_id: str):
+    snapshot = vitals_hub.snapshot(patient_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="No live stream for this patient")
+    return snapshot
+
+@app.get("/vitals")
+def get_vitals_stats():
+    return vitals_hub.stats()
+
+@app.get("/vitals/{patient_id}/samples")
+def get_vitals_samples(patient_id: str, start: float, end: float):
+    """Raw stored samples with start <= t < end (epoch seconds), as columns."""
+    times, values = vitals_store.query(patient_id, start, end)
+    # Columns go to orjson as arrays, no per-sample Python floats
+    return FastJSONResponse({"t": times, **{name: np.ascontiguousarray(values[:, i]) for i, name in enumerate(SAMPLE_FIELDS)}})
+
+@app.get("/vitals/{patient_id}/rollup")
+def get_vitals_rollup(patient_id: str, start: float, end: float, resolution: str = "1m"):
+    """Per-bucket count and mean/min/max of every field, at 1s, 1m or 1h resolution."""
+    try:
+        rollup = vitals_store.rollup(patient_id, resolution, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({
+        "resolution": resolution,
+        "bucket": np.ascontiguousarray(rollup["bucket"]),
+        "count": np.ascontiguousarray(rollup["count"]),
+        **{name: {stat: np.ascontiguousarray(rollup[stat][:, i]) for stat in ("mean", "min", "max")}
+           for i, name in enumerate(SAMPLE_FIELDS)}
+    })
+
+
 # Predict Heard condition (High Accurate)
-HEART_ACC_MODEL = joblib.load("random_forest_heart_risk_model.joblib")
+models.register_file("HEART_ACC_MODEL", "random_forest_heart_risk_model.joblib", load_model)
+heart_attack_cache = register_prediction_cache("HEART_ACC_MODEL", {
+    "age": 1, "bmi": 0.1, "resting_bp": 1, "spo2": 0.5, "ecg": 0.01
+})
 
 class PatientData(BaseModel):
     age: int
@@ -1376,19 +1920,23 @@ def predict_heart_attack_risk(data: PatientData):
         data (PatientData): Patient details with Age, BMI, RestingBP, Spo2, ECG.
 
     Returns:
-        tuple: (risk, confidence) - where risk is 1 or 0, and confidence is the probability of the prediction.
+        tuple: (risk, confidence, version) - where risk is 1 or 0, confidence is the probability of the prediction
+        and version is the model version that produced both.
     """
     # Convert input data to numpy array
     input_data = np.array([[data.age, data.bmi, data.resting_bp, data.spo2, data.ecg]])
 
-    # Make prediction and get confidence score (probability)
-    prediction = HEART_ACC_MODEL.predict(input_data)  # 0 or 1 (risk)
-    confidence = HEART_ACC_MODEL.predict_proba(input_data)  # Get class probabilities
+    # Make prediction and get confidence score (probability), both from the same model version
+    model, version = models.get_versioned("HEART_ACC_MODEL")
 
-    # Get the probability of the "High Risk" class (class 1)
-    risk_confidence = confidence[0][1]  # Confidence of "High Risk" (1)
+    def compute():
+        prediction = model.predict(input_data)  # 0 or 1 (risk)
+        confidence = model.predict_proba(input_data)  # Get class probabilities
+        # Get the probability of the "High Risk" class (class 1)
+        return int(prediction[0]), confidence[0][1]  # Confidence of "High Risk" (1)
 
-    return int(prediction[0]), risk_confidence
+    risk, risk_confidence = heart_attack_cache.get_or_compute(version, data.dict(), compute)
+    return risk, risk_confidence, version
 
 # API endpoint for prediction
 @app.post("/predict-heart-heart-risk2")
@@ -1396,14 +1944,18 @@ async def predict_risk(patient: PatientData):
     """
     API Endpoint: Predicts heart attack risk based on input parameters.
     """
-    risk, confidence = predict_heart_attack_risk(patient)
+    return heart_attack_response(patient)
+
+def heart_attack_response(patient: PatientData):
+    risk, confidence, version = predict_heart_attack_risk(patient)
     return {
         "heart_attack_risk": "Risk" if risk == 1 else "Not Risk",
-        "confidence_rate": round(confidence * 100, 2)  # Return confidence as a percentage
+        "confidence_rate": round(confidence * 100, 2),  # Return confidence as a percentage
+        "model_version": version
     }
 
 
-HEART_ACC_MODEL_2 = joblib.load("model_heart.joblib")
+models.register_file("HEART_ACC_MODEL_2", "model_heart.joblib", load_model)
 
 class HeartDiseaseInput2(BaseModel):
     age: int
@@ -1432,7 +1984,8 @@ def predict_heart_disease2(data: HeartDiseaseInput2):
     input_data_as_numpy_array = np.asarray(input_data).reshape(1, -1)
 
     # Make prediction
-    prediction = HEART_ACC_MODEL_2.predict(input_data_as_numpy_array)
+    model, version = models.get_versioned("HEART_ACC_MODEL_2")
+    prediction = model.predict(input_data_as_numpy_array)
 
     # Return response
     if prediction[0] == 0:
@@ -1442,9 +1995,235 @@ def predict_heart_disease2(data: HeartDiseaseInput2):
 
     return {
         "prediction": int(prediction[0]),
-        "result": result
+        "result": result,
+        "model_version": version
+    }
+
+# Cardiac assessment: every cardiac model scored concurrently from one shared feature record
+CARDIAC_MODELS = {
+    "heart_attack_risk": "HEART_ACC_MODEL",
+    "heart_disease": "HEART_ACC_MODEL_2",
+    "heart_condition": "MODEL_HR",
+    "health_risk": "MODEL_RISK",
+}
+
+class CardiacAssessmentInput(BaseModel):
+    age: int
+    gender: str = "Male"  # "Male" or "Female"
+    bmi: float = 20
+    heart_rate: float = 70  # resting pulse, bpm
+    spo2: float = 98
+    ecg: float = 0  # raw device reading
+    systolic_bp: int = 120
+    diastolic_bp: int = 80
+    cholesterol: int = 200
+    diabetes: bool = False
+    family_history: bool = False
+    max_heart_rate: int = 150
+    # Clinical fields only HEART_ACC_MODEL_2 uses, defaulted as the app sends them
+    cp: int = 0
+    restecg: int = 0
+    exang: int = 0
+    oldpeak: float = 0.0
+    slope: int = 1
+    ca: int = 0
+    thal: int = 2
+
+def heart_condition_response(age, gender, bmi, heart_rate, spo2, ecg_raw_data):
+    prediction, confidence, version = predict_heart_condition(age, gender, bmi, heart_rate, spo2, ecg_raw_data)
+    return {"prediction": float(prediction), "confidence": confidence, "model_version": version}
+
+def cardiac_scorers(record: CardiacAssessmentInput):
+    """
+    One callable per CARDIAC_MODELS entry, each mapping the shared record onto its model's inputs.
+    HEART_ACC_MODEL (RestingBP) and HEART_ACC_MODEL_2 (trestbps) were trained on resting blood
+    pressure in mmHg, so both take the systolic pressure, never the pulse.
+    """
+    sex = 0 if record.gender == "Female" else 1
+    return {
+        "heart_attack_risk": lambda: heart_attack_response(PatientData(
+            age=record.age, bmi=record.bmi, resting_bp=record.systolic_bp, spo2=record.spo2, ecg=record.ecg
+        )),
+        "heart_disease": lambda: predict_heart_disease2(HeartDiseaseInput2(
+            age=record.age, sex=sex, cp=record.cp, trestbps=record.systolic_bp, chol=record.cholesterol,
+            fbs=int(record.diabetes), restecg=record.restecg, thalach=record.max_heart_rate, exang=record.exang,
+            oldpeak=record.oldpeak, slope=record.slope, ca=record.ca, thal=record.thal
+        )),
+        "heart_condition": lambda: heart_condition_response(
+            record.age, sex, record.bmi, int(record.heart_rate), int(record.spo2), record.ecg
+        ),
+        "health_risk": lambda: disease_risk({
+            "age": record.age, "gender": record.gender, "family_history": "Yes" if record.family_history else "No",
+            "systolic_bp": record.systolic_bp, "diastolic_bp": record.diastolic_bp, "heart_rate": record.heart_rate
+        }),
     }
 
+def timed(fn):
+    start = time.perf_counter()
+    try:
+        result, error = fn(), None
+    except Exception as e:
+        result, error = None, str(e)
+    return result, error, round((time.perf_counter() - start) * 1000, 3)
+
+async def run_concurrently(tasks):
+    """Run named blocking callables on the threadpool at once: {name: (result, error, milliseconds)}."""
+    outcomes = await asyncio.gather(*(run_in_threadpool(timed, task) for task in tasks.values()))
+    return dict(zip(tasks, outcomes))
+
+@app.post("/cardiac-assessment")
+async def cardiac_assessment(record: CardiacAssessmentInput, include: str = ",".join(CARDIAC_MODELS)):
+    """
+    Scores of HEART_ACC_MODEL, HEART_ACC_MODEL_2, MODEL_HR and MODEL_RISK (or the `include`
+    subset) for one patient in a single request, run concurrently, with per-model timing.
+    Each score keeps the response shape of the model's own endpoint.
+    """
+    names = [name.strip() for name in include.split(",") if name.strip()]
+    unknown = set(names) - set(CARDIAC_MODELS)
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"Choose models from {list(CARDIAC_MODELS)}")
+
+    start = time.perf_counter()
+    scorers = cardiac_scorers(record)
+    outcomes = await run_concurrently({name: scorers[name] for name in names})
+    body = {"scores": {}, "timing_ms": {}}
+    for name, (result, error, milliseconds) in outcomes.items():
+        body["timing_ms"][name] = milliseconds
+        if error is None:
+            body["scores"][name] = {"model": CARDIAC_MODELS[name], **result}
+        else:
+            body.setdefault("errors", {})[name] = error
+    body["timing_ms"]["total"] = round((time.perf_counter() - start) * 1000, 3)
+    return body
+
+# Dashboard bundle: everything a page needs on mount in one request
+DASHBOARD_SECTIONS = ("user", "health", "avatar", "schedules", "predictions")
+DASHBOARD_PREDICTIONS = ("health_risk", "heart_attack_risk", "heart_disease")
+DASHBOARD_SCHEDULE_LIMIT = 5
+
+def age_from_dob(dob):
+    try:
+        born = date.fromisoformat(str(dob)[:10])
+    except ValueError:
+        return None
+    today = date.today()
+    return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+def dashboard_record(health, heart_rate, spo2, ecg):
+    """The shared cardiac record of a user from personal_health and vitals; PersonalPredictions.js sends the same."""
+    try:
+        systolic, diastolic = (int(value) for value in str(health.get("blood_pressure")).split("/"))
+    except ValueError:
+        systolic, diastolic = 120, 80
+    return CardiacAssessmentInput(
+        age=age_from_dob(health.get("dob")) or health.get("age") or 30,
+        gender=health.get("gender") or "Male",
+        bmi=health.get("bmi") or 20,
+        heart_rate=heart_rate or 70,
+        spo2=spo2 or 98,
+        ecg=ecg or 0,
+        systolic_bp=systolic,
+        diastolic_bp=diastolic,
+        cholesterol=health.get("cholesterol") or 200,
+        diabetes=bool(health.get("diabetes")),
+        family_history=bool(health.get("heart_diseases")),
+        max_heart_rate=health.get("max_bpm") or 150
+    )
+
+
+def latest_prescription_schedules(username):
+    query = (
+        db.collection("prescription_schedules")
+        .where("user", "==", username)
+        .order_by("date_created", direction=firestore.Query.DESCENDING)
+        .limit(DASHBOARD_SCHEDULE_LIMIT)
+    )
+    return [doc.to_dict() | {"id": doc.id} for doc in query.stream()]
+
+def latest_exercise_schedules(username):
+    query = (
+        db.collection(EXERCISE_SCHEDULES_COLLECTION)
+        .where("user", "==", username)
+        .order_by("date", direction=firestore.Query.DESCENDING)
+        .limit(DASHBOARD_SCHEDULE_LIMIT)
+    )
+    return [doc.to_dict() | {"id": doc.id} for doc in query.stream()]
+
+@app.get("/dashboard/{username}")
+async def get_dashboard(username: str, include: str = ",".join(DASHBOARD_SECTIONS),
+                        heart_rate: Optional[float] = None, spo2: Optional[float] = None, ecg: Optional[float] = None):
+    """
+    User, personal health, avatar, latest prescription and exercise schedules and the risk
+    predictions in one response, fetched concurrently. `include` is a comma-separated subset
+    of the sections. Predictions use the given vitals, else the live stream's open window.
+    A failing schedule or prediction is reported under `errors` instead of failing the page.
+    """
+    sections = {section.strip() for section in include.split(",") if section.strip()}
+    unknown = sections - set(DASHBOARD_SECTIONS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections {sorted(unknown)}; choose from {list(DASHBOARD_SECTIONS)}")
+
+    user_ref = db.collection("users").document(username)
+    health_ref = db.collection("personal_health").document(username)
+    # User and health in one batched read, concurrently with the schedule queries
+    documents = None
+    if sections & {"user", "health", "predictions"}:
+        documents = asyncio.ensure_future(run_in_threadpool(
+            lambda: {doc.reference.path: doc for doc in db.get_all([user_ref, health_ref])}
+        ))
+    schedules = None
+    if "schedules" in sections:
+        schedules = asyncio.gather(
+            run_in_threadpool(latest_prescription_schedules, username),
+            run_in_threadpool(latest_exercise_schedules, username),
+            return_exceptions=True
+        )
+
+    body, errors = {"username": username}, {}
+    if documents is not None:
+        snapshots = await documents
+        user_doc, health_doc = snapshots[user_ref.path], snapshots[health_ref.path]
+        if not user_doc.exists:
+            raise HTTPException(status_code=404, detail="User not found")
+        if "user" in sections:
+            body["user"] = {key: value for key, value in user_doc.to_dict().items() if key != "password"}
+        if health_doc.exists:
+            health_data = health_doc.to_dict()
+        else:
+            # Same defaults /users/{username}/all would create, shown without writing them from a GET
+            health_data = PersonalHealth(user=username).dict()
+        if "health" in sections:
+            body["personal_health"] = health_data
+
+        if "predictions" in sections:
+            window = (vitals_hub.snapshot(username) or {}).get("open_window") or {}
+            scorers = cardiac_scorers(dashboard_record(
+                health_data,
+                heart_rate if heart_rate is not None else window.get("heart_rate_mean"),
+                spo2 if spo2 is not None else window.get("spo2_mean"),
+                ecg if ecg is not None else window.get("ecg_mean")
+            ))
+            outcomes = await run_concurrently({name: scorers[name] for name in DASHBOARD_PREDICTIONS})
+            body["predictions"] = {}
+            for name, (result, error, _) in outcomes.items():
+                if error is None:
+                    body["predictions"][name] = result
+                else:
+                    errors[name] = error
+
+    if "avatar" in sections:
+        body["avatar"] = avatar_url(username)
+    if schedules is not None:
+        body["schedules"] = {}
+        for name, result in zip(("prescriptions", "exercise"), await schedules):
+            if isinstance(result, Exception):
+                errors[f"schedules.{name}"] = str(result)
+            else:
+                body["schedules"][name] = result
+    if errors:
+        body["errors"] = errors
+    return FastJSONResponse(body)
+
 # Chatbot settings
 MODEL_PATH = os.path.abspath("chatbot_model/Llama-Doctor-3.2-3B-Instruct.Q4_K_M.gguf")
 
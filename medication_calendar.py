@@ -0,0 +1,178 @@
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import List
+from google.cloud import firestore
+
+CALENDAR_COLLECTION = "medication_calendar"
+META_DOCUMENT = "_meta"
+MAX_RANGE_DAYS = 366
+BATCH_LIMIT = 450  # Firestore allows 500 writes per batch
+
+
+# === Schedule Helpers ===
+# Helper function to clean 'days' field and convert it to a number
+def clean_days(days: str) -> int:
+    # Extract numeric value from the string (e.g., "20 days" → 20)
+    match = re.search(r'(\d+)', days)
+    return int(match.group(1)) if match else 0
+
+# Helper function to clean 'dosage' field and convert it to a number
+def clean_dosage(dosage: str) -> int:
+    # Extract numeric value from the string (e.g., "250mg" → 250)
+    match = re.search(r'(\d+)', dosage)
+    return int(match.group(1)) if match else 0
+
+# Helper function to decode the 'interval' and return a list of schedule times
+def decode_interval(interval_list: List[str]) -> List[str]:
+    # Times for each part of the day
+    time_dict = {
+        0: '8:00 AM',   # Morning
+        1: '1:00 PM',   # Noon
+        2: '9:00 PM'    # Evening
+    }
+
+    schedule = []
+
+    for interval in interval_list:
+        # Extract the numeric pattern (e.g., "1-0-0" from "1-0-0 before meal")
+        match = re.search(r'\b[01]-[01]-[01]\b', interval)
+        if match:
+            pattern = match.group()  # Extract matched pattern
+            parts = pattern.split('-')  # Convert to list
+
+            # Decode the pattern into time slots
+            for idx, val in enumerate(parts):
+                if val == '1':
+                    schedule.append(time_dict[idx])  # Add corresponding time
+
+    return schedule
+
+
+# === Expansion ===
+def _start_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).date()
+
+
+def prescription_slots(prescription):
+    """
+    Dose slots of one prescription by ISO date: every medicine on each of its
+    `days` from the creation date, at each decoded schedule time. Slot ids
+    match the ones the app already stores in medication_takes ("name-time").
+    """
+    days_by_date = defaultdict(list)
+    start = _start_date(prescription["date_created"])
+    for index, medicine in enumerate(prescription.get("medicines", [])):
+        days = medicine.get("days", 0)
+        days = days if isinstance(days, int) else clean_days(str(days))
+        times = medicine.get("schedule") or decode_interval(medicine.get("interval", []))
+        slots = [
+            {"id": f"{medicine['name']}-{time}", "name": medicine["name"], "time": time,
+             "dosage": medicine.get("dosage"), "color_index": index}
+            for time in times
+        ]
+        for offset in range(days):
+            days_by_date[(start + timedelta(days=offset)).isoformat()].extend(slots)
+    return dict(days_by_date)
+
+
+def _calendar(db, user):
+    return db.collection("users").document(user).collection(CALENDAR_COLLECTION)
+
+
+# === Incremental Maintenance ===
+def stage_calendar_update(batch, db, prescription_id, old=None, new=None):
+    """
+    Add the calendar writes for one saved, updated (old and new) or deleted
+    (old only) prescription to `batch`, so they commit with the prescription.
+    Only the month documents the prescription touches are written.
+    """
+    changes = defaultdict(lambda: defaultdict(dict))  # (user, month) -> date -> {prescription_id: slots}
+    if old is not None:
+        for day in prescription_slots(old):
+            changes[(old["user"], day[:7])][day][prescription_id] = firestore.DELETE_FIELD
+    if new is not None:
+        for day, slots in prescription_slots(new).items():
+            changes[(new["user"], day[:7])][day][prescription_id] = slots
+
+    for (user, month), days in changes.items():
+        batch.set(_calendar(db, user).document(month), {"month": month, "days": dict(days)}, merge=True)
+    return len(changes)
+
+
+def rebuild_calendar(db, user):
+    """Materialise the whole calendar of `user` from prescription_schedules (first use, or repair)."""
+    calendar = _calendar(db, user)
+    months = defaultdict(lambda: defaultdict(dict))
+    for doc in db.collection("prescription_schedules").where("user", "==", user).stream():
+        for day, slots in prescription_slots(doc.to_dict()).items():
+            months[day[:7]][day][doc.id] = slots
+
+    # Month documents first, the marker last: a partial rebuild is simply redone on the next read
+    writes = [(calendar.document(month), {"month": month, "days": dict(days)}) for month, days in months.items()]
+    writes += [(doc.reference, None) for doc in calendar.stream() if doc.id != META_DOCUMENT and doc.id not in months]
+    writes.append((calendar.document(META_DOCUMENT), {"built_at": datetime.utcnow().isoformat()}))
+
+    for start in range(0, len(writes), BATCH_LIMIT):
+        batch = db.batch()
+        for ref, data in writes[start:start + BATCH_LIMIT]:
+            if data is None:
+                batch.delete(ref)
+            else:
+                batch.set(ref, data)
+        batch.commit()
+    return {month: days for month, days in months.items()}
+
+
+# === Reading ===
+def month_keys(start, end):
+    months, current = [], start.replace(day=1)
+    while current <= end:
+        months.append(current.strftime("%Y-%m"))
+        current = (current + timedelta(days=32)).replace(day=1)
+    return months
+
+
+def read_calendar(db, user, start, end):
+    """
+    Dose slots for every date in [start, end] merged with the user's
+    medication_takes: one batched read of the month documents plus one
+    range query for the takes.
+    """
+    calendar = _calendar(db, user)
+    months = month_keys(start, end)
+    refs = [calendar.document(META_DOCUMENT)] + [calendar.document(month) for month in months]
+    snapshots = {doc.id: doc for doc in db.get_all(refs)}
+
+    if not snapshots[META_DOCUMENT].exists:
+        built = rebuild_calendar(db, user)
+        month_days = {month: built.get(month, {}) for month in months}
+    else:
+        month_days = {month: (snapshots[month].to_dict() or {}).get("days", {}) if snapshots[month].exists else {}
+                      for month in months}
+
+    takes = (
+        db.collection("users").document(user).collection("medication_takes")
+        .where("date", ">=", start.isoformat())
+        .where("date", "<=", end.isoformat())
+        .stream()
+    )
+    records = {doc.get("date"): doc.to_dict() for doc in takes}
+
+    days = {}
+    for offset in range((end - start).days + 1):
+        day = (start + timedelta(days=offset)).isoformat()
+        slots = [slot for prescription in month_days[day[:7]].get(day, {}).values() for slot in prescription]
+        record = records.get(day)
+        taken = {med["id"]: med.get("taken", False) for med in record.get("medications", [])} if record else {}
+        if not slots and record is None:
+            continue
+        days[day] = {
+            "slots": [{**slot, "taken": taken.get(slot["id"], False)} for slot in slots],
+            "recorded": record is not None,
+        }
+    return days
@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Live / previous / staged file of every hot-swappable model, shared by all worker processes
+MODEL_STATE_FILE = os.getenv("MODEL_STATE_FILE", "model_state.json")
+STATE_CHECK_SECONDS = 2.0
+
+
+def _rss_bytes():
+    # Resident set size of this process; falls back to /proc on Linux
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def file_version(path):
+    """Short content hash of an artifact file, used as its version tag."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def warm_predictor(model):
+    # One synthetic prediction, so lazy per-model setup happens before real traffic
+    n_features = getattr(model, "n_features_in_", None)
+    if n_features is not None and hasattr(model, "predict"):
+        model.predict(np.zeros((1, n_features)))
+
+
+class ModelRegistry:
+    """
+    Named artifacts (models, encoders, datasets, NLP/OCR pipelines) that are
+    loaded on first use instead of at import time. Each load is timed and the
+    change in process RSS is recorded, so `stats()` shows what every artifact
+    costs. Loading is serialised per artifact, so concurrent first requests
+    load it only once.
+
+    Artifacts registered with `register_file` are versioned by content hash
+    and can be replaced while serving: `stage` loads and warms a new file next
+    to the live one, `promote` swaps it in with a single assignment (requests
+    already holding the old model finish with it), and `rollback` swaps the
+    previous version back. These changes are recorded in `state_file`, which
+    every process re-reads when it changes, so all workers serve the same
+    version whichever one handled the admin request.
+    """
+
+    def __init__(self, state_file=None):
+        self._loaders = {}
+        self._warmers = {}
+        self._artifacts = {}  # name -> (artifact, version)
+        self._files = {}  # name -> {"path", "load", "warm"}
+        self._staged = {}
+        self._previous = {}
+        self._stats = {}
+        self._locks = {}
+        self._registry_lock = threading.Lock()
+        self.state_file = state_file
+        self._state_mtime = None
+        self._state_checked = 0.0
+        self._sync_lock = threading.Lock()
+
+    def register(self, name, loader, warm=None):
+        """`warm(artifact)`, if given, runs one synthetic call so first-use setup happens in `warm_up`."""
+        with self._registry_lock:
+            self._loaders[name] = loader
+            self._warmers[name] = warm
+            self._locks[name] = threading.Lock()
+            self._stats[name] = {"loaded": False}
+
+    def register_file(self, name, path, load, warm=warm_predictor):
+        """Register an artifact loaded from `path` with `load(path)`; it can later be hot-swapped."""
+        self._files[name] = {"path": path, "load": load, "warm": warm}
+        self.register(name, lambda: load(self._files[name]["path"]), warm)
+
+    def __contains__(self, name):
+        return name in self._loaders
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def get(self, name):
+        return self.get_versioned(name)[0]
+
+    def get_versioned(self, name):
+        """The live artifact together with its version tag, read as one consistent pair."""
+        self._sync()
+        entry = self._artifacts.get(name)
+        if entry is not None:
+            return entry
+        if name not in self._loaders:
+            raise KeyError(f"Model '{name}' is not registered")
+
+        with self._locks[name]:
+            if name not in self._artifacts:
+                rss_before = _rss_bytes()
+                start = time.perf_counter()
+                artifact = self._loaders[name]()
+                load_seconds = time.perf_counter() - start
+                rss_after = _rss_bytes()
+                version = file_version(self._files[name]["path"]) if name in self._files else None
+                self._artifacts[name] = (artifact, version)
+                self._stats[name] = {
+                    "loaded": True,
+                    "version": version,
+                    "load_seconds": round(load_seconds, 4),
+                    "rss_delta_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+                    "loaded_at": time.time(),
+                }
+            return self._artifacts[name]
+
+    def version(self, name):
+        return self.get_versioned(name)[1]
+
+    # === Hot Reload ===
+    def _file_entry(self, name):
+        if name not in self._files:
+            raise KeyError(f"Model '{name}' is not a reloadable file artifact")
+        return self._files[name]
+
+    def _load_version(self, name, path):
+        entry = self._file_entry(name)
+        version = file_version(path)
+
+        start = time.perf_counter()
+        artifact = entry["load"](path)
+        load_seconds = time.perf_counter() - start
+        live = self._artifacts.get(name, (None, None))[0]
+        expected = getattr(live, "n_features_in_", None)
+        if expected is not None and getattr(artifact, "n_features_in_", expected) != expected:
+            raise ValueError(f"'{name}' expects {expected} features, {path} takes {artifact.n_features_in_}")
+
+        start = time.perf_counter()
+        if entry["warm"] is not None:
+            entry["warm"](artifact)
+        warm_seconds = time.perf_counter() - start
+
+        staged = {
+            "path": path,
+            "version": version,
+            "load_seconds": round(load_seconds, 4),
+            "warm_seconds": round(warm_seconds, 4),
+            "staged_at": time.time(),
+        }
+        return artifact, staged
+
+    def _make_live(self, name, artifact, staged):
+        # Callers hold the artifact's lock
+        entry = self._files[name]
+        if name in self._artifacts:
+            self._previous[name] = (self._artifacts[name], entry["path"], self._stats[name])
+        entry["path"] = staged["path"]
+        self._artifacts[name] = (artifact, staged["version"])
+        self._stats[name] = {
+            "loaded": True,
+            "warm": True,
+            "version": staged["version"],
+            "path": staged["path"],
+            "load_seconds": staged["load_seconds"],
+            "warm_seconds": staged["warm_seconds"],
+            "loaded_at": time.time(),
+        }
+        return dict(self._stats[name])
+
+    def stage(self, name, path=None):
+        """Load and warm `path` (default: the current file, re-read) without serving it yet."""
+        entry = self._file_entry(name)
+        path = entry["path"] if path is None else path
+        artifact, staged = self._load_version(name, path)
+        with self._locks[name]:
+            self._staged[name] = (artifact, staged)
+        self._write_state(name, staged=path)
+        return dict(staged)
+
+    def discard(self, name):
+        with self._locks[name]:
+            discarded = self._staged.pop(name, None) is not None
+        staged = self._read_state().get(name, {}).get("staged")
+        self._write_state(name, staged=None)
+        return discarded or staged is not None
+
+    def promote(self, name):
+        """Make the staged version live; the one it replaces is kept for `rollback`."""
+        entry = self._file_entry(name)
+        if self.state_file is not None:
+            # The recorded file wins: another worker may have staged, promoted or discarded since
+            path = self._read_state().get(name, {}).get("staged")
+            local = self._staged.get(name)
+            if path is None:
+                with self._locks[name]:
+                    self._staged.pop(name, None)
+            elif local is None or local[1]["path"] != path:
+                staged = self._load_version(name, path)
+                with self._locks[name]:
+                    self._staged[name] = staged
+        with self._locks[name]:
+            if name not in self._staged:
+                raise LookupError(f"No staged version of '{name}'")
+            previous = entry["path"]
+            live = self._make_live(name, *self._staged.pop(name))
+        self._write_state(name, path=live["path"], previous=previous, staged=None)
+        return live
+
+    def rollback(self, name):
+        entry = self._file_entry(name)
+        with self._locks[name]:
+            previous = self._previous.pop(name, None)
+            if previous is not None:
+                live, path, stats = previous
+                if name in self._artifacts:
+                    self._previous[name] = (self._artifacts[name], entry["path"], self._stats[name])
+                replaced = entry["path"]
+                entry["path"] = path
+                self._artifacts[name] = live
+                self._stats[name] = stats
+        if previous is None:
+            # Promoted before this worker loaded the model: load the previous file recorded for it
+            path = self._read_state().get(name, {}).get("previous")
+            if path is None:
+                raise LookupError(f"No previous version of '{name}'")
+            artifact, staged = self._load_version(name, path)
+            with self._locks[name]:
+                replaced = entry["path"]
+                stats = self._make_live(name, artifact, staged)
+        self._write_state(name, path=path, previous=replaced)
+        return dict(stats)
+
+    # === Shared State ===
+    def _read_state(self):
+        if self.state_file is None:
+            return {}
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_state(self, name, **fields):
+        if self.state_file is None:
+            return
+        state = self._read_state()
+        state.setdefault(name, {}).update(fields)
+        temporary = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(temporary, self.state_file)  # readers never see a partial file
+
+    def _sync(self):
+        """Follow promotions and rollbacks that other processes recorded in the state file."""
+        now = time.time()
+        if self.state_file is None or now - self._state_checked < STATE_CHECK_SECONDS:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            self._state_checked = now
+            try:
+                mtime = os.stat(self.state_file).st_mtime_ns
+            except OSError:
+                return
+            if mtime == self._state_mtime:
+                return
+            self._state_mtime = mtime
+            for name, state in self._read_state().items():
+                entry = self._files.get(name)
+                path = state.get("path")
+                if entry is None or path is None or path == entry["path"]:
+                    continue
+                try:
+                    if name not in self._artifacts:
+                        entry["path"] = path  # loaded from the recorded file on first use
+                        continue
+                    artifact, staged = self._load_version(name, path)
+                    with self._locks[name]:
+                        self._make_live(name, artifact, staged)
+                except Exception as e:
+                    print(f"Could not switch '{name}' to {path}: {e}")
+        finally:
+            self._sync_lock.release()
+
+    def is_loaded(self, name):
+        return name in self._artifacts
+
+    def warm_up(self, names=None):
+        """Load and warm the given artifacts (all registered ones by default); returns failures by name."""
+        failures = {}
+        for name in list(self._loaders) if names is None else names:
+            try:
+                artifact = self.get(name)
+                start = time.perf_counter()
+                if self._warmers.get(name) is not None:
+                    self._warmers[name](artifact)
+                self._stats[name].update({"warm": True, "warm_seconds": round(time.perf_counter() - start, 4)})
+            except Exception as e:
+                failures[name] = str(e)
+                self._stats[name] = {**self._stats[name], "warm": False, "error": str(e)}
+        return failures
+
+    def is_warm(self, name):
+        return self._stats.get(name, {}).get("warm", False)
+
+    def stats(self):
+        stats = {name: dict(stat) for name, stat in self._stats.items()}
+        for name, (_, staged) in list(self._staged.items()):
+            stats[name]["staged"] = dict(staged)
+        return stats
+
+
+models = ModelRegistry(MODEL_STATE_FILE)
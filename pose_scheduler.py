@@ -0,0 +1,224 @@
+import os
+import math
+import time
+import threading
+import cv2
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+# === Scheduler Settings (overridable from the environment) ===
+TARGET_FPS = float(os.getenv("POSE_TARGET_FPS", "15"))
+MAX_INPUT_WIDTH = int(os.getenv("POSE_MAX_WIDTH", "480"))
+MOTION_THRESHOLD = float(os.getenv("POSE_MOTION_THRESHOLD", "2.0"))
+MAX_SKIP_FRAMES = int(os.getenv("POSE_MAX_SKIP", "4"))
+
+MOTION_PROBE_SIZE = (64, 48)
+
+
+# === Capture Thread ===
+class LatestFrameReader:
+    """
+    Reads frames from a camera on a background thread and keeps only the
+    newest one, so a slow pose loop never works through a backlog of stale
+    frames. Mirrors the parts of cv2.VideoCapture the monitors use.
+
+    Frames live in three reused buffers (newest, handed out, being filled),
+    so a frame returned by `read()` stays valid until the next `read()`.
+    With `mirror=True` the horizontal flip also happens on the capture thread.
+    """
+
+    def __init__(self, src=0, mirror=False):
+        self.cap = cv2.VideoCapture(src)
+        self.mirror = mirror
+        self._lock = threading.Condition()
+        self._buffers = [None, None, None]
+        self._raw = None
+        self._latest = None
+        self._held = None
+        self._seq = 0
+        self._read_seq = 0
+        self._running = self.cap.isOpened()
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+
+    def _grab(self, slot):
+        if not self.mirror:
+            return self.cap.read() if slot is None else self.cap.read(slot)
+        success, self._raw = self.cap.read() if self._raw is None else self.cap.read(self._raw)
+        if not success:
+            return False, None
+        return True, cv2.flip(self._raw, 1) if slot is None else cv2.flip(self._raw, 1, slot)
+
+    def _capture_loop(self):
+        while self._running:
+            with self._lock:
+                index = next(i for i in range(3) if i != self._latest and i != self._held)
+            success, frame = self._grab(self._buffers[index])
+            with self._lock:
+                if not success:
+                    self._running = False
+                else:
+                    self._buffers[index] = frame
+                    self._latest = index
+                    self._seq += 1
+                self._lock.notify_all()
+
+    def isOpened(self):
+        return self._running or self._seq != self._read_seq
+
+    def read(self, timeout=1.0):
+        # Block until a frame newer than the last one handed out is available
+        with self._lock:
+            if not self._lock.wait_for(lambda: self._seq != self._read_seq or not self._running, timeout):
+                return False, None
+            if self._seq == self._read_seq:
+                return False, None
+            self._read_seq = self._seq
+            self._held = self._latest
+            return True, self._buffers[self._held]
+
+    def release(self):
+        self._running = False
+        self._thread.join(timeout=1.0)
+        self.cap.release()
+
+
+# === Landmark Helpers ===
+class PoseResult:
+    """Stand-in for the mediapipe result object; only `pose_landmarks` is used."""
+
+    __slots__ = ("pose_landmarks", "inferred")
+
+    def __init__(self, pose_landmarks, inferred):
+        self.pose_landmarks = pose_landmarks
+        self.inferred = inferred
+
+
+def landmarks_to_array(pose_landmarks):
+    return np.array(
+        [[lm.x, lm.y, lm.z, lm.visibility] for lm in pose_landmarks.landmark],
+        dtype=np.float32,
+    )
+
+
+def array_to_landmarks(points):
+    return landmark_pb2.NormalizedLandmarkList(landmark=[
+        landmark_pb2.NormalizedLandmark(x=float(x), y=float(y), z=float(z), visibility=float(v))
+        for x, y, z, v in points
+    ])
+
+
+# === Adaptive Pose Scheduler ===
+class AdaptivePoseScheduler:
+    """
+    Decides per frame whether to run `pose.process` or to reuse the last
+    landmarks.
+
+    - Frames are downscaled to `max_width` before inference (landmarks are
+      normalised, so callers do not need to rescale anything).
+    - When the scene barely changes the previous landmarks are held.
+    - When inference is slower than `target_fps` allows, it runs every
+      `stride` frames and the frames in between get landmarks predicted
+      linearly from the last two inferred frames.
+    """
+
+    def __init__(self, pose, target_fps=TARGET_FPS, max_width=MAX_INPUT_WIDTH,
+                 motion_threshold=MOTION_THRESHOLD, max_skip=MAX_SKIP_FRAMES):
+        self.pose = pose
+        self.target_fps = target_fps
+        self.max_width = max_width
+        self.motion_threshold = motion_threshold
+        self.max_skip = max_skip
+
+        self.stride = 1
+        self.infer_time = 0.0
+        self.frames_since_inference = max_skip
+        self.inferred_frames = 0
+        self.skipped_frames = 0
+
+        self._small = None
+        self._rgb = None
+        self._tiny = None
+        self._gray = None
+        self._probe = None
+        self._diff = None
+        self._keyframes = []  # [(timestamp, landmark array)], newest last
+        self._last_result = PoseResult(None, False)
+
+    def _prepare_input(self, frame):
+        # Downscale and convert into buffers that are reused across frames
+        height, width = frame.shape[:2]
+        if self.max_width and width > self.max_width:
+            size = (self.max_width, int(height * self.max_width / width))
+            if self._small is None or self._small.shape[1::-1] != size:
+                self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            frame = cv2.resize(frame, size, self._small, interpolation=cv2.INTER_AREA)
+        if self._rgb is None or self._rgb.shape != frame.shape:
+            self._rgb = np.empty_like(frame)
+        self._rgb.flags.writeable = True
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, self._rgb)
+        self._rgb.flags.writeable = False
+        return self._rgb
+
+    def _motion(self, frame):
+        if self._tiny is None:
+            self._tiny = np.empty((MOTION_PROBE_SIZE[1], MOTION_PROBE_SIZE[0], 3), dtype=np.uint8)
+            self._gray = np.empty(self._tiny.shape[:2], dtype=np.uint8)
+            self._diff = np.empty_like(self._gray)
+        cv2.resize(frame, MOTION_PROBE_SIZE, self._tiny, interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(self._tiny, cv2.COLOR_BGR2GRAY, self._gray)
+        if self._probe is None:
+            return float("inf")
+        cv2.absdiff(self._gray, self._probe, self._diff)
+        return cv2.mean(self._diff)[0]
+
+    def _keep_probe(self):
+        # Swap rather than copy: the current grey frame becomes the reference
+        if self._probe is None:
+            self._probe = np.empty_like(self._gray)
+        self._probe, self._gray = self._gray, self._probe
+
+    def _should_infer(self, motion):
+        if not self._keyframes or self.frames_since_inference >= self.max_skip:
+            return True
+        if motion < self.motion_threshold:
+            return False
+        return self.frames_since_inference >= self.stride
+
+    def _update_stride(self, elapsed):
+        # Exponential moving average of inference cost drives the stride
+        self.infer_time = elapsed if self.infer_time == 0 else 0.8 * self.infer_time + 0.2 * elapsed
+        budget = 1.0 / self.target_fps if self.target_fps else self.infer_time
+        self.stride = max(1, min(self.max_skip, math.ceil(self.infer_time / budget)))
+
+    def _predict(self, now, motion):
+        t1, latest = self._keyframes[-1]
+        if motion < self.motion_threshold or len(self._keyframes) < 2:
+            return self._last_result.pose_landmarks
+        t0, previous = self._keyframes[0]
+        alpha = min(1.0, (now - t1) / max(t1 - t0, 1e-3))
+        predicted = latest + (latest - previous) * alpha
+        predicted[:, 3] = latest[:, 3]  # visibility is not extrapolated
+        return array_to_landmarks(predicted)
+
+    def process(self, frame):
+        now = time.perf_counter()
+        motion = self._motion(frame)
+
+        if not self._should_infer(motion):
+            self.frames_since_inference += 1
+            self.skipped_frames += 1
+            return PoseResult(self._predict(now, motion), False)
+
+        results = self.pose.process(self._prepare_input(frame))
+        self._update_stride(time.perf_counter() - now)
+        self._keep_probe()
+        self.frames_since_inference = 0
+        self.inferred_frames += 1
+
+        if results.pose_landmarks:
+            self._keyframes = (self._keyframes + [(now, landmarks_to_array(results.pose_landmarks))])[-2:]
+        else:
+            self._keyframes = []
+        self._last_result = PoseResult(results.pose_landmarks, True)
+        return self._last_result
@@ -0,0 +1,67 @@
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of model outputs for one model.
+
+    Keys are the model version plus the input features rounded to a
+    per-feature quantisation step, so readings that only differ by sensor
+    noise share one entry, and a promoted model never sees the previous
+    version's results. A step of 0 (or None) keys on the exact value.
+    Everything cached comes from the first input seen in its bucket.
+    """
+
+    def __init__(self, steps, max_entries=DEFAULT_MAX_ENTRIES):
+        self.steps = dict(steps)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, version, features):
+        quantized = []
+        for name, step in self.steps.items():
+            value = features[name]
+            quantized.append(int(round(value / step)) if step else value)
+        return (version, tuple(quantized))
+
+    def get_or_compute(self, version, features, compute):
+        """Return the cached result for `features`, calling `compute()` on a miss."""
+        key = self.key(version, features)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+
+        # Computed outside the lock; two concurrent misses on one key both compute, last write wins
+        result = compute()
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+                "steps": dict(self.steps),
+            }
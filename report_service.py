@@ -0,0 +1,139 @@
+import os
+import shutil
+import uuid
+import threading
+from io import BytesIO
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from fpdf import FPDF
+from exercise_rules import EXERCISES
+
+REPORTS_DIR = "reports"  # created on the first report, not at import
+
+DEFAULT_TIPS = "Great effort! Maintain consistency in your form."
+
+
+# === Report Content ===
+def performance_tips(exercise_type, timestamps, correct_counts):
+    report = EXERCISES.get(exercise_type, {}).get("report", {})
+    tips = report.get("tips", DEFAULT_TIPS)
+    if correct_counts:
+        avg_rate = correct_counts[-1] / timestamps[-1] if timestamps[-1] != 0 else 0
+        if "slow" in report and avg_rate < report["slow"][0]:
+            tips = report["slow"][1]
+        elif "fast" in report and avg_rate > report["fast"][0]:
+            tips = report["fast"][1]
+    return tips
+
+
+def render_progress_chart(exercise_type, timestamps, correct_counts):
+    # Figure + Agg canvas instead of pyplot: no global state, safe off the main thread
+    color = EXERCISES.get(exercise_type, {}).get("report", {}).get("color", "green")
+    figure = Figure(figsize=(8, 4))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.plot(timestamps, correct_counts, marker='o', linestyle='-', color=color)
+    axes.set_title(f'Correct {exercise_type} Count Over Time')
+    axes.set_xlabel('Time (s)')
+    axes.set_ylabel('Correct Count')
+    axes.grid(True)
+
+    buffer = BytesIO()
+    figure.savefig(buffer, format="png")
+    buffer.seek(0)
+    return buffer
+
+
+def build_report_pdf(exercise_type, timestamps, correct_counts, session_end):
+    chart = render_progress_chart(exercise_type, timestamps, correct_counts)
+    tips = performance_tips(exercise_type, timestamps, correct_counts)
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=14)
+    pdf.cell(200, 10, txt=f"{exercise_type} Exercise Report", ln=True, align='C')
+    pdf.ln(10)
+    pdf.cell(200, 10, txt=f"Session End: {session_end.strftime('%Y-%m-%d %H:%M:%S')}", ln=True)
+    pdf.ln(10)
+    pdf.image(chart, x=10, y=40, w=180)
+    pdf.ln(85)
+    pdf.multi_cell(0, 10, txt=f"Performance Tips:\n{tips}")
+    return bytes(pdf.output())
+
+
+# === Background Report Service ===
+class ReportService:
+    """
+    Builds exercise reports on a worker pool so a session can close as soon as
+    it ends. Every report gets its own id and file, so concurrent sessions
+    never share temporary files. `get` also finds reports written by an
+    earlier process.
+    """
+
+    def __init__(self, reports_dir=REPORTS_DIR, max_workers=2):
+        self.reports_dir = reports_dir
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+        self._reports = {}
+        self._lock = threading.Lock()
+
+    def _path(self, report_id):
+        return os.path.join(self.reports_dir, f"{report_id}.pdf")
+
+    def submit(self, exercise_type, timestamps, correct_counts, copy_to=None):
+        """Queue a report and return its id straight away."""
+        report_id = uuid.uuid4().hex
+        session_end = datetime.now()
+        filename = f"{exercise_type.lower().replace(' ', '_')}_report_{session_end.strftime('%Y%m%d_%H%M%S')}.pdf"
+        with self._lock:
+            self._reports[report_id] = {
+                "id": report_id,
+                "exercise": exercise_type,
+                "filename": filename,
+                "status": "pending",
+                "created_at": session_end.isoformat(),
+            }
+        self._executor.submit(
+            self._build, report_id, exercise_type, list(timestamps), list(correct_counts), session_end, copy_to
+        )
+        return report_id
+
+    def _build(self, report_id, exercise_type, timestamps, correct_counts, session_end, copy_to):
+        try:
+            data = build_report_pdf(exercise_type, timestamps, correct_counts, session_end)
+            os.makedirs(self.reports_dir, exist_ok=True)
+            path = self._path(report_id)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            update = {"status": "ready", "path": path}
+        except Exception as e:
+            print(f"Error generating report {report_id}: {e}")
+            update = {"status": "failed", "error": str(e)}
+        if copy_to is not None and update["status"] == "ready":
+            # The report itself is fine; a failed copy is reported next to it
+            try:
+                update["copied_to"] = str(shutil.copyfile(path, os.path.join(copy_to, self._reports[report_id]["filename"])))
+            except Exception as e:
+                print(f"Error copying report {report_id} to {copy_to}: {e}")
+                update["copy_error"] = str(e)
+        with self._lock:
+            self._reports[report_id].update(update)
+
+    def get(self, report_id):
+        with self._lock:
+            report = self._reports.get(report_id)
+            if report is not None:
+                return dict(report)
+        path = self._path(os.path.basename(report_id))
+        if os.path.exists(path):
+            return {"id": report_id, "status": "ready", "path": path, "filename": f"{report_id}.pdf"}
+        return None
+
+    def list(self):
+        with self._lock:
+            return [dict(report) for report in self._reports.values()]
+
+
+report_service = ReportService()
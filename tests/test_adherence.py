@@ -0,0 +1,81 @@
+from datetime import date
+from adherence import iso_day, empty_summary, apply_record, compute_streak, read_adherence
+
+
+def record(*doses):
+    return {"medications": [{"name": name, "time": time, "taken": taken} for name, time, taken in doses]}
+
+
+def test_iso_day_accepts_only_zero_padded_dates():
+    assert iso_day("2024-01-05") == "2024-01-05"
+    for key in ("2024-1-5", "20240105", "2024-02-30", "today", "", None):
+        assert iso_day(key) is None
+
+
+def test_apply_record_replaces_a_day_without_its_previous_document():
+    summary = empty_summary()
+    apply_record(summary, "2024-01-05", record(("Aspirin", "8:00 AM", True), ("Metformin", "8:00 PM", False)))
+    apply_record(summary, "2024-01-06", record(("Aspirin", "8:00 AM", True)))
+    assert summary["medicines"] == {"Aspirin": {"taken": 2, "missed": 0}, "Metformin": {"taken": 0, "missed": 1}}
+    assert summary["days"] == {"2024-01-05": [1, 1], "2024-01-06": [1, 0]}
+
+    # Re-saving a day replaces its counts instead of adding to them
+    apply_record(summary, "2024-01-05", record(("Aspirin", "8:00 AM", True), ("Metformin", "8:00 PM", True)))
+    assert summary["medicines"] == {"Aspirin": {"taken": 2, "missed": 0}, "Metformin": {"taken": 1, "missed": 0}}
+    assert summary["slots"] == {"8:00 AM": {"taken": 2, "missed": 0}, "8:00 PM": {"taken": 1, "missed": 0}}
+
+    apply_record(summary, "2024-01-05", None)
+    assert summary["medicines"] == {"Aspirin": {"taken": 1, "missed": 0}}
+    assert summary["days"] == {"2024-01-06": [1, 0]}
+    assert set(summary["records"]) == {"2024-01-06"}
+
+
+def test_compute_streak():
+    days = {"2024-01-01": [2, 0], "2024-01-02": [2, 0], "2024-01-03": [1, 1],
+            "2024-01-04": [2, 0], "2024-01-05": [2, 0], "2024-01-06": [2, 0], "2024-01-08": [1, 0]}
+    assert compute_streak(days) == {"current": 1, "end": "2024-01-08", "longest": 3}
+    assert compute_streak({}) == {"current": 0, "end": None, "longest": 0}
+
+
+def test_compute_streak_ignores_keys_that_are_not_dates():
+    assert compute_streak({"2024-1-5": [2, 0]}) == {"current": 0, "end": None, "longest": 0}
+    assert compute_streak({"2024-01-04": [1, 0], "2024-1-5": [2, 0], "2024-01-05": [1, 0]})["longest"] == 2
+
+
+class Snapshot:
+    def __init__(self, data):
+        self.exists, self._data = data is not None, data
+
+    def to_dict(self):
+        return self._data
+
+
+class SummaryDb:
+    """Just enough of a Firestore client for read_adherence on a stored summary."""
+
+    def __init__(self, summary):
+        self.summary = summary
+
+    def collection(self, name):
+        return self
+
+    def document(self, name):
+        return self
+
+    def get(self):
+        return Snapshot(self.summary)
+
+
+def test_read_adherence_rolling_windows_and_current_streak():
+    summary = empty_summary()
+    for day in ("2024-01-08", "2024-01-09", "2024-01-10"):
+        apply_record(summary, day, record(("Aspirin", "8:00 AM", True)))
+    apply_record(summary, "2023-12-01", record(("Aspirin", "8:00 AM", False)))
+    summary["streak"] = compute_streak(summary["days"])
+
+    adherence = read_adherence(SummaryDb(summary), "patient01", today=date(2024, 1, 11))
+    assert adherence["rolling"]["7d"] == {"taken": 3, "missed": 0, "rate": 100.0}
+    assert adherence["rolling"]["30d"]["taken"] == 3
+    assert adherence["rate"] == 75.0
+    assert adherence["streak"] == {"current": 3, "longest": 3, "last_perfect_day": "2024-01-10"}
+    assert read_adherence(SummaryDb(summary), "patient01", today=date(2024, 1, 20))["streak"]["current"] == 0
@@ -0,0 +1,69 @@
+import itertools
+import numpy as np
+import pytest
+from sklearn.preprocessing import LabelEncoder
+from sklearn.tree import DecisionTreeClassifier
+from dosage_lookup import DosageTable, DosageLookup
+from feature_encoding import FeatureEncoder, UnknownCategoryError, compile_label_encoders
+
+CATALOGUE = {
+    "Drug": ["Amoxicillin", "Ibuprofen", "Metformin", "Paracetamol", "Warfarin"],
+    "Condition": ["Diabetes", "Fever", "Infection", "Pain"],
+    "Age_Group": ["Adult", "Child", "Senior"],
+}
+COLUMNS = list(CATALOGUE)
+
+
+def fitted(seed=0):
+    rng = np.random.default_rng(seed)
+    rows = [{column: rng.choice(values) for column, values in CATALOGUE.items()} for _ in range(300)]
+    encoders = compile_label_encoders({column: LabelEncoder().fit(values) for column, values in CATALOGUE.items()})
+    X = FeatureEncoder(COLUMNS, encoders).encode(rows)
+    y = np.array([f"{50 * (1 + (int(a) + 2 * int(b) + int(c)) % 4)}mg" for a, b, c in X])
+    return encoders, DecisionTreeClassifier(max_depth=6, random_state=seed).fit(X, y)
+
+
+def every_row():
+    return [dict(zip(COLUMNS, values)) for values in itertools.product(*CATALOGUE.values())]
+
+
+@pytest.mark.parametrize("precompute_limit, dense", [(1000, True), (10, False)])
+def test_table_matches_the_model_on_every_combination(precompute_limit, dense):
+    encoders, model = fitted()
+    table = DosageTable(COLUMNS, encoders, model, ("e1", "m1"), precompute_limit=precompute_limit)
+    assert table.dense == dense
+    features = FeatureEncoder(COLUMNS, encoders)
+    for row in every_row():
+        assert table.lookup(row) == model.predict(features.encode_one(row))[0]
+    if dense:
+        assert table.stats()["combinations"] == 5 * 4 * 3
+    else:
+        # Second pass is answered from the memo
+        assert table.stats()["memoised"] == 5 * 4 * 3
+        assert [table.lookup(row) for row in every_row()] == list(model.predict(features.encode(every_row())))
+
+
+@pytest.mark.parametrize("precompute_limit", [1000, 10])
+def test_table_rejects_unknown_categories(precompute_limit):
+    encoders, model = fitted()
+    table = DosageTable(COLUMNS, encoders, model, ("e1", "m1"), precompute_limit=precompute_limit)
+    with pytest.raises(UnknownCategoryError) as error:
+        table.lookup({"Drug": "Aspirin", "Condition": "Pain", "Age_Group": "Adult"})
+    assert error.value.feature == "Drug" and error.value.values == ["Aspirin"]
+
+
+def test_lookup_rebuilds_when_a_version_changes():
+    encoders, first = fitted(seed=0)
+    second = fitted(seed=1)[1]
+    current = {"model": (first, "v1")}
+    lookup = DosageLookup(COLUMNS, lambda: (encoders, "e1"), lambda: current["model"])
+    row = every_row()[7]
+
+    assert lookup.suggest(row) == (first.predict(FeatureEncoder(COLUMNS, encoders).encode_one(row))[0], "v1")
+    lookup.suggest(every_row()[8])
+    assert lookup.rebuilds == 1
+
+    current["model"] = (second, "v2")
+    assert lookup.suggest(row) == (second.predict(FeatureEncoder(COLUMNS, encoders).encode_one(row))[0], "v2")
+    assert lookup.rebuilds == 2
+    assert lookup.stats()["versions"] == ["e1", "v2"]
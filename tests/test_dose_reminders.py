@@ -0,0 +1,103 @@
+import random
+from datetime import datetime
+from types import SimpleNamespace
+from dose_reminders import WHEEL_SIZE, TimingWheel, LocalNotifier, DoseReminderScheduler
+
+
+def test_wheel_fires_every_timer_on_its_tick_across_cascades():
+    rng = random.Random(7)
+    wheel = TimingWheel(current=12345)
+    # Due dates spread over levels 0-2, so timers cascade down before they fire
+    due = {f"t{i}": 12345 + rng.randrange(1, WHEEL_SIZE ** 3) for i in range(2000)}
+    for timer_id, tick in due.items():
+        wheel.add(timer_id, tick, payload=tick)
+
+    fired = {}
+    while wheel.current < max(due.values()):
+        target = wheel.current + rng.randrange(1, 5000)
+        for timer_id, tick, payload in wheel.advance(target):
+            assert tick == payload
+            fired[timer_id] = tick
+            assert wheel.current >= tick
+    assert fired == due
+    assert len(wheel) == 0
+
+
+def test_wheel_fires_in_tick_order_and_at_the_exact_tick():
+    ticks = {5, WHEEL_SIZE + 1, WHEEL_SIZE ** 2, WHEEL_SIZE ** 2 + 3}
+    wheel = TimingWheel(current=0)
+    for tick in ticks:
+        wheel.add(tick, tick)
+    for tick in range(1, WHEEL_SIZE ** 2 + 4):
+        fired = wheel.advance(tick)
+        assert [timer_id for timer_id, _, _ in fired] == ([tick] if tick in ticks else [])
+
+
+def test_wheel_cancel_and_reschedule():
+    wheel = TimingWheel(current=0)
+    wheel.add("a", 100)
+    wheel.add("b", 200)
+    assert wheel.cancel("a")
+    assert not wheel.cancel("a")
+    wheel.add("b", 50)  # rescheduling replaces the earlier due tick
+    assert wheel.advance(300) == [("b", 50, None)]
+
+
+def test_wheel_fires_overdue_timers_on_the_next_tick():
+    wheel = TimingWheel(current=1000)
+    wheel.add("late", 10)
+    assert wheel.advance(1001) == [("late", 10, None)]
+
+
+class FakeClock:
+    def __init__(self, start):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+def prescription(user="patient01"):
+    return {
+        "user": user,
+        "date_created": "2025-03-01T07:00:00",
+        "medicines": [{"name": "Aspirin", "dosage": "75mg", "days": 2, "schedule": ["8:00 AM", "8:00 PM"]}],
+    }
+
+
+def test_scheduler_notifies_each_dose_when_due():
+    clock = FakeClock(datetime(2025, 3, 1, 7, 30).timestamp())
+    notifier = LocalNotifier()
+    scheduler = DoseReminderScheduler(notifier, tick_seconds=60, clock=clock)
+    assert scheduler.schedule_prescription("p1", prescription()) == 2
+    assert [reminder["remaining"] for reminder in scheduler.pending("patient01")] == [2, 2]
+
+    clock.now = datetime(2025, 3, 1, 7, 59).timestamp()
+    assert scheduler.run_due() == []
+    clock.now = datetime(2025, 3, 1, 8, 0).timestamp()
+    assert [reminder["due"] for reminder in scheduler.run_due()] == ["2025-03-01T08:00:00"]
+
+    # After a stall each recurring timer catches up one missed dose per tick
+    clock.now = datetime(2025, 3, 3).timestamp()
+    assert sorted(reminder["due"] for reminder in scheduler.run_due()) == ["2025-03-01T20:00:00", "2025-03-02T08:00:00"]
+    clock.now += 60
+    assert [reminder["due"] for reminder in scheduler.run_due()] == ["2025-03-02T20:00:00"]
+    assert len(notifier.sent_to("patient01")) == 4
+    assert scheduler.pending("patient01") == []
+    assert scheduler.stats()["pending_timers"] == 0
+
+
+def test_scheduler_applies_snapshot_changes():
+    clock = FakeClock(datetime(2025, 3, 1, 7, 30).timestamp())
+    scheduler = DoseReminderScheduler(LocalNotifier(), tick_seconds=60, clock=clock)
+
+    def change(kind, doc_id, data=None):
+        return SimpleNamespace(type=SimpleNamespace(name=kind), document=SimpleNamespace(id=doc_id, to_dict=lambda: data))
+
+    scheduler.apply_changes([change("ADDED", "p1", prescription()), change("ADDED", "p2", prescription("patient02"))])
+    assert scheduler.stats()["prescriptions"] == 2
+
+    updated = prescription() | {"medicines": [{"name": "Aspirin", "dosage": "75mg", "days": 1, "schedule": ["9:00 PM"]}]}
+    scheduler.apply_changes([change("MODIFIED", "p1", updated), change("REMOVED", "p2")])
+    assert [(reminder["time"], reminder["remaining"]) for reminder in scheduler.pending("patient01")] == [("9:00 PM", 1)]
+    assert scheduler.pending("patient02") == []
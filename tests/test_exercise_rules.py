@@ -0,0 +1,82 @@
+import numpy as np
+from exercise_rules import NUM_LANDMARKS, POSE_LANDMARKS, ExerciseTracker, evaluate_sequence
+
+
+def pose(**points):
+    """One frame of (x, y) landmarks; anything not given sits at the origin."""
+    frame = np.zeros((NUM_LANDMARKS, 2))
+    for name, xy in points.items():
+        frame[POSE_LANDMARKS[name]] = xy
+    return frame
+
+
+def replay(exercise, frames, times=None):
+    times = np.arange(len(frames)) * 0.5 if times is None else times
+    return evaluate_sequence(exercise, np.stack(frames), times)
+
+
+def feedback(result):
+    return [event["feedback"] for event in result["events"]]
+
+
+def test_push_up_counts_reps_and_bent_legs():
+    # Shoulder, hip, knee and ankle in a line keep the body and legs at 180 degrees
+    body = dict(LEFT_SHOULDER=(0.2, 0.5), LEFT_HIP=(0.5, 0.5), LEFT_KNEE=(0.7, 0.5), LEFT_ELBOW=(0.2, 0.6))
+    up = pose(**body, LEFT_WRIST=(0.2, 0.7), LEFT_ANKLE=(0.9, 0.5))
+    down = pose(**body, LEFT_WRIST=(0.2 + 0.1 * np.sin(np.pi / 3), 0.55), LEFT_ANKLE=(0.9, 0.5))  # arm at 60
+    bent_legs = pose(**body, LEFT_WRIST=(0.2 + 0.1 * np.sin(np.pi / 3), 0.55), LEFT_ANKLE=(0.873, 0.6))  # leg at 150
+
+    result = replay("Push-Up", [up, down, up, bent_legs, up, down, up])
+    assert (result["reps"], result["correct"], result["incorrect"]) == (3, 2, 1)
+    assert feedback(result) == ["Perfect form!", "Keep your legs straight!", "Perfect form!"]
+
+
+def test_jumping_jack_scores_hand_height_and_sideways_waves():
+    head = dict(NOSE=(0.5, 0.2), LEFT_SHOULDER=(0.4, 0.35), RIGHT_SHOULDER=(0.6, 0.35))
+    down = pose(**head, LEFT_WRIST=(0.4, 0.6), RIGHT_WRIST=(0.6, 0.6))
+    overhead = pose(**head, LEFT_WRIST=(0.45, 0.1), RIGHT_WRIST=(0.55, 0.1))
+    shoulder_high = pose(**head, LEFT_WRIST=(0.4, 0.3), RIGHT_WRIST=(0.6, 0.3))
+    # Wrists level with and far out from the shoulders as the arms come down
+    wide = pose(**head, LEFT_WRIST=(0.2, 0.4), RIGHT_WRIST=(0.8, 0.4))
+
+    result = replay("Jumping Jack", [down, overhead, down, shoulder_high, down, shoulder_high, wide])
+    assert (result["reps"], result["correct"], result["incorrect"]) == (3, 1, 2)
+    assert feedback(result) == ["Good Job!", "Raise your hands higher!", "Don't wave your hands sideways!"]
+
+
+def test_downward_dog_form_feedback_respects_the_cooldown():
+    ends = dict(LEFT_WRIST=(0.2, 0.8), LEFT_ANKLE=(0.9, 0.8))
+    extended = pose(**ends, LEFT_SHOULDER=(0.1, 0.8), LEFT_HIP=(0.5, 0.7))
+    folded = pose(**ends, LEFT_SHOULDER=(0.3, 0.75), LEFT_HIP=(0.5, 0.7))
+    bent_arms = pose(**ends, LEFT_SHOULDER=(0.2, 0.6), LEFT_HIP=(0.5, 0.7))
+    low_hips = pose(**ends, LEFT_SHOULDER=(0.1, 0.8), LEFT_HIP=(0.5, 0.3))
+
+    # The second bent-arm frame falls inside the 3 s cooldown, so it is neither said nor counted
+    result = replay("Downward Dog", [extended, folded, bent_arms, bent_arms, low_hips], times=[0, 1, 2, 3, 5])
+    assert (result["reps"], result["correct"], result["incorrect"]) == (1, 1, 2)
+    assert feedback(result) == ["Good form!", "Extend your arms fully!", "Lift your hips higher!"]
+    assert [event["time"] for event in result["events"]] == [1, 2, 5]
+
+
+def test_squat_judges_each_rep_by_back_angle():
+    legs = dict(LEFT_HIP=(0.5, 0.5), LEFT_KNEE=(0.7, 0.5))
+    squat = pose(**legs, LEFT_ANKLE=(0.6, 0.7), LEFT_SHOULDER=(0.7, -0.2))
+    stand = pose(**legs, LEFT_ANKLE=(0.9, 0.5), LEFT_SHOULDER=(0.7, -0.2))  # back at about 29 degrees
+    upright = pose(**legs, LEFT_ANKLE=(0.9, 0.5), LEFT_SHOULDER=(0.6, -0.2))
+    leaning = pose(**legs, LEFT_ANKLE=(0.9, 0.5), LEFT_SHOULDER=(0.8, 0.2))
+
+    result = replay("Squat", [stand, squat, stand, squat, upright, squat, leaning])
+    assert (result["reps"], result["correct"], result["incorrect"]) == (3, 1, 2)
+    assert feedback(result) == ["Lower hips.", "Bend forward.", "Bend backward."]
+    assert result["events"][0]["say"] == "Good form!"
+
+
+def test_tracker_matches_the_batch_replay():
+    head = dict(NOSE=(0.5, 0.2), LEFT_SHOULDER=(0.4, 0.35), RIGHT_SHOULDER=(0.6, 0.35))
+    frames = [pose(**head, LEFT_WRIST=(0.4, y), RIGHT_WRIST=(0.6, y)) for y in (0.6, 0.1, 0.6, 0.1, 0.6)]
+    tracker = ExerciseTracker("Jumping Jack")
+    for ts, frame in enumerate(frames):
+        tracker.update(frame, now=ts)
+    result = replay("Jumping Jack", frames)
+    assert (tracker.counter, tracker.correct, tracker.incorrect) == (2, 2, 0)
+    assert (result["reps"], result["correct"], result["incorrect"]) == (2, 2, 0)
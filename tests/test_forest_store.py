@@ -0,0 +1,64 @@
+import os
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.tree import DecisionTreeClassifier
+import forest_store
+from forest_store import ARRAY_NAMES, FlatForest, export_forest, parity_inputs, check_parity, load_model
+
+
+def training_data(seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(400, 6))
+    return X, rng.integers(0, 3, 400), X[:, 0] * 2 + rng.normal(size=400)
+
+
+@pytest.mark.parametrize("make_model, target", [
+    (lambda: RandomForestClassifier(n_estimators=15, max_depth=8, random_state=0), 1),
+    (lambda: RandomForestRegressor(n_estimators=15, random_state=0), 2),
+    (lambda: DecisionTreeClassifier(random_state=0), 1),
+])
+def test_flattened_forest_matches_sklearn(tmp_path, make_model, target):
+    data = training_data()
+    model = make_model().fit(data[0], data[target])
+    path = str(tmp_path / "model.joblib")
+    joblib.dump(model, path)
+
+    forest = FlatForest(export_forest(path, model))
+    # On and next to every split threshold, plus the training rows
+    X = np.vstack((parity_inputs({name: getattr(forest, name) for name in ARRAY_NAMES}, forest.n_features_in_,
+                                 rows=2000, seed=1), data[0]))
+    assert check_parity(model, forest, X)
+    assert np.array_equal(model.predict(X), forest.predict(X))
+    if target == 1:
+        assert np.array_equal(model.predict_proba(X), forest.predict_proba(X))
+        assert np.array_equal(model.classes_, forest.classes_)
+
+
+def test_load_model_writes_nothing_unless_auto_export_is_on(tmp_path, monkeypatch):
+    X, y, _ = training_data()
+    path = str(tmp_path / "model.joblib")
+    joblib.dump(RandomForestClassifier(n_estimators=5, random_state=0).fit(X, y), path)
+
+    monkeypatch.setattr(forest_store, "AUTO_EXPORT", False)
+    assert not isinstance(load_model(path), FlatForest)
+    assert os.listdir(tmp_path) == ["model.joblib"]
+
+    monkeypatch.setattr(forest_store, "AUTO_EXPORT", True)
+    assert isinstance(load_model(path), FlatForest)
+    # A fresh export is reused on the next load
+    monkeypatch.setattr(forest_store, "AUTO_EXPORT", False)
+    assert isinstance(load_model(path), FlatForest)
+
+
+def test_flat_forest_rejects_wrong_inputs(tmp_path):
+    X, y, _ = training_data()
+    path = str(tmp_path / "model.joblib")
+    model = RandomForestClassifier(n_estimators=3, random_state=0).fit(X, y)
+    joblib.dump(model, path)
+    forest = FlatForest(export_forest(path, model))
+    with pytest.raises(ValueError):
+        forest.predict(X[:, :5])
+    with pytest.raises(ValueError):
+        forest.predict(np.full((1, 6), np.nan))
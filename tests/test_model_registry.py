@@ -0,0 +1,89 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeRegressor
+from model_registry import ModelRegistry, file_version
+
+
+def model_file(tmp_path, name, value, n_features=4):
+    """A model that predicts `value` for every row, so each file is recognisable by its output."""
+    X = np.zeros((2, n_features))
+    path = str(tmp_path / f"{name}.joblib")
+    joblib.dump(DecisionTreeRegressor().fit(X, [value, value]), path)
+    return path
+
+
+def predicts(registry, name="risk"):
+    model, version = registry.get_versioned(name)
+    return model.predict(np.zeros((1, model.n_features_in_)))[0], version
+
+
+def expire(registry):
+    # As if STATE_CHECK_SECONDS had passed since the last look at the state file
+    registry._state_checked = 0.0
+
+
+@pytest.fixture
+def workers(tmp_path):
+    state_file = str(tmp_path / "model_state.json")
+    v1 = model_file(tmp_path, "v1", 1.0)
+    pair = []
+    for _ in range(2):
+        registry = ModelRegistry(state_file)
+        registry.register_file("risk", v1, joblib.load)
+        pair.append(registry)
+    return pair
+
+
+def test_promote_and_rollback_reach_the_other_worker_after_the_check_interval(tmp_path, workers):
+    admin, worker = workers
+    v1, v2 = admin._files["risk"]["path"], model_file(tmp_path, "v2", 2.0)
+    assert predicts(admin) == predicts(worker) == (1.0, file_version(v1))
+
+    admin.stage("risk", v2)
+    assert predicts(worker)[0] == 1.0  # staged is not served
+    admin.promote("risk")
+    assert predicts(admin) == (2.0, file_version(v2))
+    assert predicts(worker)[0] == 1.0  # checked too recently to notice
+    expire(worker)
+    assert predicts(worker) == (2.0, file_version(v2))
+
+    admin.rollback("risk")
+    expire(worker)
+    assert predicts(admin) == predicts(worker) == (1.0, file_version(v1))
+
+
+def test_rollback_on_another_worker_loads_the_recorded_previous_file(tmp_path, workers):
+    admin, worker = workers
+    v2 = model_file(tmp_path, "v2", 2.0)
+    admin.stage("risk", v2)
+    admin.promote("risk")
+    # The worker never held v1 live, so it reloads it from the state file
+    expire(worker)
+    assert predicts(worker)[0] == 2.0
+    worker.rollback("risk")
+    expire(admin)
+    assert predicts(worker)[0] == predicts(admin)[0] == 1.0
+
+
+def test_stage_rejects_a_model_with_a_different_feature_count(tmp_path, workers):
+    admin, worker = workers
+    predicts(admin)
+    with pytest.raises(ValueError):
+        admin.stage("risk", model_file(tmp_path, "wide", 3.0, n_features=5))
+    with pytest.raises(LookupError):
+        worker.promote("risk")
+    assert predicts(admin)[0] == 1.0
+
+
+def test_versioned_pair_always_matches_the_served_file(tmp_path, workers):
+    admin, worker = workers
+    paths = [admin._files["risk"]["path"]] + [model_file(tmp_path, f"v{value}", float(value)) for value in (2, 3)]
+    outputs = {file_version(path): float(value) for value, path in enumerate(paths, start=1)}
+    for path in paths[1:]:
+        admin.stage("risk", path)
+        admin.promote("risk")
+        expire(worker)
+        for registry in (admin, worker):
+            output, version = predicts(registry)
+            assert version == file_version(path) and outputs[version] == output
@@ -0,0 +1,90 @@
+import numpy as np
+from vitals_store import (N_FIELDS, VitalsStore, PatientSeries, encode_times, decode_times, encode_values,
+                          decode_values, rollup_records, merge_rollups)
+
+
+def samples(count, start=1.7e9, seed=0):
+    rng = np.random.default_rng(seed)
+    times = start + np.cumsum(rng.uniform(0.009, 0.011, count))
+    values = rng.normal((75, 97, 0.5), (8, 1.5, 0.2), (count, N_FIELDS)).astype(np.float32)
+    return np.round(times, 6), values
+
+
+def test_time_codec_round_trips_to_the_microsecond():
+    times, _ = samples(5000)
+    times[100:200] = times[100]  # repeated timestamps
+    times[300] += 3600  # and a gap
+    times[301:] += 3600
+    decoded = decode_times(encode_times(times), len(times))
+    assert np.array_equal(np.round(decoded * 1e6).astype(np.int64), np.round(times * 1e6).astype(np.int64))
+
+
+def test_value_codec_is_bit_exact():
+    _, values = samples(5000)
+    values[10] = [np.nan, np.inf, -0.0]
+    decoded = decode_values(encode_values(values), len(values))
+    assert decoded.dtype == np.float32 and decoded.shape == values.shape
+    assert np.array_equal(decoded.view(np.uint32), values.view(np.uint32))
+
+
+def test_codec_compresses_regular_samples():
+    times, values = samples(4096)
+    assert len(encode_times(times)) + len(encode_values(values)) < times.nbytes + values.nbytes
+
+
+def test_merge_rollups_combines_buckets_split_over_chunks():
+    times, values = samples(3000)
+    whole = rollup_records(times, values, 1)
+    split = merge_rollups(np.concatenate((rollup_records(times[:1234], values[:1234], 1),
+                                          rollup_records(times[1234:], values[1234:], 1))))
+    assert np.array_equal(whole["bucket"], split["bucket"])
+    assert np.array_equal(whole["count"], split["count"])
+    assert np.allclose(whole["sum"], split["sum"])
+    assert np.array_equal(whole["min"], split["min"]) and np.array_equal(whole["max"], split["max"])
+
+
+def test_store_query_and_rollup_span_written_and_pending_samples(tmp_path):
+    store = VitalsStore(root=str(tmp_path), chunk_size=1000, flush_seconds=3600)
+    times, values = samples(2500)
+    for start in range(0, len(times), 300):
+        store.append("patient/01", times[start:start + 300], values[start:start + 300])
+    assert store.stats("patient/01")["pending_samples"] == 100
+
+    start, end = times[150], times[2450]
+    got_times, got_values = store.query("patient/01", start, end)
+    keep = (times >= start) & (times < end)
+    assert np.array_equal(got_times, times[keep])
+    assert np.array_equal(got_values, values[keep])
+
+    rollup = store.rollup("patient/01", "1s", times[0], times[-1] + 1)
+    assert rollup["count"].sum() == len(times)
+    assert np.array_equal(rollup["min"].min(axis=0), values.min(axis=0))
+
+    # Once flushed, a new store reads every sample back from disk
+    store.flush()
+    reopened = VitalsStore(root=str(tmp_path))
+    assert np.array_equal(reopened.query("patient/01", 0, np.inf)[0], times)
+
+
+def test_series_flushes_old_buffers_before_a_full_chunk(tmp_path):
+    series = PatientSeries(str(tmp_path), chunk_size=4096, flush_seconds=30)
+    times, values = samples(20)
+    series.append(times[:10], values[:10])
+    assert series.stats()["pending_samples"] == 10 and not series.is_stale()
+
+    series._pending_since -= 31
+    assert series.is_stale()
+    series.append(times[10:], values[10:])
+    assert series.stats()["pending_samples"] == 0
+    assert series.stats()["stored_samples"] == 20
+
+
+def test_flush_stale_writes_quiet_patients_only(tmp_path):
+    store = VitalsStore(root=str(tmp_path), chunk_size=4096, flush_seconds=30)
+    times, values = samples(20)
+    store.append("quiet", times, values)
+    store.append("busy", times, values)
+    store._series["quiet"]._pending_since -= 31
+    store.flush_stale()
+    assert store.stats("quiet")["stored_samples"] == 20
+    assert store.stats("busy")["pending_samples"] == 20
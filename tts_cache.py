@@ -0,0 +1,145 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+import pygame
+
+try:
+    import pyttsx3
+except ImportError:  # Fall back to gTTS (needs network) when no offline engine is installed
+    pyttsx3 = None
+
+COUNTDOWN_PHRASES = ["Three", "Two", "One", "Start"]
+WARM_UP_BATCH = 4  # phrases per engine run; an on-demand phrase waits for at most one run
+REPORT_QUEUED_PHRASE = "Your exercise report is being prepared"
+
+
+def default_vocabulary():
+    """Every fixed phrase the monitors can say, countdown first so it is ready soonest."""
+    from exercise_rules import EXERCISES
+
+    phrases = list(COUNTDOWN_PHRASES)
+    for spec in EXERCISES.values():
+        for check in spec.get("rep_checks", []) + spec.get("form_checks", []):
+            phrases.append(check.get("say", check["feedback"]))
+        phrases.append(spec.get("rep_success", {}).get("say"))
+        phrases.append(spec.get("intro"))
+    phrases.append(REPORT_QUEUED_PHRASE)
+    return [phrase for phrase in dict.fromkeys(phrases) if phrase]
+
+
+class SpeechCache:
+    """
+    Synthesised speech kept as in-memory audio, keyed by phrase.
+
+    `warm_up` renders the fixed vocabulary a few phrases per engine run, and
+    `warm_up_in_background` does so without holding up the caller; anything
+    not rendered yet is synthesised when it is first spoken and memoised
+    (least recently used phrases are dropped past `max_entries`). Playback
+    goes through pygame from memory, so repeated phrases never touch the
+    speech engine or the network.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._audio = OrderedDict()  # phrase -> (format, bytes)
+        self._lock = threading.Lock()
+        self._engine = None
+        self._warm_thread = None
+        self.hits = 0
+        self.misses = 0
+
+    def _synthesize(self, phrases):
+        if pyttsx3 is None:
+            return {phrase: ("mp3", self._synthesize_gtts(phrase)) for phrase in phrases}
+
+        if self._engine is None:
+            self._engine = pyttsx3.init()
+        workdir = tempfile.mkdtemp(prefix="tts_")
+        try:
+            paths = {}
+            for i, phrase in enumerate(phrases):
+                paths[phrase] = os.path.join(workdir, f"{i}.wav")
+                self._engine.save_to_file(phrase, paths[phrase])
+            self._engine.runAndWait()
+
+            audio = {}
+            for phrase, path in paths.items():
+                with open(path, "rb") as f:
+                    audio[phrase] = ("wav", f.read())
+            return audio
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _synthesize_gtts(self, phrase):
+        from gtts import gTTS
+
+        buffer = BytesIO()
+        gTTS(text=phrase, lang="en").write_to_fp(buffer)
+        return buffer.getvalue()
+
+    def _store(self, audio):
+        self._audio.update(audio)
+        while len(self._audio) > self.max_entries:
+            self._audio.popitem(last=False)
+
+    def warm_up(self, phrases=None):
+        phrases = default_vocabulary() if phrases is None else phrases
+        # The lock is released between batches, so `get` is served in between
+        for start in range(0, len(phrases), WARM_UP_BATCH):
+            with self._lock:
+                missing = [phrase for phrase in phrases[start:start + WARM_UP_BATCH] if phrase not in self._audio]
+                if missing:
+                    self._store(self._synthesize(missing))
+
+    def warm_up_in_background(self, phrases=None):
+        """Start `warm_up` on a daemon thread (once per cache) and return straight away."""
+        with self._lock:
+            if self._warm_thread is not None:
+                return self._warm_thread
+            self._warm_thread = threading.Thread(target=self.warm_up, args=(phrases,), name="speech-warm-up", daemon=True)
+        self._warm_thread.start()
+        return self._warm_thread
+
+    def get(self, phrase):
+        with self._lock:
+            if phrase in self._audio:
+                self.hits += 1
+                self._audio.move_to_end(phrase)
+            else:
+                self.misses += 1
+                self._store(self._synthesize([phrase]))
+            return self._audio[phrase]
+
+    def play(self, phrase):
+        """Speak `phrase` and block until playback finishes."""
+        audio_format, data = self.get(phrase)
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+
+        if audio_format == "mp3":
+            pygame.mixer.music.load(BytesIO(data))
+            pygame.mixer.music.play()
+            while pygame.mixer.music.get_busy():
+                time.sleep(0.05)
+            return
+
+        channel = pygame.mixer.Sound(file=BytesIO(data)).play()
+        while channel is not None and channel.get_busy():
+            time.sleep(0.05)
+
+
+_speech_cache = None
+_speech_cache_lock = threading.Lock()
+
+
+def get_speech_cache():
+    """Process-wide cache shared by all monitors, so warm-up happens once."""
+    global _speech_cache
+    with _speech_cache_lock:
+        if _speech_cache is None:
+            _speech_cache = SpeechCache()
+        return _speech_cache
@@ -0,0 +1,308 @@
+import os
+import mmap
+import zlib
+import time
+import threading
+from urllib.parse import quote
+import numpy as np
+from vitals_stream import SAMPLE_FIELDS
+
+VITALS_DIR = os.getenv("VITALS_DIR", "vitals")
+CHUNK_SIZE = int(os.getenv("VITALS_CHUNK_SIZE", "4096"))
+# Oldest a buffered sample may get before its chunk is written, however few samples it holds
+FLUSH_SECONDS = float(os.getenv("VITALS_FLUSH_SECONDS", "30"))
+
+ROLLUPS = {"1s": 1, "1m": 60, "1h": 3600}
+N_FIELDS = len(SAMPLE_FIELDS)
+
+# One record per chunk in index.bin; chunk bytes live in data.bin at `offset`
+INDEX_DTYPE = np.dtype([
+    ("start", "<f8"), ("end", "<f8"), ("count", "<u4"),
+    ("offset", "<u8"), ("time_bytes", "<u4"), ("value_bytes", "<u4"),
+])
+# One record per (flushed chunk, bucket) in rollup_<name>.bin; a bucket split over two chunks is merged on read
+ROLLUP_DTYPE = np.dtype([
+    ("bucket", "<i8"), ("count", "<u4"),
+    ("sum", "<f8", (N_FIELDS,)), ("min", "<f4", (N_FIELDS,)), ("max", "<f4", (N_FIELDS,)),
+])
+
+
+# === Chunk Codec ===
+def _shuffle(array):
+    # Byte-transpose so the (mostly zero) high bytes of every element sit together for zlib
+    return np.ascontiguousarray(array.view(np.uint8).reshape(len(array), array.itemsize).T).tobytes()
+
+
+def _unshuffle(data, dtype, count):
+    itemsize = np.dtype(dtype).itemsize
+    return np.ascontiguousarray(np.frombuffer(data, np.uint8).reshape(itemsize, count).T).view(dtype).reshape(count)
+
+
+def encode_times(times):
+    """Delta-of-delta of integer microseconds; the first element keeps the absolute time."""
+    micros = np.round(times * 1e6).astype(np.int64)
+    deltas = np.diff(micros, prepend=0)
+    return zlib.compress(_shuffle(np.diff(deltas, prepend=0)))
+
+
+def decode_times(data, count):
+    return np.cumsum(np.cumsum(_unshuffle(zlib.decompress(data), np.int64, count))) / 1e6
+
+
+def encode_values(values):
+    """Each float32 column XORed with its previous sample (Gorilla-style), columns stored one after another."""
+    bits = np.ascontiguousarray(values.T).view(np.uint32)
+    xored = bits ^ np.concatenate((np.zeros((N_FIELDS, 1), np.uint32), bits[:, :-1]), axis=1)
+    return zlib.compress(_shuffle(xored.reshape(-1)))
+
+
+def decode_values(data, count):
+    xored = _unshuffle(zlib.decompress(data), np.uint32, count * N_FIELDS).reshape(N_FIELDS, count)
+    return np.bitwise_xor.accumulate(xored, axis=1).view(np.float32).T
+
+
+def rollup_records(times, values, seconds):
+    buckets = (np.floor(times / seconds) * seconds).astype(np.int64)
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    records = np.zeros(len(starts), dtype=ROLLUP_DTYPE)
+    records["bucket"] = buckets[starts]
+    records["count"] = np.diff(np.append(starts, len(times)))
+    records["sum"] = np.add.reduceat(values.astype(np.float64), starts)
+    records["min"] = np.minimum.reduceat(values, starts)
+    records["max"] = np.maximum.reduceat(values, starts)
+    return records
+
+
+def merge_rollups(records):
+    """Combine records that share a bucket (written by consecutive chunks)."""
+    if not len(records):
+        return records
+    records = records[np.argsort(records["bucket"], kind="stable")]
+    starts = np.flatnonzero(np.diff(records["bucket"], prepend=records["bucket"][0] - 1))
+    if len(starts) == len(records):
+        return records
+    merged = np.zeros(len(starts), dtype=ROLLUP_DTYPE)
+    merged["bucket"] = records["bucket"][starts]
+    merged["count"] = np.add.reduceat(records["count"], starts)
+    merged["sum"] = np.add.reduceat(records["sum"], starts)
+    merged["min"] = np.minimum.reduceat(records["min"], starts)
+    merged["max"] = np.maximum.reduceat(records["max"], starts)
+    return merged
+
+
+# === Per-patient Series ===
+class PatientSeries:
+    """
+    Append-only files of one patient. Samples are buffered until CHUNK_SIZE
+    of them can be written as one compressed chunk, or the oldest is
+    `flush_seconds` old; reads go through memory maps that are re-opened only
+    when the files have grown.
+    """
+
+    def __init__(self, path, chunk_size, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.flush_seconds = flush_seconds
+        os.makedirs(path, exist_ok=True)
+        self._pending = []
+        self._pending_count = 0
+        self._pending_since = None
+        self._maps = {}
+        self.lock = threading.Lock()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _records(self, name, dtype):
+        path = self._file(name)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        size -= size % dtype.itemsize  # ignore a record torn by a crash mid-write
+        cached = self._maps.get(name)
+        if cached is None or cached[0] != size:
+            records = np.memmap(path, dtype=dtype, mode="r", shape=(size // dtype.itemsize,)) if size else np.zeros(0, dtype)
+            self._maps[name] = cached = (size, records)
+        return cached[1]
+
+    def _data(self):
+        path = self._file("data.bin")
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        cached = self._maps.get("data.bin")
+        if cached is None or cached[0] != size:
+            with open(path, "rb") as f:
+                self._maps["data.bin"] = cached = (size, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return cached[1]
+
+    def append(self, times, values):
+        if not self._pending:
+            self._pending_since = time.time()
+        self._pending.append((np.asarray(times, np.float64), np.asarray(values, np.float32)))
+        self._pending_count += len(times)
+        if self._pending_count >= self.chunk_size or self.is_stale():
+            self.flush()
+
+    def is_stale(self, now=None):
+        """Whether buffered samples have waited `flush_seconds` for their chunk."""
+        return self._pending_since is not None and (now or time.time()) - self._pending_since >= self.flush_seconds
+
+    def _pending_arrays(self):
+        if not self._pending:
+            return np.zeros(0), np.zeros((0, N_FIELDS), np.float32)
+        return np.concatenate([t for t, _ in self._pending]), np.concatenate([v for _, v in self._pending])
+
+    def flush(self):
+        if not self._pending:
+            return
+        times, values = self._pending_arrays()
+        time_blob, value_blob = encode_times(times), encode_values(values)
+
+        # Data before index: a crash in between leaves unreferenced bytes, never a dangling record
+        with open(self._file("data.bin"), "ab") as f:
+            offset = f.tell()
+            f.write(time_blob + value_blob)
+        record = np.array([(times[0], times[-1], len(times), offset, len(time_blob), len(value_blob))], INDEX_DTYPE)
+        with open(self._file("index.bin"), "ab") as f:
+            f.write(record.tobytes())
+        for name, seconds in ROLLUPS.items():
+            with open(self._file(f"rollup_{name}.bin"), "ab") as f:
+                f.write(rollup_records(times, values, seconds).tobytes())
+        self._pending, self._pending_count, self._pending_since = [], 0, None
+
+    def query(self, start, end):
+        # Chunks are appended in time order, so both bounds are binary searches on the mapped index
+        index = self._records("index.bin", INDEX_DTYPE)
+        first = np.searchsorted(index["end"], start, side="left")
+        last = np.searchsorted(index["start"], end, side="left")
+        times, values = [], []
+        if last > first:
+            data = self._data()
+            for chunk in index[first:last]:
+                offset, split = int(chunk["offset"]), int(chunk["offset"] + chunk["time_bytes"])
+                count = int(chunk["count"])
+                times.append(decode_times(data[offset:split], count))
+                values.append(decode_values(data[split:split + int(chunk["value_bytes"])], count))
+        pending_times, pending_values = self._pending_arrays()
+        times = np.concatenate(times + [pending_times])
+        values = np.concatenate(values + [pending_values])
+        keep = (times >= start) & (times < end)
+        return times[keep], values[keep]
+
+    def rollup(self, name, start, end):
+        records = self._records(f"rollup_{name}.bin", ROLLUP_DTYPE)
+        first = np.searchsorted(records["bucket"], start - ROLLUPS[name], side="right")
+        last = np.searchsorted(records["bucket"], end, side="left")
+        records = np.asarray(records[first:last])
+        pending_times, pending_values = self._pending_arrays()
+        if len(pending_times):
+            records = np.concatenate((records, rollup_records(pending_times, pending_values, ROLLUPS[name])))
+        records = records[(records["bucket"] + ROLLUPS[name] > start) & (records["bucket"] < end)]
+        return merge_rollups(records)
+
+    def stats(self):
+        index = self._records("index.bin", INDEX_DTYPE)
+        raw_bytes = int(index["count"].sum()) * (8 + 4 * N_FIELDS)
+        stored_bytes = int(index["time_bytes"].sum() + index["value_bytes"].sum())
+        return {
+            "chunks": len(index),
+            "stored_samples": int(index["count"].sum()),
+            "pending_samples": self._pending_count,
+            "first": float(index["start"][0]) if len(index) else None,
+            "last": float(index["end"][-1]) if len(index) else None,
+            "compression_ratio": round(raw_bytes / stored_bytes, 2) if stored_bytes else None,
+        }
+
+
+# === Store ===
+class VitalsStore:
+    """
+    Columnar time-series store for device samples, one directory per patient:
+    data.bin (compressed chunks), index.bin (chunk index), rollup_1s/1m/1h.bin.
+    Queries return NumPy arrays. Each patient must have a single writer process.
+    """
+
+    def __init__(self, root=VITALS_DIR, chunk_size=CHUNK_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.flush_seconds = flush_seconds
+        self._series = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _patient(self, patient_id, create=True):
+        with self._lock:
+            series = self._series.get(patient_id)
+            if series is None:
+                path = os.path.join(self.root, quote(patient_id, safe=""))
+                if not create and not os.path.isdir(path):
+                    return None
+                series = self._series[patient_id] = PatientSeries(path, self.chunk_size, self.flush_seconds)
+            return series
+
+    def append(self, patient_id, times, values):
+        series = self._patient(patient_id)
+        with series.lock:
+            series.append(times, values)
+
+    def flush(self, patient_id=None):
+        with self._lock:
+            targets = list(self._series.values()) if patient_id is None else [self._series.get(patient_id)]
+        for series in targets:
+            if series is not None:
+                with series.lock:
+                    series.flush()
+
+    def flush_stale(self):
+        """Write the buffers of patients whose oldest pending sample is `flush_seconds` old, e.g. quiet streams."""
+        now = time.time()
+        with self._lock:
+            targets = list(self._series.values())
+        for series in targets:
+            with series.lock:
+                if series.is_stale(now):
+                    series.flush()
+
+    def start_flusher(self):
+        """Run flush_stale every `flush_seconds` on a daemon thread."""
+        def loop():
+            while True:
+                time.sleep(self.flush_seconds)
+                try:
+                    self.flush_stale()
+                except Exception as e:
+                    print(f"Vitals flush failed: {e}")
+
+        thread = threading.Thread(target=loop, name="vitals-flush", daemon=True)
+        thread.start()
+        return thread
+
+    def query(self, patient_id, start, end):
+        """Raw samples with start <= t < end: (times float64 (n,), values float32 (n, 3))."""
+        series = self._patient(patient_id, create=False)
+        if series is None:
+            return np.zeros(0), np.zeros((0, N_FIELDS), np.float32)
+        with series.lock:
+            return series.query(start, end)
+
+    def rollup(self, patient_id, resolution, start, end):
+        """Buckets overlapping [start, end) at "1s", "1m" or "1h": bucket, count, and mean/min/max (n, 3)."""
+        if resolution not in ROLLUPS:
+            raise ValueError(f"Resolution must be one of {', '.join(ROLLUPS)}")
+        series = self._patient(patient_id, create=False)
+        if series is None:
+            records = np.zeros(0, ROLLUP_DTYPE)
+        else:
+            with series.lock:
+                records = series.rollup(resolution, start, end)
+        return {
+            "bucket": records["bucket"],
+            "count": records["count"],
+            "mean": records["sum"] / np.maximum(records["count"], 1)[:, None],
+            "min": records["min"],
+            "max": records["max"],
+        }
+
+    def stats(self, patient_id):
+        series = self._patient(patient_id, create=False)
+        if series is None:
+            return None
+        with series.lock:
+            return series.stats()
@@ -0,0 +1,244 @@
+import os
+import time
+import threading
+import numpy as np
+
+SAMPLE_FIELDS = ("heart_rate", "spo2", "ecg_raw_data")
+HEART_RATE, SPO2, ECG = range(len(SAMPLE_FIELDS))
+
+# Windows are aligned to multiples of WINDOW_SECONDS of device time
+WINDOW_SECONDS = float(os.getenv("VITALS_WINDOW_SECONDS", "10"))
+BUFFER_SIZE = int(os.getenv("VITALS_BUFFER_SIZE", "1024"))
+IDLE_TIMEOUT = float(os.getenv("VITALS_IDLE_TIMEOUT", "600"))
+
+# Leaving these ranges re-scores straight away instead of waiting for the window to close
+HEART_RATE_RANGE = (50, 120)
+SPO2_MIN = 92
+
+
+# === Sample Parsing ===
+def samples_to_array(payload, now=None):
+    """
+    Accepts one sample {"t", "heart_rate", "spo2", "ecg_raw_data"}, a list of
+    them, {"samples": [...]}, or columnar {"t": [...], "heart_rate": [...], ...}.
+    Returns (times float64 (n,), values float32 (n, 3)); "t" defaults to now.
+    """
+    if isinstance(payload, dict) and "samples" in payload:
+        payload = payload["samples"]
+    if isinstance(payload, dict) and isinstance(payload.get(SAMPLE_FIELDS[0]), list):
+        columns = payload
+    else:
+        rows = [payload] if isinstance(payload, dict) else payload
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("Expected a sample object, a list of samples or columnar arrays")
+        columns = {name: [row.get(name) for row in rows] for name in ("t",) + SAMPLE_FIELDS}
+
+    try:
+        values = np.array([columns[name] for name in SAMPLE_FIELDS], dtype=np.float32).T.reshape(-1, len(SAMPLE_FIELDS))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"Every sample needs numeric {', '.join(SAMPLE_FIELDS)}")
+    times = columns.get("t")
+    if times is None or any(t is None for t in times):
+        times = np.full(len(values), time.time() if now is None else now)
+    times = np.asarray(times, dtype=np.float64)
+    if len(times) != len(values) or not (np.isfinite(times).all() and np.isfinite(values).all()):
+        raise ValueError(f"Samples need finite numeric t, {', '.join(SAMPLE_FIELDS)} in equal-length columns")
+    return times, values
+
+
+def abnormal(values):
+    heart_rate = values[:, HEART_RATE]
+    return (heart_rate < HEART_RATE_RANGE[0]) | (heart_rate > HEART_RATE_RANGE[1]) | (values[:, SPO2] < SPO2_MIN)
+
+
+def aggregate(times, values):
+    return {
+        "start": float(times[0]),
+        "end": float(times[-1]),
+        "samples": int(len(times)),
+        "heart_rate_mean": float(values[:, HEART_RATE].mean()),
+        "heart_rate_min": float(values[:, HEART_RATE].min()),
+        "heart_rate_max": float(values[:, HEART_RATE].max()),
+        "spo2_mean": float(values[:, SPO2].mean()),
+        "spo2_min": float(values[:, SPO2].min()),
+        "ecg_mean": float(values[:, ECG].mean()),
+    }
+
+
+# === Per-patient Stream ===
+class PatientStream:
+    """
+    Ring buffer of the most recent samples of one device plus the open
+    window. Samples are kept as NumPy columns, never as per-sample objects.
+    """
+
+    def __init__(self, patient_id, profile, capacity=BUFFER_SIZE):
+        self.patient_id = patient_id
+        self.profile = profile
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, len(SAMPLE_FIELDS)), dtype=np.float32)
+        self.capacity = capacity
+        self.head = 0  # next write position
+        self.size = 0
+        self.total = 0
+        self.dropped = 0
+        self.window = None  # id of the open window
+        self.window_from = 0  # absolute position of the first sample of the open window
+        self.abnormal = False
+        self.last_event = None
+        self.last_seen = time.time()
+        self.lock = threading.Lock()
+
+    def _write(self, times, values):
+        if len(times) > self.capacity:
+            times, values = times[-self.capacity:], values[-self.capacity:]
+        index = (self.head + np.arange(len(times))) % self.capacity
+        self.times[index] = times
+        self.values[index] = values
+        self.head = (self.head + len(times)) % self.capacity
+        self.size = min(self.size + len(times), self.capacity)
+
+    def _slice(self, start, end):
+        """Samples with absolute positions [start, end) that are still buffered, oldest first."""
+        start = max(start, self.total - self.size)
+        index = (self.head - (self.total - np.arange(start, end))) % self.capacity
+        return self.times[index], self.values[index]
+
+    def _event(self, reason, times, values):
+        stats = aggregate(times, values)
+        features = [self.profile["age"], self.profile["gender"], self.profile["bmi"],
+                    stats["heart_rate_mean"], stats["spo2_mean"], stats["ecg_mean"]]
+        return {"reason": reason, **stats, "features": features}
+
+    def accept(self, times, values):
+        """Sort a block by time and drop (and count) samples older than what is already buffered."""
+        self.last_seen = time.time()
+        order = np.argsort(times, kind="stable")
+        times, values = times[order], values[order]
+        if self.size:
+            fresh = times >= self.times[(self.head - 1) % self.capacity]
+            self.dropped += int(len(times) - fresh.sum())
+            times, values = times[fresh], values[fresh]
+        return times, values
+
+    def append(self, times, values):
+        """Buffer an accepted block; returns the windows it closed and any threshold crossing."""
+        if not len(times):
+            return []
+
+        block_start = self.total
+        self._write(times, values)
+        self.total += len(times)
+
+        events = []
+        window_ids = np.floor(times / WINDOW_SECONDS).astype(np.int64)
+        previous = np.concatenate(([window_ids[0] if self.window is None else self.window], window_ids[:-1]))
+        for offset in np.flatnonzero(window_ids != previous):
+            window_end = block_start + int(offset)
+            if window_end > self.total - self.size:  # else the whole window was overwritten already
+                events.append(self._event("window", *self._slice(self.window_from, window_end)))
+            self.window_from = window_end
+        self.window = int(window_ids[-1])
+
+        flags = abnormal(values)
+        crossed = flags & ~np.concatenate(([self.abnormal], flags[:-1]))
+        self.abnormal = bool(flags[-1])
+        if crossed.any():
+            recent_times, recent_values = self._slice(0, self.total)
+            since = np.searchsorted(recent_times, times[-1] - WINDOW_SECONDS)
+            events.append(self._event("threshold", recent_times[since:], recent_values[since:]))
+        return events
+
+    def snapshot(self):
+        with self.lock:
+            current = aggregate(*self._slice(self.window_from, self.total)) if self.total > self.window_from else None
+            return {
+                "patient_id": self.patient_id,
+                "profile": self.profile,
+                "buffered_samples": self.size,
+                "total_samples": self.total,
+                "dropped_samples": self.dropped,
+                "abnormal": self.abnormal,
+                "open_window": current,
+                "last_event": self.last_event,
+            }
+
+
+# === Hub ===
+class VitalsStreamHub:
+    """
+    All live device streams. `score(rows)` is called with one feature row per
+    closed window or threshold crossing, batched across the whole ingested
+    block, and returns (predictions, model_version). `sink(patient_id, times,
+    values)`, if given, receives every accepted block, e.g. for persistence.
+    """
+
+    def __init__(self, score, capacity=BUFFER_SIZE, idle_timeout=IDLE_TIMEOUT, sink=None):
+        self.score = score
+        self.sink = sink
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._last_eviction = time.time()
+        self.samples_ingested = 0
+        self.events_scored = 0
+        self.scoring_calls = 0
+
+    def open(self, patient_id, profile):
+        with self._lock:
+            stream = self._streams.get(patient_id)
+            if stream is None:
+                stream = self._streams[patient_id] = PatientStream(patient_id, profile, self.capacity)
+            else:
+                stream.profile = profile
+            return stream
+
+    def ingest(self, patient_id, times, values):
+        with self._lock:
+            stream = self._streams.get(patient_id)
+        if stream is None:
+            raise KeyError(f"No open stream for patient '{patient_id}'")
+
+        with stream.lock:
+            times, values = stream.accept(times, values)
+            events = stream.append(times, values)
+            if self.sink is not None and len(times):
+                self.sink(patient_id, times, values)
+            if events:
+                predictions, version = self.score(np.array([event.pop("features") for event in events], dtype=np.float64))
+                for event, prediction in zip(events, predictions):
+                    event["prediction"] = prediction.item() if hasattr(prediction, "item") else prediction
+                    event["model_version"] = version
+                stream.last_event = events[-1]
+                self.events_scored += len(events)
+                self.scoring_calls += 1
+        self.samples_ingested += len(times)
+        self._evict_idle()
+        return events
+
+    def _evict_idle(self):
+        now = time.time()
+        if now - self._last_eviction < self.idle_timeout / 10:
+            return
+        with self._lock:
+            self._last_eviction = now
+            for patient_id in [pid for pid, s in self._streams.items() if now - s.last_seen > self.idle_timeout]:
+                del self._streams[patient_id]
+
+    def snapshot(self, patient_id):
+        with self._lock:
+            stream = self._streams.get(patient_id)
+        return None if stream is None else stream.snapshot()
+
+    def stats(self):
+        with self._lock:
+            patients = len(self._streams)
+        return {
+            "patients": patients,
+            "samples_ingested": self.samples_ingested,
+            "events_scored": self.events_scored,
+            "scoring_calls": self.scoring_calls,
+            "window_seconds": WINDOW_SECONDS,
+            "buffer_size": self.capacity,
+        }